@@ -1,10 +1,7 @@
 import os
 import logging
-import traceback
-from flask import Flask, render_template, request, jsonify
-from vibescript.lexer import Lexer
-from vibescript.parser import Parser
-from vibescript.interpreter import Interpreter, InputRequestException
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import service
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -22,77 +19,32 @@ def index():
 @app.route('/run', methods=['POST'])
 def run_code():
     """Execute VibeScript code and return the results"""
-    try:
-        # Get code and inputs from request
-        data = request.get_json()
-        code = data.get('code', '') if data else ''
-        inputs = data.get('inputs', {}) if data else {}
-        
-        if not code.strip():
-            return jsonify({'output': 'No code to execute!', 'error': None})
-        
-        logger.debug(f"Executing code: {code[:100]}...")
-        
-        # Process the code through our interpreter
-        lexer = Lexer(code)
-        parser = Parser(lexer)
-        interpreter = Interpreter(parser)
-        
-        # Set any provided inputs
-        interpreter.input_values = inputs
-        
-        try:
-            # Capture the output using the interpreter's output collector
-            interpreter.interpret()
-            
-            return jsonify({
-                'output': interpreter.output.strip() if interpreter.output else 'Code executed successfully (no output)',
-                'error': None
-            })
-        
-        except InputRequestException as e:
-            # Return a special response indicating input is needed
-            return jsonify({
-                'input_requested': True,
-                'variable_name': e.variable_name,
-                'output': '',
-                'error': None
-            })
-    
-    except Exception as e:
-        logger.exception("Error executing code")
-        error_message = str(e)
-        # Format the error message to be more user-friendly
-        if "line" in error_message.lower() or "column" in error_message.lower():
-            formatted_error = f"Syntax Error: {error_message}"
-        else:
-            formatted_error = f"Runtime Error: {error_message}"
-        
-        return jsonify({
-            'output': '',
-            'error': formatted_error
-        })
+    # Get code and inputs from request
+    response, status, headers = service.run_program(request.get_json(silent=True))
+    return jsonify(response), status, headers
+
+@app.route('/run/stream', methods=['POST'])
+def run_code_stream():
+    """Execute VibeScript code and stream its output as server-sent events"""
+    return Response(
+        stream_with_context(service.stream_program(request.get_json(silent=True))),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/stats')
+def stats():
+    """Report parse cache, session and worker pool statistics"""
+    return jsonify(service.stats())
 
 @app.route('/examples/<example_name>')
 def get_example(example_name):
     """Load an example from the examples directory"""
-    try:
-        file_path = f"examples/{example_name}.vs"
-        logger.debug(f"Loading example from: {file_path}")
-        
-        if not os.path.exists(file_path):
-            logger.error(f"Example file not found: {file_path}")
-            return jsonify({'code': '', 'error': f"Example '{example_name}' not found"})
-        
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        logger.debug(f"Loaded example {example_name}: {len(content)} characters")
-        return jsonify({'code': content, 'error': None})
-        
-    except Exception as e:
-        logger.exception(f"Error loading example {example_name}")
-        return jsonify({'code': '', 'error': f"Could not load example: {str(e)}"})
+    return jsonify(service.cached_example(example_name) or service.load_example(example_name))
 
 if __name__ == '__main__':
+    # With the reloader on, this process only watches the files and runs
+    # the server in a child process; fork the pool in that child alone
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        service.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark for break, continue and return in the tree-walking interpreter.
+
+Each program runs a loop whose every iteration takes the control-flow path
+being measured, and the cost is reported per iteration.
+
+Usage: python benchmarks/bench_control_flow.py [iterations]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.lexer import Lexer
+from vibescript.parser import Parser
+from vibescript.interpreter import Interpreter
+
+PROGRAMS = {
+    # as_if on every iteration of a highkey loop
+    'continue': """
+        highkey (lit i = 0; i < {n}; i = i + 1) lets_go
+            as_if;
+        yeet
+    """,
+    # a lowkey loop entered and left through and_i_oop every iteration
+    'break': """
+        highkey (lit i = 0; i < {n}; i = i + 1) lets_go
+            lowkey (this_slaps) lets_go
+                and_i_oop;
+            yeet
+        yeet
+    """,
+    # a rizz_up call that returns through slay every iteration (not memoized,
+    # so that every call runs the body)
+    'return': """
+        @no_memo
+        rizz_up identity(x) lets_go
+            slay x;
+        yeet
+        highkey (lit i = 0; i < {n}; i = i + 1) lets_go
+            identity(i);
+        yeet
+    """,
+    # the same loop without any control-flow statement, as a reference
+    'baseline': """
+        highkey (lit i = 0; i < {n}; i = i + 1) lets_go
+            lit x = i;
+        yeet
+    """,
+}
+
+def measure(source, repeat=5):
+    """Return the best wall-clock time of interpreting source, leaving out parsing"""
+    # Parsed once, so later runs reuse it already resolved, like a cached parse
+    program = Parser(Lexer(source)).parse()
+    best = None
+    for _ in range(repeat):
+        interpreter = Interpreter()
+        start = time.perf_counter()
+        interpreter.interpret(program)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{'path':<10} {'ns/iteration':>14}")
+    for name, template in PROGRAMS.items():
+        elapsed = measure(template.format(n=iterations))
+        print(f"{name:<10} {elapsed / iterations * 1e9:>14.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for the character-at-a-time Lexer against the RegexLexer.
+
+Multi-megabyte VibeScript files are generated by repeating a block of code.
+Each workload stresses a different kind of lexeme: short tokens, long
+string literals, long comments. Both lexers tokenize every file, their
+token streams are checked to be identical, and their throughput is reported.
+
+Usage: python benchmarks/bench_lexer.py [megabytes] [directory to save the .vs files]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.lexer import Lexer, RegexLexer
+
+CODE = """
+lit total_{n} = 0;
+tea greeting_{n} = "Hello, \\"bestie\\" number {n}!\\n";
+mood done_{n} = im_dead;
+
+rizz_up add_{n}(a, b) lets_go
+    slay a + b * 2 - (a % 3) / 1;
+yeet
+
+highkey (lit i = 0; i <= 100; i = i + 1) lets_go
+    no_cap (i >= 50 == this_slaps) lets_go
+        total_{n} = add_{n}(total_{n}, i);
+    yeet cap lets_go
+        as_if;
+    yeet
+yeet
+
+lowkey (total_{n} != 0) lets_go
+    spill_the_tea greeting_{n} + total_{n};
+    and_i_oop;
+yeet
+"""
+
+WORKLOADS = {
+    # Dense code made of short tokens
+    'code': CODE,
+    # Long string literals with an escape now and then
+    'strings': 'tea story_{n} = "' + ("no cap this story is long \\t " * 200) + '";\n',
+    # Long comment lines between statements
+    'comments': ("// " + "this is a very chatty comment " * 30 + "\n") * 4 + "lit x_{n} = {n};\n",
+}
+
+def generate(template, megabytes):
+    """Return source of roughly the given size made of numbered copies of template"""
+    parts = []
+    size = 0
+    n = 0
+    while size < megabytes * 1024 * 1024:
+        block = template.replace('{n}', str(n))
+        parts.append(block)
+        size += len(block)
+        n += 1
+    return "".join(parts)
+
+def lex(lexer_class, source):
+    """Tokenize source and return the tokens and the elapsed time"""
+    start = time.perf_counter()
+    tokens = lexer_class(source).tokenize()
+    return tokens, time.perf_counter() - start
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+
+    print(f"{'workload':<10} {'MB':>6} {'tokens':>9} {'Lexer s':>9} {'Regex s':>9} {'speedup':>8}")
+    for name, template in WORKLOADS.items():
+        source = generate(template, megabytes)
+        if directory:
+            with open(os.path.join(directory, f"bench_{name}.vs"), 'w', encoding='utf-8') as file:
+                file.write(source)
+
+        expected, slow = lex(Lexer, source)
+        actual, fast = lex(RegexLexer, source)
+        if [(t.type, t.value, t.line, t.column) for t in expected] != [(t.type, t.value, t.line, t.column) for t in actual]:
+            print(f"{name}: token streams differ")
+            sys.exit(1)
+
+        size = len(source) / (1024 * 1024)
+        print(f"{name:<10} {size:>6.1f} {len(actual):>9} {slow:>9.3f} {fast:>9.3f} {slow / fast:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
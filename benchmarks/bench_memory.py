@@ -0,0 +1,85 @@
+"""
+Benchmark of the memory held by tokens, ASTs and stan values, and of
+tokenizing speed.
+
+A source is built from numbered copies of the parser benchmark's block of
+statements. Its tokens and its AST are each built with tracemalloc running,
+and the bytes still allocated once they are built are divided by the number
+of tokens or nodes. Both lexers are then timed on the same source (best of
+a few runs, garbage collector paused). Last, a stan of a million lit values
+is measured the same way against a Python list of the same values.
+
+Usage: python benchmarks/bench_memory.py [block count]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.lexer import Lexer, RegexLexer
+from vibescript.parser import Parser
+from vibescript.optimizer import count_nodes
+from vibescript.stan import Stan, pack
+from bench_parser import BLOCK
+
+class TokenReplay:
+    """Stands in for a lexer, handing the parser tokens lexed beforehand"""
+
+    def __init__(self, tokens):
+        self.get_next_token = iter(tokens).__next__
+
+def retained(build):
+    """Call build and return its result and the bytes it still holds"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+def best_time(function, repeat=5):
+    """Return the best wall-clock time of a few calls of function"""
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    source = "".join(BLOCK.format(n=n) for n in range(blocks))
+
+    tokens, token_bytes = retained(lambda: RegexLexer(source).tokenize())
+    program, program_bytes = retained(lambda: Parser(TokenReplay(tokens)).parse())
+    nodes = count_nodes(program)
+
+    print(f"source:     {len(source) / 1024:.0f} KB")
+    print(f"tokens:     {len(tokens):>8} {token_bytes / len(tokens):>8.1f} bytes/token")
+    print(f"AST:        {nodes:>8} {program_bytes / nodes:>8.1f} bytes/node")
+
+    for lexer_class in (Lexer, RegexLexer):
+        elapsed = best_time(lambda: lexer_class(source).tokenize())
+        print(f"{lexer_class.__name__ + ':':<12}{elapsed:>8.3f} s {len(tokens) / elapsed / 1e6:>8.2f} M tokens/s")
+
+    count = 1000000
+    _, list_bytes = retained(lambda: [i * 7 for i in range(count)])
+    _, stan_bytes = retained(lambda: Stan(pack([i * 7 for i in range(count)])))
+    print(f"list:       {count:>8} {list_bytes / count:>8.1f} bytes/element")
+    print(f"stan:       {count:>8} {stan_bytes / count:>8.1f} bytes/element")
+
+if __name__ == '__main__':
+    main()
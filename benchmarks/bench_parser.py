@@ -0,0 +1,70 @@
+"""
+Benchmark showing how parse time grows with the size of the source.
+
+The same block of statements (assignments, calls, declarations and loops)
+is repeated to build sources of doubling size. Each source is lexed and
+parsed; with a linear parser the time per statement stays flat and the time
+doubles with the size. Like timeit, the cyclic garbage collector is paused
+while timing, since its full collections scan the whole growing heap.
+
+Usage: python benchmarks/bench_parser.py [smallest block count] [steps]
+"""
+
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.lexer import RegexLexer
+from vibescript.parser import Parser
+
+BLOCK = """
+lit count_{n} = {n};
+count_{n} = count_{n} + 1;
+mood same_{n} = count_{n} == {n};
+same_{n} = count_{n} != 0;
+rizz_up bump_{n}(x) lets_go
+    slay x + 1;
+yeet
+bump_{n}(count_{n} == 1);
+highkey (lit i = 0; i < 3; i = i + 1) lets_go
+    count_{n} = bump_{n}(count_{n});
+yeet
+"""
+
+# Statements per block, counting nested ones
+STATEMENTS_PER_BLOCK = 10
+
+def measure(source, repeat=3):
+    """Return the best wall-clock time of lexing and parsing source"""
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            Parser(RegexLexer(source)).parse()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+
+    print(f"{'KB':>8} {'statements':>11} {'seconds':>9} {'us/statement':>13} {'growth':>7}")
+    previous = None
+    for _ in range(steps):
+        source = "".join(BLOCK.format(n=n) for n in range(blocks))
+        statements = blocks * STATEMENTS_PER_BLOCK
+        elapsed = measure(source)
+        growth = f"{elapsed / previous:.2f}x" if previous else "-"
+        print(f"{len(source) / 1024:>8.0f} {statements:>11} {elapsed:>9.3f} {elapsed / statements * 1e6:>13.2f} {growth:>7}")
+        previous = elapsed
+        blocks *= 2
+
+if __name__ == '__main__':
+    main()
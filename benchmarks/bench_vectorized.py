@@ -0,0 +1,144 @@
+"""
+Benchmark of the bulk built-in functions against the highkey loops they
+stand in for.
+
+Each case is a pair of programs computing the same result over the same
+stan, one with a loop and one with a single built-in call, and both
+programs start by building that stan the same way. The outputs of the two
+programs are checked to be equal.
+
+Usage: python benchmarks/bench_vectorized.py [elements] [engine,...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.lexer import Lexer
+from vibescript.parser import Parser
+from suite import ENGINES
+
+# The stan every case starts from: 0, -1, -2, ... (worst case for the sort)
+SETUP = """
+    stan xs = multiply(range({n}), -1);
+"""
+
+CASES = {
+    'sum': ("""
+        lit t = 0;
+        highkey (lit i = 0; i < len(xs); i = i + 1) lets_go
+            t = t + xs[i];
+        yeet
+        spill_the_tea t;
+    """, """
+        spill_the_tea sum(xs);
+    """),
+    'max': ("""
+        lit m = xs[0];
+        highkey (lit i = 1; i < len(xs); i = i + 1) lets_go
+            no_cap (xs[i] > m) m = xs[i];
+        yeet
+        spill_the_tea m;
+    """, """
+        spill_the_tea max(xs);
+    """),
+    'add': ("""
+        stan r = [0] * len(xs);
+        highkey (lit i = 0; i < len(xs); i = i + 1) lets_go
+            r[i] = xs[i] + 1;
+        yeet
+        spill_the_tea r[len(r) - 1];
+    """, """
+        stan r = add(xs, 1);
+        spill_the_tea r[len(r) - 1];
+    """),
+    'multiply': ("""
+        stan r = [0] * len(xs);
+        highkey (lit i = 0; i < len(xs); i = i + 1) lets_go
+            r[i] = xs[i] * xs[i];
+        yeet
+        spill_the_tea r[len(r) - 1];
+    """, """
+        stan r = multiply(xs, xs);
+        spill_the_tea r[len(r) - 1];
+    """),
+    'filter': ("""
+        stan r = [0] * len(xs);
+        lit k = 0;
+        highkey (lit i = 0; i < len(xs); i = i + 1) lets_go
+            no_cap (xs[i] > -100) lets_go
+                r[k] = xs[i];
+                k = k + 1;
+            yeet
+        yeet
+        spill_the_tea k;
+    """, """
+        spill_the_tea len(filter(xs, ">", -100));
+    """),
+    'range': ("""
+        stan r = [0] * {n};
+        highkey (lit i = 0; i < {n}; i = i + 1) lets_go
+            r[i] = i;
+        yeet
+        spill_the_tea r[{n} - 1];
+    """, """
+        stan r = range({n});
+        spill_the_tea r[{n} - 1];
+    """),
+    # Insertion sort is quadratic, so it only gets a slice of the stan
+    'sort': ("""
+        stan r = [0] * {m};
+        highkey (lit i = 0; i < {m}; i = i + 1) lets_go
+            lit x = xs[i];
+            lit j = i - 1;
+            lowkey (j >= 0) lets_go
+                no_cap (r[j] <= x) and_i_oop;
+                r[j + 1] = r[j];
+                j = j - 1;
+            yeet
+            r[j + 1] = x;
+        yeet
+        spill_the_tea r[0] + " " + r[{m} - 1];
+    """, """
+        stan r = [0] * {m};
+        highkey (lit i = 0; i < {m}; i = i + 1) lets_go
+            r[i] = xs[i];
+        yeet
+        r = sort(r);
+        spill_the_tea r[0] + " " + r[{m} - 1];
+    """),
+}
+
+def run(engine, source):
+    """Interpret source with an engine and return its time and output"""
+    program = Parser(Lexer(source)).parse()
+    interpreter = engine()
+    start = time.perf_counter()
+    interpreter.interpret(program)
+    return time.perf_counter() - start, interpreter.output
+
+def measure(engine, source, repeat=3):
+    """Return the best time of a few runs of source and its output"""
+    runs = [run(engine, source) for _ in range(repeat)]
+    return min(elapsed for elapsed, _ in runs), runs[0][1]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    engines = sys.argv[2].split(',') if len(sys.argv) > 2 else list(ENGINES)
+    setup = SETUP.format(n=n)
+
+    print(f"{'case':<10} {'engine':<8} {'loop ms':>10} {'built-in ms':>12} {'speedup':>9}")
+    for name in engines:
+        engine = ENGINES[name]
+        for case, (loop, builtin) in CASES.items():
+            loop_time, loop_output = measure(engine, setup + loop.format(n=n, m=n // 50))
+            builtin_time, builtin_output = measure(engine, setup + builtin.format(n=n, m=n // 50))
+            if loop_output != builtin_output:
+                raise SystemExit(f"{case} on {name}: {loop_output!r} != {builtin_output!r}")
+            print(f"{case:<10} {name:<8} {loop_time * 1000:>10.2f} {builtin_time * 1000:>12.2f} "
+                  f"{loop_time / builtin_time:>8.0f}x")
+
+if __name__ == '__main__':
+    main()
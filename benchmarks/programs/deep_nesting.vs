@@ -0,0 +1,96 @@
+// Deeply nested blocks, each declaring its own variable
+lit total = 0;
+highkey (lit round = 0; round < 300; round = round + 1) lets_go
+    lit level_0 = round + 0;
+    no_cap (level_0 >= 0) lets_go
+        lit level_1 = round + 1;
+        no_cap (level_1 >= 0) lets_go
+            lit level_2 = round + 2;
+            no_cap (level_2 >= 0) lets_go
+                lit level_3 = round + 3;
+                no_cap (level_3 >= 0) lets_go
+                    lit level_4 = round + 4;
+                    no_cap (level_4 >= 0) lets_go
+                        lit level_5 = round + 5;
+                        no_cap (level_5 >= 0) lets_go
+                            lit level_6 = round + 6;
+                            no_cap (level_6 >= 0) lets_go
+                                lit level_7 = round + 7;
+                                no_cap (level_7 >= 0) lets_go
+                                    lit level_8 = round + 8;
+                                    no_cap (level_8 >= 0) lets_go
+                                        lit level_9 = round + 9;
+                                        no_cap (level_9 >= 0) lets_go
+                                            lit level_10 = round + 10;
+                                            no_cap (level_10 >= 0) lets_go
+                                                lit level_11 = round + 11;
+                                                no_cap (level_11 >= 0) lets_go
+                                                    lit level_12 = round + 12;
+                                                    no_cap (level_12 >= 0) lets_go
+                                                        lit level_13 = round + 13;
+                                                        no_cap (level_13 >= 0) lets_go
+                                                            lit level_14 = round + 14;
+                                                            no_cap (level_14 >= 0) lets_go
+                                                                lit level_15 = round + 15;
+                                                                no_cap (level_15 >= 0) lets_go
+                                                                    lit level_16 = round + 16;
+                                                                    no_cap (level_16 >= 0) lets_go
+                                                                        lit level_17 = round + 17;
+                                                                        no_cap (level_17 >= 0) lets_go
+                                                                            lit level_18 = round + 18;
+                                                                            no_cap (level_18 >= 0) lets_go
+                                                                                lit level_19 = round + 19;
+                                                                                no_cap (level_19 >= 0) lets_go
+                                                                                    lit level_20 = round + 20;
+                                                                                    no_cap (level_20 >= 0) lets_go
+                                                                                        lit level_21 = round + 21;
+                                                                                        no_cap (level_21 >= 0) lets_go
+                                                                                            lit level_22 = round + 22;
+                                                                                            no_cap (level_22 >= 0) lets_go
+                                                                                                lit level_23 = round + 23;
+                                                                                                no_cap (level_23 >= 0) lets_go
+                                                                                                    lit level_24 = round + 24;
+                                                                                                    no_cap (level_24 >= 0) lets_go
+                                                                                                        lit level_25 = round + 25;
+                                                                                                        no_cap (level_25 >= 0) lets_go
+                                                                                                            lit level_26 = round + 26;
+                                                                                                            no_cap (level_26 >= 0) lets_go
+                                                                                                                lit level_27 = round + 27;
+                                                                                                                no_cap (level_27 >= 0) lets_go
+                                                                                                                    lit level_28 = round + 28;
+                                                                                                                    no_cap (level_28 >= 0) lets_go
+                                                                                                                        lit level_29 = round + 29;
+                                                                                                                        no_cap (level_29 >= 0) lets_go
+                                                                                                                            total = total + level_29;
+                                                                                                                        yeet
+                                                                                                                    yeet
+                                                                                                                yeet
+                                                                                                            yeet
+                                                                                                        yeet
+                                                                                                    yeet
+                                                                                                yeet
+                                                                                            yeet
+                                                                                        yeet
+                                                                                    yeet
+                                                                                yeet
+                                                                            yeet
+                                                                        yeet
+                                                                    yeet
+                                                                yeet
+                                                            yeet
+                                                        yeet
+                                                    yeet
+                                                yeet
+                                            yeet
+                                        yeet
+                                    yeet
+                                yeet
+                            yeet
+                        yeet
+                    yeet
+                yeet
+            yeet
+        yeet
+    yeet
+yeet
+spill_the_tea "total: " + total;
@@ -0,0 +1,13 @@
+// Recursive factorial through rizz_up, called over and over
+rizz_up factorial(n) lets_go
+    no_cap (n <= 1) lets_go
+        slay 1;
+    yeet
+    slay n * factorial(n - 1);
+yeet
+
+lit total = 0;
+highkey (lit i = 0; i < 400; i = i + 1) lets_go
+    total = total + factorial(10 + i % 10) % 1009;
+yeet
+spill_the_tea "total: " + total;
@@ -0,0 +1,9 @@
+// Doubly recursive Fibonacci: many short calls
+rizz_up fib(n) lets_go
+    no_cap (n < 2) lets_go
+        slay n;
+    yeet
+    slay fib(n - 1) + fib(n - 2);
+yeet
+
+spill_the_tea "fib(18) = " + fib(18);
@@ -0,0 +1,27 @@
+// Small helper functions with locals, called from a loop and from each other
+@no_memo
+rizz_up square(x) lets_go
+    lit result = x * x;
+    slay result;
+yeet
+
+@no_memo
+rizz_up distance(x, y) lets_go
+    lit dx = square(x);
+    lit dy = square(y);
+    slay dx + dy;
+yeet
+
+@no_memo
+rizz_up clamp(value, limit) lets_go
+    no_cap (value > limit) lets_go
+        slay limit;
+    yeet
+    slay value;
+yeet
+
+lit total = 0;
+highkey (lit i = 0; i < 5000; i = i + 1) lets_go
+    total = total + clamp(distance(i % 50, i % 7), 1000);
+yeet
+spill_the_tea "total: " + total;
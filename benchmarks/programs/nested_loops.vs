@@ -0,0 +1,10 @@
+// Three nested highkey loops doing integer arithmetic
+lit checksum = 0;
+highkey (lit i = 0; i < 30; i = i + 1) lets_go
+    highkey (lit j = 0; j < 30; j = j + 1) lets_go
+        highkey (lit k = 0; k < 30; k = k + 1) lets_go
+            checksum = (checksum + i * j - k) % 1000003;
+        yeet
+    yeet
+yeet
+spill_the_tea "checksum: " + checksum;
@@ -0,0 +1,4 @@
+// Heavy spill_the_tea output: one line per iteration
+highkey (lit i = 0; i < 20000; i = i + 1) lets_go
+    spill_the_tea "line " + i + " of the output, no cap";
+yeet
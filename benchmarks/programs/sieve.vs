@@ -0,0 +1,13 @@
+// Sieve of Eratosthenes over a stan: element reads and writes in loops
+lit limit = 20000;
+stan composite = [0] * (limit + 1);
+lit count = 0;
+highkey (lit i = 2; i <= limit; i = i + 1) lets_go
+    no_cap (composite[i] == 0) lets_go
+        count = count + 1;
+        highkey (lit j = i * i; j <= limit; j = j + i) lets_go
+            composite[j] = 1;
+        yeet
+    yeet
+yeet
+spill_the_tea "primes up to " + limit + ": " + count;
@@ -0,0 +1,6 @@
+// Building a string of a few hundred KB one piece at a time with s = s + x
+tea text = "";
+highkey (lit i = 0; i < 20000; i = i + 1) lets_go
+    text = text + "piece " + i + "; ";
+yeet
+spill_the_tea "built: " + (text != "");
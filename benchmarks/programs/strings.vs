@@ -0,0 +1,6 @@
+// Building a long string with repeated +
+tea story = "";
+highkey (lit i = 0; i < 5000; i = i + 1) lets_go
+    story = story + "chapter " + i + "; ";
+yeet
+spill_the_tea "length check: " + (story == "");
@@ -0,0 +1,13 @@
+// Accumulator-style recursion: every call is a self tail call (slay f(...))
+rizz_up sum_to(n, acc) lets_go
+    no_cap (n == 0) lets_go
+        slay acc;
+    yeet
+    slay sum_to(n - 1, acc + n);
+yeet
+
+lit total = 0;
+highkey (lit i = 0; i < 200; i = i + 1) lets_go
+    total = total + sum_to(100, i);
+yeet
+spill_the_tea "total: " + total;
@@ -0,0 +1,216 @@
+"""
+Benchmark suite timing the lexer, the parser and each engine separately.
+
+Every program in benchmarks/programs is put through three phases:
+
+- lex: Lexer.tokenize (or RegexLexer with --lexer regex)
+- parse: Parser.parse, fed the tokens from the lex phase
+- interpret: interpret() of each engine on the parsed program
+
+Every measurement starts with warmup runs that are not timed, then takes a
+number of timed samples with the garbage collector paused. The median and
+95th percentile of the samples are printed and, with --json, written to a
+file. A file written earlier can be given to --compare to flag every
+measurement whose median grew by more than --threshold.
+
+Usage: python benchmarks/suite.py [--engines tree,vm] [--programs fib,output]
+           [--warmup N] [--repeat N] [--lexer lexer|regex] [--optimize]
+           [--json results.json] [--compare baseline.json] [--threshold 1.10]
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.lexer import Lexer, RegexLexer
+from vibescript.parser import Parser
+from vibescript.optimizer import Optimizer
+from vibescript.resolver import Resolver
+from vibescript.interpreter import Interpreter, OutputBuffer
+from vibescript.closures import ClosureInterpreter
+from vibescript.vm import VMInterpreter
+from vibescript.transpiler import PythonInterpreter
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs')
+
+ENGINES = {
+    'tree': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VMInterpreter,
+    'python': PythonInterpreter,
+}
+
+LEXERS = {
+    'lexer': Lexer,
+    'regex': RegexLexer,
+}
+
+class TokenReplay:
+    """Stands in for a lexer, handing the parser tokens lexed beforehand"""
+
+    def __init__(self, tokens):
+        self.get_next_token = iter(tokens).__next__
+
+def load_programs(names=None):
+    """Return {name: source} for the benchmark programs, sorted by name"""
+    programs = {}
+    for file_name in sorted(os.listdir(PROGRAMS_DIR)):
+        name, extension = os.path.splitext(file_name)
+        if extension != '.vs' or (names and name not in names):
+            continue
+        with open(os.path.join(PROGRAMS_DIR, file_name), 'r', encoding='utf-8') as file:
+            programs[name] = file.read()
+    return programs
+
+def sample(function, warmup, repeat):
+    """Call function warmup times untimed, then return repeat timings in seconds"""
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return timings
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(program, engine, phase, timings):
+    """Describe one measurement"""
+    return {
+        'program': program,
+        'engine': engine,
+        'phase': phase,
+        'median': statistics.median(timings),
+        'p95': percentile(timings, 0.95),
+        'min': min(timings),
+        'mean': statistics.fmean(timings),
+        'samples': timings,
+    }
+
+def benchmark_program(name, source, engines, lexer_class, optimize, warmup, repeat):
+    """Measure every phase of one program and return the measurements"""
+    results = []
+
+    lex = lambda: lexer_class(source).tokenize()
+    results.append(summarize(name, None, 'lex', sample(lex, warmup, repeat)))
+
+    tokens = lex()
+    parse = lambda: Parser(TokenReplay(tokens)).parse()
+    results.append(summarize(name, None, 'parse', sample(parse, warmup, repeat)))
+
+    for engine_name in engines:
+        # Every engine gets its own tree, optimized and resolved up front
+        # the way the parse cache hands programs to the server
+        program = parse()
+        if optimize:
+            Optimizer().optimize(program)
+        Resolver().resolve(program)
+        engine = ENGINES[engine_name]
+
+        def interpret():
+            interpreter = engine()
+            interpreter.output_stream = OutputBuffer()
+            interpreter.interpret(program)
+
+        results.append(summarize(name, engine_name, 'interpret', sample(interpret, warmup, repeat)))
+    return results
+
+def label(result):
+    """Short name of a measurement, used to match it across runs"""
+    return (result['program'], result['engine'] or '-', result['phase'])
+
+def print_results(results):
+    """Print a table of medians and 95th percentiles in milliseconds"""
+    print(f"{'program':<14} {'engine':<8} {'phase':<10} {'median ms':>10} {'p95 ms':>10}")
+    for result in results:
+        program, engine, phase = label(result)
+        print(f"{program:<14} {engine:<8} {phase:<10} {result['median'] * 1e3:>10.3f} {result['p95'] * 1e3:>10.3f}")
+
+def compare(results, baseline, threshold):
+    """Print how every median changed against a baseline; return the regressions"""
+    previous = {label(result): result for result in baseline['results']}
+    regressions = []
+    print()
+    print(f"{'program':<14} {'engine':<8} {'phase':<10} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+    for result in results:
+        before = previous.get(label(result))
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        program, engine, phase = label(result)
+        print(f"{program:<14} {engine:<8} {phase:<10} {before['median'] * 1e3:>10.3f} "
+              f"{result['median'] * 1e3:>10.3f} {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the VibeScript lexer, parser and engines")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="comma-separated engines to run")
+    parser.add_argument('--programs', default='', help="comma-separated programs to run (default: all)")
+    parser.add_argument('--warmup', type=int, default=2, help="untimed runs before sampling")
+    parser.add_argument('--repeat', type=int, default=10, help="timed samples per measurement")
+    parser.add_argument('--lexer', choices=sorted(LEXERS), default='lexer', help="lexer to time and parse with")
+    parser.add_argument('--optimize', action='store_true', help="run the AST optimizer before interpreting")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="results file of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=1.10, help="median ratio counted as a regression")
+    args = parser.parse_args()
+
+    engines = [name for name in args.engines.split(',') if name]
+    for name in engines:
+        if name not in ENGINES:
+            parser.error(f"unknown engine: {name}")
+    programs = load_programs([name for name in args.programs.split(',') if name])
+    if not programs:
+        parser.error("no benchmark programs selected")
+
+    results = []
+    for name, source in programs.items():
+        results.extend(benchmark_program(
+            name, source, engines, LEXERS[args.lexer], args.optimize, args.warmup, args.repeat
+        ))
+    print_results(results)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'lexer': args.lexer,
+        'optimize': args.optimize,
+        'warmup': args.warmup,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
+import os
+import service
 from app import app
 
 if __name__ == '__main__':
+    # With the reloader on, this process only watches the files and runs
+    # the server in a child process; fork the pool in that child alone
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        service.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,308 @@
+"""
+Asyncio server for the VibeScript IDE
+
+Serves the same pages and API as the Flask app (app.py) from a plain
+HTTP/1.1 server built on asyncio, so a waiting client costs a coroutine
+instead of a thread. Programs run in a thread pool behind one global
+semaphore, and a client that disconnects cancels its run. The page, static
+files and examples that were loaded before are answered from memory
+without touching the thread pool. Only the standard library is needed.
+
+Usage: python server.py [--host HOST] [--port PORT]
+"""
+
+import os
+import re
+import json
+import asyncio
+import logging
+import argparse
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, unquote
+import service
+
+logger = logging.getLogger(__name__)
+
+# Programs running (or streaming) at the same time; more requests wait their turn
+MAX_CONCURRENCY = int(os.environ.get("VIBESCRIPT_MAX_CONCURRENCY", (os.cpu_count() or 1) * 4))
+
+# Largest request body accepted, in bytes
+MAX_BODY = int(os.environ.get("VIBESCRIPT_MAX_BODY", 4 * 1024 * 1024))
+
+# Most header lines accepted in one request
+MAX_HEADERS = 100
+
+TEMPLATE_PATH = os.path.join("templates", "index.html")
+STATIC_DIR = "static"
+
+# The only template expression index.html uses
+URL_FOR = re.compile(r"\{\{\s*url_for\('static',\s*filename='([^']+)'\)\s*\}\}")
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+class HttpError(Exception):
+    """Exception raised to answer a request with an error status"""
+
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+        super().__init__(message)
+
+class Request:
+    """A parsed HTTP request"""
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Decode the body as JSON, or return None if it is not valid JSON"""
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+class Server:
+    """Routes HTTP requests to the shared request handlers in service"""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='vibescript-run')
+        self.files = {}
+
+    async def handle(self, reader, writer):
+        """Serve one connection (one request, then the connection is closed)"""
+        try:
+            request = await self.read_request(reader)
+            if request is not None:
+                await self.dispatch(request, reader, writer)
+        except HttpError as e:
+            await self.send_json(writer, {'error': e.message}, e.status)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("Error handling request")
+            try:
+                await self.send_json(writer, {'error': 'Internal server error'}, 500)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """Read the request line, headers and body"""
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise HttpError(400, "Malformed request line")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HttpError(400, "Too many headers")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length > 0 else b''
+
+        return Request(method.upper(), unquote(urlsplit(target).path), headers, body)
+
+    async def dispatch(self, request, reader, writer):
+        """Answer a request according to its path"""
+        path = request.path
+        if path == '/':
+            self.require(request, 'GET')
+            await self.send(writer, 200, await self.index(), 'text/html; charset=utf-8')
+        elif path == '/run':
+            self.require(request, 'POST')
+            await self.run(request, reader, writer)
+        elif path == '/run/stream':
+            self.require(request, 'POST')
+            await self.stream(request, reader, writer)
+        elif path == '/stats':
+            self.require(request, 'GET')
+            await self.send_json(writer, service.stats())
+        elif path.startswith('/examples/'):
+            self.require(request, 'GET')
+            await self.send_json(writer, await self.example(path[len('/examples/'):]))
+        elif path.startswith('/static/'):
+            self.require(request, 'GET')
+            await self.static(path[len('/static/'):], writer)
+        else:
+            raise HttpError(404, "Not found")
+
+    def require(self, request, method):
+        """Reject a request made with the wrong method"""
+        if request.method != method:
+            raise HttpError(405, f"Use {method} for {request.path}")
+
+    async def run(self, request, reader, writer):
+        """Execute a program in the thread pool and send its result"""
+        budget = service.make_budget(service.MAX_OUTPUT)
+        loop = asyncio.get_running_loop()
+
+        async def execute():
+            async with self.semaphore:
+                return await loop.run_in_executor(self.executor, service.run_program, request.json(), budget)
+
+        outcome = await self.until_disconnected(reader, execute(), budget)
+        if outcome is None:
+            return
+        response, status, headers = outcome
+        await self.send_json(writer, response, status, headers)
+
+    async def until_disconnected(self, reader, awaitable, budget):
+        """Await a run, cancelling its budget if the client hangs up first
+
+        Returns the result of the run, or None if the client disconnected.
+        """
+        task = asyncio.ensure_future(awaitable)
+        watcher = asyncio.ensure_future(reader.read(1))
+        try:
+            done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if task in done or watcher.result() != b'':
+                return await task
+            # The run stops at its next step; wait for it so the slot is freed
+            logger.info("Client disconnected, cancelling its run")
+            budget.cancel()
+            await task
+            return None
+        finally:
+            watcher.cancel()
+
+    async def stream(self, request, reader, writer):
+        """Execute a program in the thread pool and stream its server-sent events"""
+        budget = service.make_budget(service.STREAM_MAX_OUTPUT)
+        events = service.stream_program(request.json(), budget)
+        loop = asyncio.get_running_loop()
+
+        writer.write(self.head(200, 'text/event-stream', {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}))
+        watcher = asyncio.ensure_future(reader.read(1))
+        finished = False
+        try:
+            async with self.semaphore:
+                while True:
+                    chunk = loop.run_in_executor(self.executor, next, events, None)
+                    done, _ = await asyncio.wait({chunk, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                    if watcher in done:
+                        if watcher.result() == b'':
+                            logger.info("Client disconnected, cancelling its run")
+                            budget.cancel()
+                            await chunk
+                            break
+                        # Data after the request body is ignored
+                        watcher = loop.create_future()
+                    event = await chunk
+                    if event is None:
+                        finished = True
+                        break
+                    writer.write(event.encode('utf-8'))
+                    await writer.drain()
+        finally:
+            watcher.cancel()
+            if not finished:
+                budget.cancel()
+            # Closing the generator closes a session that is still running
+            events.close()
+
+    async def example(self, name):
+        """Return an example, reading its file in a thread the first time"""
+        if not name or '/' in name or '\\' in name:
+            raise HttpError(404, "Not found")
+        cached = service.cached_example(name)
+        if cached is not None:
+            return cached
+        return await asyncio.get_running_loop().run_in_executor(None, service.load_example, name)
+
+    async def index(self):
+        """Return the IDE page, rendering the template the first time"""
+        if '/' not in self.files:
+            source = await self.read_file(TEMPLATE_PATH)
+            page = URL_FOR.sub(lambda match: f"/static/{match.group(1)}", source.decode('utf-8'))
+            self.files['/'] = page.encode('utf-8')
+        return self.files['/']
+
+    async def static(self, name, writer):
+        """Send a file from the static directory"""
+        path = os.path.normpath(name)
+        if path.startswith('..') or os.path.isabs(path):
+            raise HttpError(404, "Not found")
+        if path not in self.files:
+            try:
+                self.files[path] = await self.read_file(os.path.join(STATIC_DIR, path))
+            except OSError:
+                raise HttpError(404, "Not found")
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        await self.send(writer, 200, self.files[path], content_type)
+
+    async def read_file(self, path):
+        """Read a file in a thread so the event loop never blocks on disk"""
+        def read():
+            with open(path, 'rb') as file:
+                return file.read()
+        return await asyncio.get_running_loop().run_in_executor(None, read)
+
+    def head(self, status, content_type, headers=None, length=None):
+        """Encode the status line and headers of a response"""
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def send(self, writer, status, body, content_type, headers=None):
+        """Send a complete response"""
+        writer.write(self.head(status, content_type, headers, len(body)) + body)
+        await writer.drain()
+
+    async def send_json(self, writer, data, status=200, headers=None):
+        """Send a JSON response"""
+        await self.send(writer, status, json.dumps(data).encode('utf-8'), 'application/json', headers)
+
+async def serve(host, port):
+    """Accept connections until the process is stopped"""
+    server = Server()
+    listener = await asyncio.start_server(server.handle, host, port)
+    logger.info(f"Serving the VibeScript IDE on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the VibeScript IDE on asyncio")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service.start()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
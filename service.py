@@ -0,0 +1,396 @@
+"""
+Request handling shared by the Flask app (app.py) and the asyncio server
+(server.py): the configured engines, caches, sessions and worker pool, and
+functions that turn a request's JSON into the response to send back.
+
+These functions block while the program runs, so the asyncio server calls
+them from an executor.
+"""
+
+import os
+import json
+import atexit
+import logging
+import threading
+from vibescript.cache import ParseCache
+from vibescript.lexer import RegexLexer
+from vibescript.optimizer import Optimizer
+from vibescript.interpreter import Interpreter, InputRequestException, OutputBuffer, Budget, BudgetExceeded, Profiler
+from vibescript.sessions import SessionManager, Step
+from vibescript.pool import WorkerPool, Job, PoolBusy
+from vibescript.closures import ClosureInterpreter
+from vibescript.vm import VMInterpreter
+from vibescript.transpiler import PythonInterpreter
+
+logger = logging.getLogger(__name__)
+
+# Execution engines selectable through the 'engine' field of a /run request
+ENGINES = {
+    'tree': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VMInterpreter,
+    'python': PythonInterpreter,
+}
+DEFAULT_ENGINE = 'tree'
+
+# Engines that can profile a run ('profile': true), reporting time per line and function
+# and calls per built-in function
+PROFILING_ENGINES = {'tree'}
+
+# Optimizer passes applied to every program, minus the ones switched off
+DISABLED_PASSES = os.environ.get("VIBESCRIPT_DISABLED_PASSES", "").split(",")
+OPTIMIZER = Optimizer(disabled=DISABLED_PASSES)
+
+# Parsed and optimized programs shared by every request, keyed by a hash of their source
+# (with the worker pool on, each worker keeps a cache of this size instead)
+PARSE_CACHE = ParseCache(
+    max_bytes=int(os.environ.get("VIBESCRIPT_PARSE_CACHE_BYTES", 32 * 1024 * 1024)),
+    lexer_class=RegexLexer,
+    optimizer=OPTIMIZER
+)
+
+# Programs suspended at a vibe_check, waiting for the user's answer (with the
+# worker pool on, these limits are shared out between the workers instead)
+SESSIONS = SessionManager(
+    ttl=int(os.environ.get("VIBESCRIPT_SESSION_TTL", 300)),
+    max_sessions=int(os.environ.get("VIBESCRIPT_MAX_SESSIONS", 256))
+)
+
+# Characters of output kept per run before it is cut off with a marker
+MAX_OUTPUT = int(os.environ.get("VIBESCRIPT_MAX_OUTPUT", 1024 * 1024))
+STREAM_MAX_OUTPUT = int(os.environ.get("VIBESCRIPT_STREAM_MAX_OUTPUT", 8 * 1024 * 1024))
+
+# Limits on the work of a single run: loop iterations and calls, seconds
+# spent running (not waiting for input) and nesting depth of calls
+MAX_STEPS = int(os.environ.get("VIBESCRIPT_MAX_STEPS", 10000000))
+RUN_TIMEOUT = float(os.environ.get("VIBESCRIPT_RUN_TIMEOUT", 10))
+MAX_DEPTH = int(os.environ.get("VIBESCRIPT_MAX_DEPTH", 500))
+
+# Worker processes that run programs away from the web server, keeping
+# the sessions of the programs they suspended at a vibe_check
+# (VIBESCRIPT_WORKERS=0 runs them in the request thread instead)
+WORKERS = int(os.environ.get("VIBESCRIPT_WORKERS", os.cpu_count() or 1))
+POOL = None
+if WORKERS > 0:
+    POOL = WorkerPool(
+        size=WORKERS,
+        timeout=float(os.environ.get("VIBESCRIPT_KILL_TIMEOUT", RUN_TIMEOUT + 5)),
+        max_jobs=int(os.environ.get("VIBESCRIPT_WORKER_MAX_JOBS", 500)),
+        max_rss=int(os.environ.get("VIBESCRIPT_WORKER_MAX_RSS", 256 * 1024 * 1024)),
+        queue_size=int(os.environ.get("VIBESCRIPT_QUEUE_SIZE", WORKERS * 4)),
+        cache_bytes=PARSE_CACHE.max_bytes,
+        disabled_passes=DISABLED_PASSES,
+        session_ttl=SESSIONS.ttl,
+        max_sessions=SESSIONS.max_sessions
+    )
+
+# Directory the example programs are loaded from
+EXAMPLES_DIR = "examples"
+
+# Responses for examples loaded once, keyed by example name
+EXAMPLES = {}
+EXAMPLES_LOCK = threading.Lock()
+
+def start():
+    """Fork the worker pool ahead of the first request
+
+    Not done on import: the processes the pool forks import the main
+    module, and with it this one.
+    """
+    if POOL is not None:
+        POOL.start()
+        atexit.register(POOL.close)
+
+def make_budget(max_output=MAX_OUTPUT):
+    """Create the budget for one run"""
+    return Budget(max_steps=MAX_STEPS, timeout=RUN_TIMEOUT, max_depth=MAX_DEPTH, max_output=max_output)
+
+def run_program(data, budget=None):
+    """Execute a /run request and return its (response, status, headers)"""
+    if budget is None:
+        budget = make_budget(MAX_OUTPUT)
+    try:
+        # Resume a program suspended at a vibe_check
+        if data and data.get('session'):
+            if POOL is not None:
+                result = POOL.run(Job(session=data['session'], value=data.get('input', ''), budget=budget))
+                return session_response(result), 200, {}
+            step = SESSIONS.resume(data['session'], data.get('input', ''))
+            return step_response(step), 200, {}
+
+        code = data.get('code', '') if data else ''
+        inputs = data.get('inputs', {}) if data else {}
+        engine = data.get('engine', DEFAULT_ENGINE) if data else DEFAULT_ENGINE
+
+        if not code.strip():
+            return {'output': 'No code to execute!', 'error': None}, 200, {}
+
+        if engine not in ENGINES:
+            return {'output': '', 'error': f"Unknown engine: {engine}"}, 200, {}
+
+        profile = bool(data.get('profile'))
+        if profile and engine not in PROFILING_ENGINES:
+            return {'output': '', 'error': f"Profiling is not supported by the {engine} engine"}, 200, {}
+
+        logger.debug(f"Executing code: {code[:100]}...")
+
+        # A profiled run reports once it ends, so it cannot wait for input
+        interactive = data.get('interactive', True) and not profile
+        if POOL is not None:
+            result = POOL.run(Job(ENGINES[engine], code, inputs, MAX_OUTPUT, budget, profile, interactive=interactive))
+            if interactive:
+                return session_response(result), 200, {}
+            return result_response(result), 200, {}
+
+        # Parse the code (or reuse the cached parse) and set up the interpreter
+        program = PARSE_CACHE.parse(code)
+        interpreter = ENGINES[engine]()
+        interpreter.output_stream = OutputBuffer(limit=MAX_OUTPUT)
+        interpreter.budget = budget
+        if profile:
+            interpreter.profiler = Profiler()
+
+        # Set any provided inputs
+        interpreter.input_values = inputs
+
+        try:
+            # Run until the program finishes or suspends at a vibe_check
+            if interactive:
+                return step_response(SESSIONS.start(interpreter, program)), 200, {}
+
+            # Capture the output using the interpreter's output collector
+            interpreter.interpret(program)
+
+            return with_profile({
+                'output': interpreter.output.strip() if interpreter.output else 'Code executed successfully (no output)',
+                'error': None
+            }, interpreter, code), 200, {}
+
+        except InputRequestException as e:
+            # Return a special response indicating input is needed
+            return {
+                'input_requested': True,
+                'variable_name': e.variable_name,
+                'output': '',
+                'error': None
+            }, 200, {}
+
+        except BudgetExceeded as e:
+            # Show what the program printed before it was stopped
+            logger.warning(f"Run stopped: {e.message}")
+            return with_profile(budget_response(e, interpreter.output_stream.getvalue()), interpreter, code), 200, {}
+
+    except BudgetExceeded as e:
+        logger.warning(f"Run stopped: {e.message}")
+        return budget_response(e), 200, {}
+
+    except PoolBusy as e:
+        logger.warning("Rejected a run: every worker is busy")
+        return {'output': '', 'error': e.message}, 503, {'Retry-After': str(e.retry_after)}
+
+    except Exception as e:
+        logger.exception("Error executing code")
+        return {
+            'output': '',
+            'error': format_error(e)
+        }, 200, {}
+
+def stream_program(data, budget=None):
+    """Execute a /run/stream request, yielding its server-sent events"""
+    data = data or {}
+    if budget is None:
+        budget = make_budget(STREAM_MAX_OUTPUT)
+    try:
+        if POOL is not None:
+            yield from stream_in_pool(data, budget)
+            return
+
+        # Resume a program suspended at a vibe_check
+        if data.get('session'):
+            session = SESSIONS.take(data['session'])
+            value = data.get('input', '')
+        else:
+            code = data.get('code', '')
+            engine = data.get('engine', DEFAULT_ENGINE)
+
+            if not code.strip():
+                yield sse('output', {'output': 'No code to execute!'})
+                yield sse('done', {'truncated': False})
+                return
+
+            if engine not in ENGINES:
+                yield sse('error', {'error': f"Unknown engine: {engine}"})
+                return
+
+            logger.debug(f"Streaming code: {code[:100]}...")
+
+            interpreter = ENGINES[engine]()
+            interpreter.output_stream = OutputBuffer(limit=STREAM_MAX_OUTPUT)
+            interpreter.budget = budget
+            interpreter.input_values = data.get('inputs', {})
+            session = SESSIONS.open(interpreter, PARSE_CACHE.parse(code))
+            value = None
+
+        for kind, payload in SESSIONS.stream(session, value):
+            if kind == 'output':
+                yield sse('output', {'output': payload})
+            elif kind == 'input':
+                yield sse('input', {'variable_name': payload.variable_name, 'session': payload.token})
+            else:
+                yield sse('done', {'truncated': session.interpreter.output_stream.truncated})
+
+    except BudgetExceeded as e:
+        logger.warning(f"Run stopped: {e.message}")
+        yield sse('error', {'error': format_error(e), 'budget': budget_info(e)})
+
+    except Exception as e:
+        logger.exception("Error executing code")
+        yield sse('error', {'error': format_error(e)})
+
+def stream_in_pool(data, budget):
+    """Run a /run/stream request in a worker, yielding its server-sent events"""
+    if data.get('session'):
+        job = Job(session=data['session'], value=data.get('input', ''), budget=budget, stream=True)
+    else:
+        code = data.get('code', '')
+        engine = data.get('engine', DEFAULT_ENGINE)
+
+        if not code.strip():
+            yield sse('output', {'output': 'No code to execute!'})
+            yield sse('done', {'truncated': False})
+            return
+
+        if engine not in ENGINES:
+            yield sse('error', {'error': f"Unknown engine: {engine}"})
+            return
+
+        logger.debug(f"Streaming code: {code[:100]}...")
+        job = Job(ENGINES[engine], code, data.get('inputs', {}), STREAM_MAX_OUTPUT, budget,
+                  interactive=True, stream=True)
+
+    for kind, payload in POOL.stream(job):
+        if kind == 'output':
+            yield sse('output', {'output': payload})
+            continue
+        error = payload.exception()
+        if isinstance(error, BudgetExceeded):
+            logger.warning(f"Run stopped: {payload.error}")
+            yield sse('error', {'error': format_error(error), 'budget': budget_info(error)})
+        elif error is not None:
+            yield sse('error', {'error': format_error(error)})
+        elif payload.session is not None:
+            yield sse('input', {'variable_name': payload.variable_name, 'session': payload.session})
+        else:
+            yield sse('done', {'truncated': payload.truncated})
+
+def sse(event, data):
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def budget_info(e):
+    """Describe which budget a run exceeded"""
+    return {'name': e.budget, 'limit': e.limit}
+
+def budget_response(e, output=''):
+    """Build the /run response for a run stopped by its budget"""
+    return {'output': output.strip(), 'error': format_error(e), 'budget': budget_info(e)}
+
+def format_error(e):
+    """Format an exception raised by a run as a user-friendly message"""
+    if isinstance(e, BudgetExceeded):
+        return f"Runtime Error: {e.message}"
+    error_message = str(e)
+    if "line" in error_message.lower() or "column" in error_message.lower():
+        return f"Syntax Error: {error_message}"
+    return f"Runtime Error: {error_message}"
+
+def with_profile(response, interpreter, code):
+    """Add the hot spots of a profiled run to its /run response"""
+    if interpreter.profiler is not None:
+        response['profile'] = interpreter.profiler.report(code)
+    return response
+
+def result_response(result):
+    """Build the /run response for a program run by a worker"""
+    response = worker_response(result)
+    if result.profile is not None:
+        response['profile'] = result.profile
+    return response
+
+def worker_response(result):
+    """Build the /run response for a worker's result, leaving out its profile"""
+    error = result.exception()
+    if result.budget is not None:
+        logger.warning(f"Run stopped: {result.error}")
+        return budget_response(error, result.output)
+    if error is not None:
+        return {'output': '', 'error': format_error(error)}
+    if result.variable_name is not None:
+        return {
+            'input_requested': True,
+            'variable_name': result.variable_name,
+            'output': '',
+            'error': None
+        }
+    return {
+        'output': result.output.strip() if result.output else 'Code executed successfully (no output)',
+        'error': None
+    }
+
+def session_response(result):
+    """Build the /run response for a session a worker ran to its next stop"""
+    if result.error is not None:
+        return worker_response(result)
+    return step_response(Step(result.output, result.session, result.variable_name))
+
+def step_response(step):
+    """Build the /run response for a session that suspended or finished"""
+    if step.finished:
+        return {'output': step.output.strip(), 'finished': True, 'error': None}
+    return {
+        'input_requested': True,
+        'variable_name': step.variable_name,
+        'session': step.token,
+        'output': step.output.strip(),
+        'error': None
+    }
+
+def stats():
+    """Report parse cache, session and worker pool statistics"""
+    if POOL is not None:
+        # Programs run in the workers, each with its own parse cache and
+        # sessions, which the pool reports per worker
+        return {'parse_cache': None, 'sessions': None, 'pool': POOL.stats()}
+    return {
+        'parse_cache': PARSE_CACHE.stats(),
+        'sessions': SESSIONS.stats(),
+        'pool': None,
+    }
+
+def cached_example(example_name):
+    """Return the response for an example that was already loaded, or None"""
+    return EXAMPLES.get(example_name)
+
+def load_example(example_name):
+    """Load an example from the examples directory"""
+    try:
+        file_path = os.path.join(EXAMPLES_DIR, f"{example_name}.vs")
+        logger.debug(f"Loading example from: {file_path}")
+
+        if not os.path.exists(file_path):
+            logger.error(f"Example file not found: {file_path}")
+            return {'code': '', 'error': f"Example '{example_name}' not found"}
+
+        with open(file_path, 'r', encoding='utf-8') as file:
+            content = file.read()
+
+        logger.debug(f"Loaded example {example_name}: {len(content)} characters")
+        response = {'code': content, 'error': None}
+        # Examples only change with a deploy, so found ones are kept
+        with EXAMPLES_LOCK:
+            EXAMPLES[example_name] = response
+        return response
+
+    except Exception as e:
+        logger.exception(f"Error loading example {example_name}")
+        return {'code': '', 'error': f"Could not load example: {str(e)}"}
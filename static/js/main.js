@@ -5,7 +5,7 @@
  */
 
 // Execute the code in the editor
-function runCode(inputs = {}) {
+function runCode() {
   const code = getCode();
   const consoleOutput = document.getElementById('console-output');
   
@@ -14,10 +14,17 @@ function runCode(inputs = {}) {
     return;
   }
   
-  // Clear previous output if this is the first run (no inputs)
-  if (Object.keys(inputs).length === 0) {
-    consoleOutput.innerHTML = '';
-  }
+  // Clear previous output
+  consoleOutput.innerHTML = '';
+  consoleOutput.dataset.hasOutput = '';
+  
+  // Send code to server for execution
+  sendRun({ code: code });
+}
+
+// POST a run or resume request and render its events as they stream in
+function sendRun(payload) {
+  const consoleOutput = document.getElementById('console-output');
   
   // Disable run button during execution
   const runButton = document.getElementById('run-button');
@@ -26,38 +33,40 @@ function runCode(inputs = {}) {
     runButton.innerHTML = '<span class="spinner-border spinner-border-sm me-2" role="status" aria-hidden="true"></span>Running...';
   }
   
-  // Send code to server for execution
-  fetch('/run', {
+  // Printed text is appended to one block as it arrives
+  let outputBlock = null;
+  
+  const handleEvent = (event, data) => {
+    if (event === 'output') {
+      if (!outputBlock) {
+        outputBlock = document.createElement('div');
+        outputBlock.className = 'success-output';
+        consoleOutput.appendChild(outputBlock);
+      }
+      outputBlock.append(data.output);
+      consoleOutput.dataset.hasOutput = 'yes';
+    } else if (event === 'input') {
+      // The program is suspended on the server until the value arrives
+      handleInputRequest(data.variable_name, data.session);
+    } else if (event === 'error') {
+      appendOutput(consoleOutput, 'error-output', data.error, '<i class="bi bi-exclamation-triangle-fill me-2"></i>');
+    } else if (event === 'done' && !consoleOutput.dataset.hasOutput) {
+      appendOutput(consoleOutput, 'success-output', 'Code executed successfully (no output)');
+    }
+  };
+  
+  fetch('/run/stream', {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
     },
-    body: JSON.stringify({ 
-      code: code,
-      inputs: inputs 
-    }),
-  })
-  .then(response => response.json())
-  .then(data => {
-    // Handle input request
-    if (data.input_requested) {
-      handleInputRequest(data.variable_name, inputs);
-      return;
-    }
-    
-    // Display output or error in console only
-    if (data.error) {
-      consoleOutput.innerHTML = `<div class="error-output"><i class="bi bi-exclamation-triangle-fill me-2"></i>${data.error}</div>`;
-    } else if (data.output) {
-      consoleOutput.innerHTML = `<div class="success-output">${data.output}</div>`;
-    } else {
-      consoleOutput.innerHTML = '<div class="success-output">Code executed successfully (no output)</div>';
-    }
+    body: JSON.stringify(payload),
   })
+  .then(response => readEvents(response.body.getReader(), handleEvent))
   .catch(error => {
     // Handle network or other errors
     console.error('Error:', error);
-    consoleOutput.innerHTML = `<div class="error-output"><i class="bi bi-exclamation-triangle-fill me-2"></i>Failed to execute code: ${error.message}</div>`;
+    appendOutput(consoleOutput, 'error-output', `Failed to execute code: ${error.message}`, '<i class="bi bi-exclamation-triangle-fill me-2"></i>');
   })
   .finally(() => {
     // Re-enable run button
@@ -68,8 +77,43 @@ function runCode(inputs = {}) {
   });
 }
 
+// Read server-sent events from a response body and pass each one to handleEvent
+async function readEvents(reader, handleEvent) {
+  const decoder = new TextDecoder();
+  let buffer = '';
+  
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      
+      let event = 'message';
+      let data = '';
+      frame.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      handleEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+// Append a block of text to the console
+function appendOutput(consoleOutput, className, text, icon = '') {
+  const block = document.createElement('div');
+  block.className = className;
+  block.innerHTML = `${icon}${text}`;
+  consoleOutput.appendChild(block);
+}
+
 // Handle input requests from the interpreter
-function handleInputRequest(variableName, currentInputs) {
+function handleInputRequest(variableName, session) {
   const consoleOutput = document.getElementById('console-output');
   
   // Create simple input prompt like a normal IDE
@@ -91,15 +135,15 @@ function handleInputRequest(variableName, currentInputs) {
       // Handle Enter key
       inputField.addEventListener('keydown', function(e) {
         if (e.key === 'Enter') {
-          submitInput(variableName);
+          submitInput(variableName, session);
         }
       });
     }
   }, 100);
 }
 
-// Submit input value and continue execution
-function submitInput(variableName) {
+// Submit input value and resume execution
+function submitInput(variableName, session) {
   const inputField = document.getElementById(`input-${variableName}`);
   if (!inputField) return;
   
@@ -115,11 +159,8 @@ function submitInput(variableName) {
     inputPrompt.remove();
   }
   
-  // Continue execution with the input - no display of input value
-  const inputs = {};
-  inputs[variableName] = value;
-  
-  runCode(inputs);
+  // Continue execution from the vibe_check - no display of input value
+  sendRun({ session: session, input: value });
 }
 
 // Load an example file
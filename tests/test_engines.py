@@ -0,0 +1,277 @@
+"""
+Equivalence tests for the execution engines and front ends.
+
+Every example program and every edge case below is run through each engine
+(tree, closure, VM and Python), with the default optimizer passes and with
+none, lexed by both Lexer and RegexLexer. Each run must print the same
+output and end with the same error (or none) as the plain tree-walking
+interpreter on the unoptimized program.
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vibescript.lexer import Lexer, RegexLexer
+from vibescript.optimizer import Optimizer
+from vibescript.cache import ParseCache
+from vibescript.interpreter import Interpreter, OutputBuffer
+from vibescript.closures import ClosureInterpreter
+from vibescript.vm import VMInterpreter
+from vibescript.transpiler import PythonInterpreter
+
+ENGINES = {
+    'tree': Interpreter,
+    'closure': ClosureInterpreter,
+    'vm': VMInterpreter,
+    'python': PythonInterpreter,
+}
+
+LEXERS = {
+    'lexer': Lexer,
+    'regex': RegexLexer,
+}
+
+EXAMPLES_DIR = os.path.join(ROOT, "examples")
+
+# Answers to the vibe_checks of the examples and edge cases
+INPUTS = {
+    'user_name': "Sam",
+    'age': 20,
+    'is_student': True,
+    'x': "typed",
+}
+
+EDGE_CASES = {
+    # and_i_oop and as_if in a called function act on the caller's loop
+    'break_in_call': """
+        rizz_up stop() lets_go and_i_oop; yeet
+        lit i = 0;
+        lowkey (i < 5) lets_go spill_the_tea i; stop(); i = i + 1; yeet
+        spill_the_tea "after";
+    """,
+    'continue_in_call': """
+        rizz_up skip() lets_go as_if; yeet
+        highkey (lit i = 0; i < 4; i = i + 1) lets_go
+            no_cap (i % 2 == 0) lets_go skip(); yeet
+            spill_the_tea i;
+        yeet
+        lit j = 0;
+        lowkey (j < 4) lets_go
+            j = j + 1;
+            no_cap (j % 2 == 0) skip();
+            spill_the_tea j;
+        yeet
+    """,
+    'break_through_calls': """
+        rizz_up a() lets_go and_i_oop; yeet
+        rizz_up b() lets_go lit q = 1; slay a() + q; yeet
+        lit t = 0;
+        highkey (lit i = 0; i < 3; i = i + 1) lets_go
+            lets_go lit k = 1; t = t + 10 * b(); yeet
+        yeet
+        spill_the_tea t;
+    """,
+    'break_in_recursion': """
+        rizz_up r(d) lets_go no_cap (d == 0) lets_go and_i_oop; yeet r(d - 1); yeet
+        lit c = 0;
+        lowkey (this_slaps) lets_go c = c + 1; r(3); yeet
+        spill_the_tea c;
+    """,
+    'break_outside_loop': """
+        rizz_up stop() lets_go and_i_oop; yeet
+        spill_the_tea 1;
+        stop();
+        spill_the_tea 2;
+    """,
+    # Declarations in bodies that never ran leave their names undefined
+    'skipped_loop_declaration': "lowkey (im_dead) lit y = 3; spill_the_tea y;",
+    'skipped_for_declaration': "highkey (lit i = 0; i < 0; i = i + 1) lit y = 3; spill_the_tea y;",
+    'skipped_branch_declaration': "no_cap (this_slaps) spill_the_tea 1; cap lit y = 3; spill_the_tea y;",
+    'assign_before_declaration': "lowkey (im_dead) lit y = 3; y = 4; spill_the_tea y;",
+    'input_before_declaration': "lowkey (im_dead) lit x = 3; vibe_check x; spill_the_tea x;",
+    'global_read_too_early': "rizz_up f() lets_go slay g; yeet spill_the_tea f(); lit g = 1;",
+    'global_read_later': "rizz_up f() lets_go slay g; yeet lit g = 1; spill_the_tea f();",
+    # ... and a reference to such a name means the enclosing declaration
+    'falls_back_to_outer': """
+        lit y = 1;
+        lets_go
+            no_cap (im_dead) lit y = 2;
+            spill_the_tea y;
+            y = 7;
+        yeet
+        spill_the_tea y;
+    """,
+    'falls_back_to_outer_function': """
+        rizz_up h() lets_go slay 1; yeet
+        lets_go
+            no_cap (im_dead) rizz_up h() lets_go slay 2; yeet
+            spill_the_tea h();
+        yeet
+    """,
+    'shadowed_parameter': """
+        rizz_up f(x) lets_go
+            rizz_up g() lets_go slay x; yeet
+            spill_the_tea g();
+            lit x = 5;
+            spill_the_tea g();
+            slay x;
+        yeet
+        spill_the_tea f(1);
+    """,
+    'undefined_in_dead_code': "no_cap (im_dead) spill_the_tea nope; spill_the_tea 1;",
+    'undefined_after_output': "spill_the_tea 1; spill_the_tea nope;",
+    'not_a_function': "spill_the_tea 1; nope();",
+    # Functions: recursion, closures, repeated parameters, missing arguments
+    'recursion': """
+        rizz_up fib(n) lets_go no_cap (n < 2) slay n; slay fib(n - 1) + fib(n - 2); yeet
+        spill_the_tea fib(15);
+    """,
+    'repeated_parameter': "rizz_up f(a, a) lets_go slay a; yeet spill_the_tea f(1, 2);",
+    'missing_arguments': """
+        rizz_up f(a, b) lets_go spill_the_tea a; spill_the_tea b; yeet
+        f(1);
+        f();
+        f(1, 2, 3);
+    """,
+    'closure_over_loop': """
+        highkey (lit i = 0; i < 3; i = i + 1) lets_go
+            lit k = i * 10;
+            rizz_up show() lets_go slay k + i; yeet
+            spill_the_tea show();
+        yeet
+    """,
+    # Only the tree-walker runs tail calls as a loop, so this stays shallow
+    # enough for the engines that recurse on the Python stack
+    'tail_calls': """
+        rizz_up total(n, acc) lets_go no_cap (n == 0) slay acc; slay total(n - 1, acc + n); yeet
+        spill_the_tea total(150, 0);
+    """,
+    'redefined_function': """
+        rizz_up f() lets_go slay 1; yeet
+        spill_the_tea f();
+        rizz_up f() lets_go slay 2; yeet
+        spill_the_tea f();
+    """,
+    # Values and operators
+    'strings': """
+        tea s = "";
+        highkey (lit i = 0; i < 5; i = i + 1) s = s + i + ",";
+        spill_the_tea s;
+        spill_the_tea "n=" + 3 + 4;
+        spill_the_tea 3 + 4 + "=n";
+        spill_the_tea len(s) + " " + substring(s, 2, 4);
+    """,
+    'arithmetic': """
+        spill_the_tea 7 / 2;
+        spill_the_tea 7 % 3;
+        spill_the_tea -7 % 3;
+        spill_the_tea 2 * 3 - -4;
+        spill_the_tea this_slaps == 1;
+        spill_the_tea 1.5 + 1;
+    """,
+    'division_by_zero': "spill_the_tea 1; lit z = 0; spill_the_tea 5 / z;",
+    'defaults': "lit a; tea b; mood c; stan d; spill_the_tea a; spill_the_tea b + \"|\"; spill_the_tea c; spill_the_tea d;",
+    'stans': """
+        stan xs = [5, 3, 8, 1];
+        xs[1] = 4;
+        spill_the_tea xs;
+        spill_the_tea xs[2] + len(xs);
+        spill_the_tea sort(xs);
+        spill_the_tea sum(xs) + " " + min(xs) + " " + max(xs);
+        spill_the_tea filter(xs, ">", 3);
+        spill_the_tea add(range(3), 10);
+        spill_the_tea multiply(range(1, 7, 2), 2);
+        spill_the_tea ["a", 1, this_slaps];
+    """,
+    'index_out_of_range': "stan xs = [1]; spill_the_tea xs[0]; spill_the_tea xs[3];",
+    # Loops the optimizer rewrites: hoisted bounds, counted loops, dead branches
+    'hoisted_bounds': """
+        lit n = 5;
+        lit s = 0;
+        highkey (lit i = 0; i < n + 1; i = i + 1) lets_go
+            s = s + i;
+            no_cap (i == 2) as_if;
+            spill_the_tea i;
+        yeet
+        spill_the_tea s;
+        highkey (lit j = n * 2; j > n - 3; j = j - 3) spill_the_tea j;
+        lit k = 0;
+        lowkey (k < n * 2) k = k + 3;
+        spill_the_tea k;
+    """,
+    'folded_constants': """
+        spill_the_tea 2 + 3 * 4;
+        no_cap (1 > 2) spill_the_tea "never"; cap spill_the_tea "always";
+        rizz_up f() lets_go slay 1; spill_the_tea "unreachable"; yeet
+        spill_the_tea f();
+    """,
+    'input': "tea x; vibe_check x; spill_the_tea \"got \" + x;",
+    'missing_input': "tea other; spill_the_tea 1; vibe_check other;",
+}
+
+def load_examples():
+    """Return the example programs by name"""
+    programs = {}
+    for filename in sorted(os.listdir(EXAMPLES_DIR)):
+        if filename.endswith(".vs"):
+            with open(os.path.join(EXAMPLES_DIR, filename), 'r', encoding='utf-8') as file:
+                programs[filename[:-3]] = file.read()
+    return programs
+
+def run(engine, parse_cache, source):
+    """Run source on an engine and return what it printed and the error it ended with"""
+    interpreter = engine()
+    interpreter.output_stream = OutputBuffer()
+    interpreter.input_values = dict(INPUTS)
+    try:
+        interpreter.interpret(parse_cache.parse(source))
+    except Exception as e:
+        return interpreter.output_stream.getvalue(), f"{type(e).__name__}: {e}"
+    return interpreter.output_stream.getvalue(), None
+
+class EngineEquivalenceTest(unittest.TestCase):
+    """Every engine and front end must behave like the unoptimized tree-walker"""
+
+    def setUp(self):
+        # A cache per front end, shared by the engines like the server's is
+        self.caches = {}
+        for lexer_name, lexer_class in LEXERS.items():
+            for optimized in (False, True):
+                optimizer = Optimizer() if optimized else None
+                self.caches[lexer_name, optimized] = ParseCache(lexer_class=lexer_class, optimizer=optimizer)
+
+    def check(self, source):
+        """Assert that every configuration matches the reference run of source"""
+        reference = run(Interpreter, ParseCache(), source)
+        for (lexer_name, optimized), parse_cache in self.caches.items():
+            for engine_name, engine in ENGINES.items():
+                with self.subTest(engine=engine_name, lexer=lexer_name, optimized=optimized):
+                    self.assertEqual(run(engine, parse_cache, source), reference)
+
+    def test_examples(self):
+        for name, source in load_examples().items():
+            with self.subTest(example=name):
+                self.check(source)
+
+    def test_edge_cases(self):
+        for name, source in EDGE_CASES.items():
+            with self.subTest(case=name):
+                self.check(source)
+
+    def test_edge_case_outputs(self):
+        # The reference itself is right, not just consistent
+        self.assertEqual(run(Interpreter, ParseCache(), EDGE_CASES['break_in_call']), ("0\nafter\n", None))
+        self.assertEqual(run(Interpreter, ParseCache(), EDGE_CASES['repeated_parameter']), ("2\n", None))
+        self.assertEqual(run(Interpreter, ParseCache(), EDGE_CASES['shadowed_parameter']), ("1\n5\n5\n", None))
+        output, error = run(Interpreter, ParseCache(), EDGE_CASES['skipped_loop_declaration'])
+        self.assertEqual(output, "")
+        self.assertIn("Undefined variable: y", error)
+
+if __name__ == '__main__':
+    unittest.main()
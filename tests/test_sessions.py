@@ -0,0 +1,56 @@
+"""
+Tests for suspended sessions and their expiry.
+
+Usage: python -m pytest tests (or python -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vibescript.cache import ParseCache
+from vibescript.interpreter import Interpreter, OutputBuffer
+from vibescript.sessions import SessionManager, SessionError
+
+PROGRAM = "tea x; spill_the_tea 1; vibe_check x; spill_the_tea x;"
+
+def start(sessions):
+    """Start PROGRAM in a session and return its first step"""
+    interpreter = Interpreter()
+    interpreter.output_stream = OutputBuffer()
+    return sessions.start(interpreter, ParseCache().parse(PROGRAM))
+
+class SessionManagerTest(unittest.TestCase):
+
+    def test_resume(self):
+        sessions = SessionManager()
+        step = start(sessions)
+        self.assertEqual((step.output, step.variable_name), ("1\n", "x"))
+        step = sessions.resume(step.token, "hi")
+        self.assertTrue(step.finished)
+        self.assertEqual(step.output, "hi\n")
+
+    def test_idle_sessions_expire_without_requests(self):
+        sessions = SessionManager(ttl=0.05)
+        step = start(sessions)
+        thread = sessions.sessions[step.token].thread
+        # Nothing touches the manager; the reaper alone ends the session
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(sessions.stats()['expired'], 1)
+        with self.assertRaises(SessionError):
+            sessions.resume(step.token, "hi")
+
+    def test_reaper_stops_when_no_session_is_left(self):
+        sessions = SessionManager(ttl=0.05)
+        start(sessions)
+        deadline = time.monotonic() + 5
+        while sessions.reaper is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(sessions.reaper)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+"""
+VibeScript Built-in Functions
+
+This module holds the registry of functions every program can call
+without declaring them, implemented in Python. Every engine puts them in a
+scope around the global one that all runs share and no program can assign
+to; a program that declares a name of its own hides the built-in of that
+name. Calls to them skip the frame and parameter binding of a rizz_up
+call, and a profiled run counts the calls to each one.
+
+Besides len(), substring(), int() and str(), they are bulk operations over
+a whole stan: sum, min, max, elementwise add and multiply, filter, sort
+and range. Each one does in a single pass over the stan's storage what a
+highkey loop would do one element at a time, with the same result: the
+same operators are applied to the elements in the same order, so mixing
+types fails (or a tea coerces its partner) exactly as it would in the
+loop. None of them changes the stan it is given; those that return a stan
+return a new one.
+"""
+
+import operator
+from array import array
+from functools import reduce
+from itertools import compress, repeat
+from vibescript.stan import Stan, pack, type_name, typecode
+
+# Comparison operators filter() accepts, by their VibeScript spelling
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+class BuiltinError(Exception):
+    """Exception raised when a built-in function is called the wrong way"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class Builtin:
+    """A function implemented in Python"""
+
+    __slots__ = ('name', 'function', 'arity', 'max_arity')
+
+    def __init__(self, name, function, arity, max_arity=None):
+        self.name = name
+        self.function = function
+        self.arity = arity
+        self.max_arity = arity if max_arity is None else max_arity
+
+    def call(self, arguments):
+        """Call the function with a list of arguments"""
+        if not self.arity <= len(arguments) <= self.max_arity:
+            if self.max_arity != self.arity:
+                expected = f"{self.arity} to {self.max_arity} arguments"
+            else:
+                expected = f"{self.arity} argument{'' if self.arity == 1 else 's'}"
+            raise BuiltinError(f"{self.name}() takes {expected}, got {len(arguments)}")
+        return self.function(*arguments)
+
+    def __call__(self, *arguments):
+        return self.call(arguments)
+
+    def __repr__(self):
+        return f"<built-in {self.name}>"
+
+def length(value):
+    """len(x): the number of elements of a stan or characters of a tea"""
+    # Only stan and tea values (including the tree interpreter's ropes) have a length
+    try:
+        return len(value)
+    except TypeError:
+        raise BuiltinError(f"len() needs a stan or tea, got {type_name(value)}") from None
+
+def substring(text, start, stop=None):
+    """substring(s, start) or substring(s, start, stop): the characters of s from start up to stop"""
+    if text.__class__ is not str:
+        raise BuiltinError(f"substring() needs a tea, got {type_name(text)}")
+    if stop is None:
+        stop = len(text)
+    for bound in (start, stop):
+        if bound.__class__ is not int:
+            raise BuiltinError(f"substring() needs lit positions, got {type_name(bound)}")
+    # Like indexing, and unlike Python slices, positions past the ends are errors
+    if not 0 <= start <= stop <= len(text):
+        raise BuiltinError(f"substring() from {start} to {stop} is out of range for a tea of length {len(text)}")
+    return text[start:stop]
+
+def to_int(value):
+    """int(x): a lit from a lit (dropping any fraction), a mood or a tea of digits"""
+    kind = value.__class__
+    if kind is int:
+        return value
+    if kind is float or kind is bool:
+        try:
+            return int(value)
+        except (OverflowError, ValueError):
+            raise BuiltinError(f"int() cannot turn {value} into a lit") from None
+    if kind is str:
+        try:
+            return int(value)
+        except ValueError:
+            raise BuiltinError(f'int() cannot turn "{value}" into a lit') from None
+    raise BuiltinError(f"int() needs a lit, tea or mood, got {type_name(value)}")
+
+def to_str(value):
+    """str(x): x as a tea, written the way spill_the_tea prints it"""
+    return str(value)
+
+def elements(name, value):
+    """Return the storage of a stan argument"""
+    if value.__class__ is not Stan:
+        raise BuiltinError(f"{name}() needs a stan, got {type_name(value)}")
+    return value.items
+
+def plus(left, right):
+    """'+' with string coercion, as every engine evaluates it"""
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+def holds_tea(items):
+    """Whether a stan's storage holds any tea (a typed array never does)"""
+    return items.__class__ is list and str in set(map(type, items))
+
+def total(values):
+    """sum(xs): every element added to 0 in turn"""
+    items = elements('sum', values)
+    if items.__class__ is array:
+        return sum(items)
+    # reduce keeps the loop's order, where sum() would round floats differently
+    return reduce(plus if holds_tea(items) else operator.add, items, 0)
+
+def minimum(values):
+    """min(xs): the first element that no later element is < than"""
+    items = elements('min', values)
+    if not items:
+        raise BuiltinError("min() of an empty stan")
+    return min(items)
+
+def maximum(values):
+    """max(xs): the first element that no later element is > than"""
+    items = elements('max', values)
+    if not items:
+        raise BuiltinError("max() of an empty stan")
+    return max(items)
+
+def elementwise(name, values, other, function):
+    """Apply function to each element and other, or to pairs of elements if other is a stan"""
+    items = elements(name, values)
+    if other.__class__ is Stan:
+        others = other.items
+        if len(others) != len(items):
+            raise BuiltinError(f"{name}() needs stans of the same length, got {len(items)} and {len(others)}")
+        if function is operator.add and (holds_tea(items) or holds_tea(others)):
+            function = plus
+        return Stan(pack(list(map(function, items, others))))
+    if function is operator.add and (isinstance(other, str) or holds_tea(items)):
+        function = plus
+    return Stan(pack(list(map(function, items, repeat(other, len(items))))))
+
+def add(values, other):
+    """add(xs, y): a new stan of xs[i] + y, or xs[i] + y[i] if y is a stan"""
+    return elementwise('add', values, other, operator.add)
+
+def multiply(values, other):
+    """multiply(xs, y): a new stan of xs[i] * y, or xs[i] * y[i] if y is a stan"""
+    return elementwise('multiply', values, other, operator.mul)
+
+def keep(values, comparison, other):
+    """filter(xs, op, y): a new stan of the elements x for which x op y holds"""
+    items = elements('filter', values)
+    function = COMPARISONS.get(comparison) if comparison.__class__ is str else None
+    if function is None:
+        found = f'"{comparison}"' if comparison.__class__ is str else type_name(comparison)
+        raise BuiltinError(f"filter() needs one of {', '.join(COMPARISONS)} as its comparison, got {found}")
+    kept = compress(items, map(function, items, repeat(other, len(items))))
+    # A subset of a typed array fits in the same type
+    if items.__class__ is array:
+        return Stan(array(items.typecode, kept))
+    return Stan(pack(list(kept)))
+
+def sort(values):
+    """sort(xs): a new stan of the elements in ascending order, ties kept in order"""
+    items = elements('sort', values)
+    if items.__class__ is array:
+        return Stan(array(items.typecode, sorted(items)))
+    return Stan(pack(sorted(items)))
+
+def count(*arguments):
+    """range(stop), range(start, stop) or range(start, stop, step): a new stan of lits"""
+    for argument in arguments:
+        if argument.__class__ is not int:
+            raise BuiltinError(f"range() needs whole lit arguments, got {type_name(argument)}")
+    if len(arguments) == 3 and arguments[2] == 0:
+        raise BuiltinError("range() step must not be 0")
+    values = range(*arguments)
+    if not values:
+        return Stan()
+    code = typecode(min(values[0], values[-1]), max(values[0], values[-1]))
+    return Stan(array(code, values) if code else list(values))
+
+# Built-in functions by name, in the order their global slots are declared
+BUILTINS = {
+    'len': Builtin('len', length, 1),
+    'substring': Builtin('substring', substring, 2, 3),
+    'int': Builtin('int', to_int, 1),
+    'str': Builtin('str', to_str, 1),
+    'sum': Builtin('sum', total, 1),
+    'min': Builtin('min', minimum, 1),
+    'max': Builtin('max', maximum, 1),
+    'add': Builtin('add', add, 2),
+    'multiply': Builtin('multiply', multiply, 2),
+    'filter': Builtin('filter', keep, 3),
+    'sort': Builtin('sort', sort, 1),
+    'range': Builtin('range', count, 1, 3),
+}
@@ -0,0 +1,197 @@
+"""
+VibeScript Parse Cache
+
+This module keeps the front-end result for recently seen source code: the
+parsed (optionally optimized) and resolved Program, or the LexerError,
+ParserError or ResolverError it produced. Entries are keyed by a SHA-256
+of the source and evicted least-recently-used first once the estimated
+size of all entries exceeds a byte budget.
+
+A program is resolved (see vibescript.resolver) before its entry is
+published, so the threads that get it from the cache share an AST that no
+run resolves again under another; a program the resolver rejects is never
+handed out. While one thread builds the entry for a source, other threads
+asking for the same source wait for it instead of building their own.
+"""
+
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from vibescript.lexer import Lexer, LexerError
+from vibescript.parser import Parser, ParserError
+from vibescript.resolver import Resolver, ResolverError
+
+def source_key(source):
+    """Content address of a piece of source code"""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+def estimate_size(root):
+    """Approximate number of bytes held by an AST (or any object graph of nodes)"""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+        else:
+            # AST nodes and tokens keep their attributes in __slots__
+            for cls in type(obj).__mro__:
+                for name in cls.__dict__.get('__slots__', ()):
+                    value = getattr(obj, name, None)
+                    if value is not None:
+                        stack.append(value)
+    return total
+
+class CacheEntry:
+    """A cached front-end result"""
+
+    __slots__ = ('program', 'error', 'size')
+
+    def __init__(self, program, error, size):
+        self.program = program
+        self.error = error
+        self.size = size
+
+class PendingBuild:
+    """An entry one thread is building, which others asking for it wait on"""
+
+    __slots__ = ('done', 'entry')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+class ParseCache:
+    """Bounded LRU cache of parsed programs keyed by a hash of their source"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, lexer_class=Lexer, optimizer=None):
+        self.max_bytes = max_bytes
+        self.lexer_class = lexer_class
+        self.optimizer = optimizer
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejected = 0
+        self.optimized = {}
+
+    def parse(self, source):
+        """Return the Program for source, parsing it only on a cache miss"""
+        key = source_key(source)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                pending = self.pending.get(key)
+                building = pending is None
+                if building:
+                    pending = self.pending[key] = PendingBuild()
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.coalesced += 1
+
+        if entry is None and building:
+            try:
+                entry = pending.entry = self.build(key, source)
+                self.store(key, entry)
+            finally:
+                with self.lock:
+                    del self.pending[key]
+                pending.done.set()
+        elif entry is None:
+            pending.done.wait()
+            entry = pending.entry
+            if entry is None:
+                # The build failed outright: build again so its error is raised here too
+                entry = self.build(key, source)
+
+        if entry.error is not None:
+            # Drop the traceback of earlier raises so it does not keep growing
+            raise entry.error.with_traceback(None)
+        return entry.program
+
+    def build(self, key, source):
+        """Run the front end and package its result as an entry"""
+        try:
+            program = Parser(self.lexer_class(source)).parse()
+        except (LexerError, ParserError) as e:
+            return CacheEntry(None, e, sys.getsizeof(e) + sys.getsizeof(str(e)))
+
+        if self.optimizer is not None:
+            report = self.optimizer.optimize(program)
+            with self.lock:
+                for name, removed in report.items():
+                    self.optimized[name] = self.optimized.get(name, 0) + removed
+
+        # Resolve before the program is shared, so no run rewrites its nodes later
+        try:
+            Resolver().resolve(program)
+        except ResolverError as e:
+            return CacheEntry(None, e, sys.getsizeof(e) + sys.getsizeof(str(e)))
+
+        program.source_hash = key
+        return CacheEntry(program, None, estimate_size(program))
+
+    def store(self, key, entry):
+        """Insert an entry and evict the least recently used ones over budget"""
+        if entry.size > self.max_bytes:
+            with self.lock:
+                self.rejected += 1
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self.entries[key] = entry
+            self.bytes += entry.size
+
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+                self.evicted_bytes += evicted.size
+
+    def clear(self):
+        """Remove every entry (statistics are kept)"""
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and eviction statistics"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes,
+                'rejected': self.rejected,
+                'coalesced': self.coalesced,
+                'nodes_removed': dict(self.optimized),
+            }
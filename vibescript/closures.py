@@ -0,0 +1,490 @@
+"""
+VibeScript Closure Compiler
+
+This module compiles the AST generated by the parser into a tree of pre-bound
+Python closures. The tree is walked once up front, so running the program is
+a chain of direct function calls instead of a method lookup per node.
+"""
+
+import operator
+from vibescript.grammar import TOKEN_TYPES
+from vibescript.parser import BinaryExpression, LiteralExpression
+from vibescript.interpreter import (
+    Interpreter, SymbolTable, BUILTIN_TABLE,
+    BREAK, CONTINUE, Return, escape, BreakException, ContinueException
+)
+from vibescript.stan import Stan, pack, get_item, set_item
+
+# Operators that map directly onto Python operators
+SIMPLE_OPERATORS = {
+    TOKEN_TYPES['MINUS']: operator.sub,
+    TOKEN_TYPES['MULTIPLY']: operator.mul,
+    TOKEN_TYPES['EQUALS']: operator.eq,
+    TOKEN_TYPES['NOT_EQUALS']: operator.ne,
+    TOKEN_TYPES['LESS_THAN']: operator.lt,
+    TOKEN_TYPES['GREATER_THAN']: operator.gt,
+    TOKEN_TYPES['LESS_EQUALS']: operator.le,
+    TOKEN_TYPES['GREATER_EQUALS']: operator.ge,
+}
+
+# Operators that always produce a boolean
+COMPARISON_OPERATORS = {
+    TOKEN_TYPES['EQUALS'],
+    TOKEN_TYPES['NOT_EQUALS'],
+    TOKEN_TYPES['LESS_THAN'],
+    TOKEN_TYPES['GREATER_THAN'],
+    TOKEN_TYPES['LESS_EQUALS'],
+    TOKEN_TYPES['GREATER_EQUALS'],
+}
+
+class CompiledFunction:
+    """Represents a function whose body has been compiled into closures"""
+
+    def __init__(self, declaration, body, environment):
+        self.declaration = declaration
+        self.params = declaration.params
+        self.body = body
+        self.environment = environment
+
+    def call(self, arguments):
+        """Call the function with the given arguments"""
+        environment = SymbolTable(self.environment)
+        symbols = environment.symbols
+
+        # Bind parameters to arguments
+        count = len(arguments)
+        for i, param in enumerate(self.params):
+            symbols[param] = arguments[i] if i < count else None
+
+        signal = self.body(environment)
+        if signal is None:
+            return None
+        if signal.__class__ is Return:
+            return signal.value
+        escape(signal)
+
+class ClosureCompiler:
+    """Compiles VibeScript AST nodes into Python closures"""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def compile(self, node):
+        """Compile a statement node into a closure taking the environment"""
+        method_name = f"compile_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.compile_unknown)
+        return method(node)
+
+    def compile_unknown(self, node):
+        """Handle unknown node types"""
+        self.interpreter.error(f"Unknown node type: {node.__class__.__name__}")
+
+    def compile_Program(self, node):
+        """Compile a Program node"""
+        statements = [self.compile(statement) for statement in node.statements]
+
+        def run(env):
+            for statement in statements:
+                signal = statement(env)
+                if signal is not None:
+                    escape(signal)
+        return run
+
+    def compile_PrintStatement(self, node):
+        """Compile a PrintStatement node (spill_the_tea)"""
+        value = self.expression(node.expression)
+        write = self.interpreter.output_stream.write
+
+        def run(env):
+            write(str(value(env)) + "\n")
+        return run
+
+    def compile_InputStatement(self, node):
+        """Compile an InputStatement node (vibe_check)"""
+        interpreter = self.interpreter
+        name = node.variable
+
+        def run(env):
+            env.assign(name, interpreter.read_input(name))
+        return run
+
+    def compile_VariableDeclaration(self, node):
+        """Compile a VariableDeclaration node"""
+        name = node.name
+        value = self.expression(node.value) if node.value else None
+
+        if node.data_type == TOKEN_TYPES['STAN']:
+            # Lists are mutable, so every declaration needs a fresh default
+            def default():
+                return Stan()
+        else:
+            default_value = {
+                TOKEN_TYPES['LIT']: 0,
+                TOKEN_TYPES['TEA']: "",
+                TOKEN_TYPES['MOOD']: False,
+            }.get(node.data_type)
+
+            def default():
+                return default_value
+
+        if value is None:
+            def run(env):
+                env.symbols[name] = default()
+        else:
+            def run(env):
+                result = value(env)
+                env.symbols[name] = default() if result is None else result
+        return run
+
+    def compile_AssignmentStatement(self, node):
+        """Compile an AssignmentStatement node"""
+        name = node.variable
+        value = self.expression(node.expression)
+        error = self.interpreter.error
+
+        def run(env):
+            result = value(env)
+            # The built-in functions around the global table are read-only
+            while env is not BUILTIN_TABLE:
+                symbols = env.symbols
+                if name in symbols:
+                    symbols[name] = result
+                    return None
+                env = env.enclosing
+            error(f"Undefined variable: {name}")
+        return run
+
+    def compile_IndexAssignment(self, node):
+        """Compile an IndexAssignment node"""
+        target = self.expression(node.target)
+        index = self.expression(node.index)
+        value = self.expression(node.expression)
+
+        def run(env):
+            set_item(target(env), index(env), value(env))
+        return run
+
+    def compile_IfStatement(self, node):
+        """Compile an IfStatement node (no_cap)"""
+        condition = self.condition(node.condition)
+        if_block = self.compile(node.if_block)
+
+        if node.else_block is None:
+            def run(env):
+                if condition(env):
+                    return if_block(env)
+            return run
+
+        else_block = self.compile(node.else_block)
+
+        def run(env):
+            if condition(env):
+                return if_block(env)
+            return else_block(env)
+        return run
+
+    def compile_WhileStatement(self, node):
+        """Compile a WhileStatement node (lowkey)"""
+        condition = self.condition(node.condition)
+        block = self.loop_body(node.block)
+
+        def run(env):
+            while condition(env):
+                try:
+                    signal = block(env)
+                except BreakException:
+                    # and_i_oop or as_if in a function called from the body
+                    break
+                except ContinueException:
+                    signal = CONTINUE
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is not CONTINUE:
+                        return signal
+        return run
+
+    def compile_ForStatement(self, node):
+        """Compile a ForStatement node (highkey)"""
+        init = self.compile(node.init)
+        condition = self.condition(node.condition)
+        update = self.compile(node.update)
+        block = self.loop_body(node.block)
+
+        def run(env):
+            init(env)
+            while condition(env):
+                try:
+                    signal = block(env)
+                except BreakException:
+                    # and_i_oop or as_if in a function called from the body
+                    break
+                except ContinueException:
+                    signal = CONTINUE
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    if signal is not CONTINUE:
+                        return signal
+                # Continue still performs the update
+                update(env)
+        return run
+
+    def loop_body(self, node):
+        """Compile the body of a loop, counting every iteration against the budget"""
+        block = self.compile(node)
+        budget = self.interpreter.budget
+        if budget is None:
+            return block
+        tick = budget.tick
+
+        def run(env):
+            tick()
+            return block(env)
+        return run
+
+    def function_body(self, node):
+        """Compile the body of a function, counting every call against the budget"""
+        body = self.compile(node)
+        budget = self.interpreter.budget
+        if budget is None:
+            return body
+        enter = budget.enter
+        leave = budget.leave
+
+        def run(env):
+            enter()
+            try:
+                return body(env)
+            finally:
+                leave()
+        return run
+
+    def compile_FunctionDeclaration(self, node):
+        """Compile a FunctionDeclaration node (rizz_up)"""
+        name = node.name
+        body = self.function_body(node.body)
+
+        def run(env):
+            env.symbols[name] = CompiledFunction(node, body, env)
+        return run
+
+    def compile_ReturnStatement(self, node):
+        """Compile a ReturnStatement node (slay)"""
+        if node.expression is None:
+            def run(env):
+                return Return(None)
+            return run
+
+        value = self.expression(node.expression)
+
+        def run(env):
+            return Return(value(env))
+        return run
+
+    def compile_BreakStatement(self, node):
+        """Compile a BreakStatement node (and_i_oop)"""
+        def run(env):
+            return BREAK
+        return run
+
+    def compile_ContinueStatement(self, node):
+        """Compile a ContinueStatement node (as_if)"""
+        def run(env):
+            return CONTINUE
+        return run
+
+    def compile_BlockStatement(self, node):
+        """Compile a BlockStatement node (lets_go ... yeet)"""
+        statements = [self.compile(statement) for statement in node.statements]
+
+        if len(statements) == 1:
+            statement = statements[0]
+
+            def run(env):
+                return statement(SymbolTable(env))
+            return run
+
+        def run(env):
+            env = SymbolTable(env)
+            for statement in statements:
+                signal = statement(env)
+                if signal is not None:
+                    return signal
+        return run
+
+    def compile_ExpressionStatement(self, node):
+        """Compile an ExpressionStatement node"""
+        value = self.expression(node.expression)
+
+        def run(env):
+            value(env)
+        return run
+
+    def condition(self, node):
+        """Compile an expression used as a condition into a closure returning a bool"""
+        value = self.expression(node)
+
+        if isinstance(node, BinaryExpression) and node.operator.type in COMPARISON_OPERATORS:
+            return value
+
+        is_truthy = self.interpreter.is_truthy
+
+        def run(env):
+            return is_truthy(value(env))
+        return run
+
+    def expression(self, node):
+        """Compile an expression node into a closure taking the environment"""
+        method_name = f"expression_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.expression_unknown)
+        return method(node)
+
+    def expression_unknown(self, node):
+        """Handle unknown expression node types"""
+        self.interpreter.error(f"Unknown expression node type: {node.__class__.__name__}")
+
+    def expression_BinaryExpression(self, node):
+        """Compile a BinaryExpression node"""
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        operator_type = node.operator.type
+        error = self.interpreter.error
+
+        if operator_type == TOKEN_TYPES['PLUS']:
+            def run(env):
+                a = left(env)
+                b = right(env)
+                # Handle string concatenation
+                if isinstance(a, str) or isinstance(b, str):
+                    return str(a) + str(b)
+                return a + b
+            return run
+
+        if operator_type == TOKEN_TYPES['DIVIDE']:
+            def run(env):
+                a = left(env)
+                b = right(env)
+                if b == 0:
+                    error("Division by zero")
+                return a / b
+            return run
+
+        if operator_type == TOKEN_TYPES['MODULO']:
+            def run(env):
+                a = left(env)
+                b = right(env)
+                if b == 0:
+                    error("Division by zero")
+                return a % b
+            return run
+
+        op = SIMPLE_OPERATORS.get(operator_type)
+        if op is None:
+            error(f"Unknown binary operator: {operator_type}")
+
+        # Specialize the very common `variable op literal` shape
+        if isinstance(node.right, LiteralExpression):
+            constant = node.right.value
+
+            def run(env):
+                return op(left(env), constant)
+            return run
+
+        def run(env):
+            return op(left(env), right(env))
+        return run
+
+    def expression_UnaryExpression(self, node):
+        """Compile a UnaryExpression node"""
+        operand = self.expression(node.operand)
+
+        if node.operator.type == TOKEN_TYPES['MINUS']:
+            def run(env):
+                return -operand(env)
+            return run
+        elif node.operator.type == TOKEN_TYPES['PLUS']:
+            return operand
+
+        self.interpreter.error(f"Unknown unary operator: {node.operator.type}")
+
+    def expression_VariableExpression(self, node):
+        """Compile a VariableExpression node"""
+        name = node.name
+        error = self.interpreter.error
+
+        def run(env):
+            while env is not None:
+                symbols = env.symbols
+                if name in symbols:
+                    return symbols[name]
+                env = env.enclosing
+            error(f"Undefined variable: {name}")
+        return run
+
+    def expression_LiteralExpression(self, node):
+        """Compile a LiteralExpression node"""
+        value = node.value
+
+        def run(env):
+            return value
+        return run
+
+    def expression_ListExpression(self, node):
+        """Compile a ListExpression node"""
+        elements = [self.expression(element) for element in node.elements]
+
+        def run(env):
+            return Stan(pack([element(env) for element in elements]))
+        return run
+
+    def expression_IndexExpression(self, node):
+        """Compile an IndexExpression node"""
+        target = self.expression(node.target)
+        index = self.expression(node.index)
+
+        def run(env):
+            return get_item(target(env), index(env))
+        return run
+
+    def expression_FunctionCallExpression(self, node):
+        """Compile a FunctionCallExpression node"""
+        name = node.function
+        arguments = [self.expression(argument) for argument in node.arguments]
+        error = self.interpreter.error
+
+        def run(env):
+            function = None
+            scope = env
+            while scope is not None:
+                symbols = scope.symbols
+                if name in symbols:
+                    function = symbols[name]
+                    break
+                scope = scope.enclosing
+
+            if not function or not callable(getattr(function, 'call', None)):
+                error(f"'{name}' is not a function")
+
+            return function.call([argument(env) for argument in arguments])
+        return run
+
+class ClosureInterpreter(Interpreter):
+    """Interpreter that runs the program as a tree of pre-compiled closures"""
+
+    def interpret(self, program=None):
+        """Interpret the program (parsing it first unless a parsed one is given)"""
+        # Parse and compile the program
+        if program is None:
+            program = self.parser.parse()
+        code = ClosureCompiler(self).compile(program)
+
+        # Execute the program
+        self.start_budget()
+        try:
+            self.environment = self.global_table()
+            return code(self.environment)
+        except RecursionError:
+            self.too_deep()
+        finally:
+            self.output = self.output_stream.getvalue()
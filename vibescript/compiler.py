@@ -0,0 +1,465 @@
+"""
+VibeScript Bytecode Compiler
+
+This module lowers the AST generated by the parser into a flat instruction
+array that is executed by the stack-based virtual machine in vibescript.vm.
+
+Every instruction takes two slots in the array: an opcode and an integer
+argument. Jump targets are absolute offsets into the same array.
+"""
+
+import sys
+from vibescript.grammar import TOKEN_TYPES
+from vibescript.stan import Stan
+
+# Opcodes
+LOAD_CONST = 0          # push constants[arg]
+LOAD_NAME = 1           # push the value of variable names[arg]
+STORE_NAME = 2          # pop a value and assign it to the existing variable names[arg]
+DEFINE_NAME = 3         # pop a value and define names[arg] in the current scope
+DEFAULT = 4             # replace a None on top of the stack with DEFAULT_FACTORIES[arg]()
+POP = 5                 # discard the top of the stack
+PRINT = 6               # pop a value and write it to the output
+INPUT = 7               # assign the provided input to names[arg]
+BINARY_ADD = 8
+BINARY_SUBTRACT = 9
+BINARY_MULTIPLY = 10
+BINARY_DIVIDE = 11
+BINARY_MODULO = 12
+COMPARE_EQUALS = 13
+COMPARE_NOT_EQUALS = 14
+COMPARE_LESS_THAN = 15
+COMPARE_GREATER_THAN = 16
+COMPARE_LESS_EQUALS = 17
+COMPARE_GREATER_EQUALS = 18
+UNARY_NEGATIVE = 19
+JUMP = 20               # continue at offset arg
+POP_JUMP_IF_FALSE = 21  # pop a value and jump to offset arg if it is not truthy
+ENTER_SCOPE = 22        # open a new block scope
+EXIT_SCOPE = 23         # close arg block scopes
+MAKE_FUNCTION = 24      # define a function from the code object constants[arg]
+LOAD_FUNCTION = 25      # push the function named names[arg]
+CALL_FUNCTION = 26      # call a function with arg arguments from the stack
+RETURN_VALUE = 27       # pop a value and return it from the current function
+RAISE_BREAK = 28        # and_i_oop outside of a loop: leave the calls up to the caller's loop
+RAISE_CONTINUE = 29     # as_if outside of a loop: leave the calls up to the caller's loop
+BUILD_LIST = 30         # replace the top arg values of the stack with a stan of them
+LOAD_INDEX = 31         # pop an index and a stan or tea, push the element
+STORE_INDEX = 32        # pop a value, an index and a stan, store the element
+
+OPCODE_NAMES = {
+    value: name for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+# Opcodes whose argument is an index into the names table
+NAME_OPCODES = {LOAD_NAME, STORE_NAME, DEFINE_NAME, INPUT, LOAD_FUNCTION}
+
+# Opcodes whose argument is a jump target
+JUMP_OPCODES = {JUMP, POP_JUMP_IF_FALSE}
+
+# Default values for declarations without a value, indexed by DEFAULT's argument
+DEFAULT_FACTORIES = [
+    lambda: None,
+    lambda: 0,
+    lambda: "",
+    lambda: False,
+    Stan,
+]
+
+DEFAULT_KINDS = {
+    TOKEN_TYPES['LIT']: 1,
+    TOKEN_TYPES['TEA']: 2,
+    TOKEN_TYPES['MOOD']: 3,
+    TOKEN_TYPES['STAN']: 4,
+}
+
+BINARY_OPCODES = {
+    TOKEN_TYPES['PLUS']: BINARY_ADD,
+    TOKEN_TYPES['MINUS']: BINARY_SUBTRACT,
+    TOKEN_TYPES['MULTIPLY']: BINARY_MULTIPLY,
+    TOKEN_TYPES['DIVIDE']: BINARY_DIVIDE,
+    TOKEN_TYPES['MODULO']: BINARY_MODULO,
+    TOKEN_TYPES['EQUALS']: COMPARE_EQUALS,
+    TOKEN_TYPES['NOT_EQUALS']: COMPARE_NOT_EQUALS,
+    TOKEN_TYPES['LESS_THAN']: COMPARE_LESS_THAN,
+    TOKEN_TYPES['GREATER_THAN']: COMPARE_GREATER_THAN,
+    TOKEN_TYPES['LESS_EQUALS']: COMPARE_LESS_EQUALS,
+    TOKEN_TYPES['GREATER_EQUALS']: COMPARE_GREATER_EQUALS,
+}
+
+class CompilerError(Exception):
+    """Exception raised when an error occurs during compilation"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class CodeObject:
+    """A compiled function or program"""
+
+    def __init__(self, name, params=None):
+        self.name = name
+        self.params = params or []
+        self.instructions = []
+        self.constants = []
+        self.names = []
+        # Indexes into the tables above, keyed by (type, value) and by name
+        self.constant_indexes = {}
+        self.name_indexes = {}
+        # For each call made from a loop body, keyed by the offset the call
+        # returns to: (break target, continue target, scopes to close)
+        self.loop_calls = {}
+
+    def __repr__(self):
+        return f"<code {self.name}>"
+
+class Loop:
+    """Bookkeeping for the innermost loop while compiling its body"""
+
+    def __init__(self, scope_depth):
+        self.scope_depth = scope_depth
+        self.break_jumps = []
+        self.continue_jumps = []
+        # (return offset, scopes to close) of the calls made from the body
+        self.calls = []
+
+class Compiler:
+    """Compiles VibeScript AST nodes into bytecode"""
+
+    def __init__(self):
+        self.code = None
+        self.loops = []
+        self.scope_depth = 0
+
+    def error(self, message):
+        """Raise a compiler error"""
+        raise CompilerError(message)
+
+    def compile(self, program):
+        """Compile a Program node and return the code object for it"""
+        self.code = CodeObject('<program>')
+        for statement in program.statements:
+            self.statement(statement)
+        self.emit(LOAD_CONST, self.constant(None))
+        self.emit(RETURN_VALUE)
+        return self.code
+
+    # Emission helpers
+
+    def emit(self, opcode, arg=0):
+        """Append an instruction and return its offset"""
+        offset = len(self.code.instructions)
+        self.code.instructions.extend((opcode, arg))
+        return offset
+
+    def patch(self, offset, target=None):
+        """Point the jump at offset to target (default: the next instruction)"""
+        if target is None:
+            target = len(self.code.instructions)
+        self.code.instructions[offset + 1] = target
+
+    def here(self):
+        """Offset of the next instruction"""
+        return len(self.code.instructions)
+
+    def constant(self, value):
+        """Index of value in the constants table"""
+        # Keyed by type as well, so 1, 1.0 and this_slaps get entries of their own
+        key = (type(value), value)
+        indexes = self.code.constant_indexes
+        index = indexes.get(key)
+        if index is None:
+            constants = self.code.constants
+            index = indexes[key] = len(constants)
+            constants.append(value)
+        return index
+
+    def name(self, name):
+        """Index of name in the names table"""
+        indexes = self.code.name_indexes
+        index = indexes.get(name)
+        if index is None:
+            names = self.code.names
+            index = indexes[name] = len(names)
+            names.append(name)
+        return index
+
+    # Statements
+
+    def statement(self, node):
+        """Compile a statement node"""
+        method_name = f"statement_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.statement_unknown)
+        method(node)
+
+    def statement_unknown(self, node):
+        """Handle unknown node types"""
+        self.error(f"Unknown node type: {node.__class__.__name__}")
+
+    def statement_PrintStatement(self, node):
+        """Compile a PrintStatement node (spill_the_tea)"""
+        self.expression(node.expression)
+        self.emit(PRINT)
+
+    def statement_InputStatement(self, node):
+        """Compile an InputStatement node (vibe_check)"""
+        self.emit(INPUT, self.name(node.variable))
+
+    def statement_VariableDeclaration(self, node):
+        """Compile a VariableDeclaration node"""
+        if node.value:
+            self.expression(node.value)
+        else:
+            self.emit(LOAD_CONST, self.constant(None))
+        kind = DEFAULT_KINDS.get(node.data_type, 0)
+        if kind:
+            self.emit(DEFAULT, kind)
+        self.emit(DEFINE_NAME, self.name(node.name))
+
+    def statement_AssignmentStatement(self, node):
+        """Compile an AssignmentStatement node"""
+        self.expression(node.expression)
+        self.emit(STORE_NAME, self.name(node.variable))
+
+    def statement_IndexAssignment(self, node):
+        """Compile an IndexAssignment node"""
+        self.expression(node.target)
+        self.expression(node.index)
+        self.expression(node.expression)
+        self.emit(STORE_INDEX)
+
+    def statement_IfStatement(self, node):
+        """Compile an IfStatement node (no_cap)"""
+        self.expression(node.condition)
+        jump_to_else = self.emit(POP_JUMP_IF_FALSE)
+        self.statement(node.if_block)
+
+        if node.else_block is None:
+            self.patch(jump_to_else)
+            return
+
+        jump_to_end = self.emit(JUMP)
+        self.patch(jump_to_else)
+        self.statement(node.else_block)
+        self.patch(jump_to_end)
+
+    def statement_WhileStatement(self, node):
+        """Compile a WhileStatement node (lowkey)"""
+        start = self.here()
+        self.expression(node.condition)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+
+        loop = self.loop_body(node.block)
+        self.emit(JUMP, start)
+
+        self.patch(exit_jump)
+        self.close_loop(loop, start)
+
+    def statement_ForStatement(self, node):
+        """Compile a ForStatement node (highkey)"""
+        self.statement(node.init)
+
+        start = self.here()
+        self.expression(node.condition)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+
+        loop = self.loop_body(node.block)
+
+        # Continue still performs the update
+        update = self.here()
+        self.statement(node.update)
+        self.emit(JUMP, start)
+
+        self.patch(exit_jump)
+        self.close_loop(loop, update)
+
+    def loop_body(self, block):
+        """Compile the body of a loop and return its break/continue jumps"""
+        loop = Loop(self.scope_depth)
+        self.loops.append(loop)
+        try:
+            self.statement(block)
+        finally:
+            self.loops.pop()
+        return loop
+
+    def close_loop(self, loop, continue_target):
+        """Point the loop's break and continue jumps, and those of its calls, past the loop and to continue_target"""
+        end = self.here()
+        for offset in loop.break_jumps:
+            self.patch(offset, end)
+        for offset in loop.continue_jumps:
+            self.patch(offset, continue_target)
+        for offset, depth in loop.calls:
+            self.code.loop_calls[offset] = (end, continue_target, depth)
+
+    def statement_FunctionDeclaration(self, node):
+        """Compile a FunctionDeclaration node (rizz_up)"""
+        code = self.function(node)
+        self.emit(MAKE_FUNCTION, self.constant(code))
+        self.emit(DEFINE_NAME, self.name(node.name))
+
+    def function(self, node):
+        """Compile the body of a function into its own code object"""
+        outer = (self.code, self.loops, self.scope_depth)
+        self.code = CodeObject(node.name, node.params)
+        self.loops = []
+        self.scope_depth = 0
+        try:
+            self.statement(node.body)
+            self.emit(LOAD_CONST, self.constant(None))
+            self.emit(RETURN_VALUE)
+            return self.code
+        finally:
+            self.code, self.loops, self.scope_depth = outer
+
+    def statement_ReturnStatement(self, node):
+        """Compile a ReturnStatement node (slay)"""
+        if node.expression:
+            self.expression(node.expression)
+        else:
+            self.emit(LOAD_CONST, self.constant(None))
+        # Returning restores the caller's scope, so open scopes need no cleanup
+        self.emit(RETURN_VALUE)
+
+    def statement_BreakStatement(self, node):
+        """Compile a BreakStatement node (and_i_oop)"""
+        if not self.loops:
+            self.emit(RAISE_BREAK)
+            return
+        loop = self.loops[-1]
+        self.exit_scopes(loop)
+        loop.break_jumps.append(self.emit(JUMP))
+
+    def statement_ContinueStatement(self, node):
+        """Compile a ContinueStatement node (as_if)"""
+        if not self.loops:
+            self.emit(RAISE_CONTINUE)
+            return
+        loop = self.loops[-1]
+        self.exit_scopes(loop)
+        loop.continue_jumps.append(self.emit(JUMP))
+
+    def exit_scopes(self, loop):
+        """Close the block scopes opened since the start of the loop body"""
+        depth = self.scope_depth - loop.scope_depth
+        if depth:
+            self.emit(EXIT_SCOPE, depth)
+
+    def statement_BlockStatement(self, node):
+        """Compile a BlockStatement node (lets_go ... yeet)"""
+        self.emit(ENTER_SCOPE)
+        self.scope_depth += 1
+        for statement in node.statements:
+            self.statement(statement)
+        self.scope_depth -= 1
+        self.emit(EXIT_SCOPE, 1)
+
+    def statement_ExpressionStatement(self, node):
+        """Compile an ExpressionStatement node"""
+        self.expression(node.expression)
+        self.emit(POP)
+
+    # Expressions
+
+    def expression(self, node):
+        """Compile an expression node"""
+        method_name = f"expression_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.expression_unknown)
+        method(node)
+
+    def expression_unknown(self, node):
+        """Handle unknown expression node types"""
+        self.error(f"Unknown expression node type: {node.__class__.__name__}")
+
+    def expression_BinaryExpression(self, node):
+        """Compile a BinaryExpression node"""
+        opcode = BINARY_OPCODES.get(node.operator.type)
+        if opcode is None:
+            self.error(f"Unknown binary operator: {node.operator.type}")
+        self.expression(node.left)
+        self.expression(node.right)
+        self.emit(opcode)
+
+    def expression_UnaryExpression(self, node):
+        """Compile a UnaryExpression node"""
+        self.expression(node.operand)
+        if node.operator.type == TOKEN_TYPES['MINUS']:
+            self.emit(UNARY_NEGATIVE)
+        elif node.operator.type != TOKEN_TYPES['PLUS']:
+            self.error(f"Unknown unary operator: {node.operator.type}")
+
+    def expression_VariableExpression(self, node):
+        """Compile a VariableExpression node"""
+        self.emit(LOAD_NAME, self.name(node.name))
+
+    def expression_LiteralExpression(self, node):
+        """Compile a LiteralExpression node"""
+        self.emit(LOAD_CONST, self.constant(node.value))
+
+    def expression_ListExpression(self, node):
+        """Compile a ListExpression node"""
+        for element in node.elements:
+            self.expression(element)
+        self.emit(BUILD_LIST, len(node.elements))
+
+    def expression_IndexExpression(self, node):
+        """Compile an IndexExpression node"""
+        self.expression(node.target)
+        self.expression(node.index)
+        self.emit(LOAD_INDEX)
+
+    def expression_FunctionCallExpression(self, node):
+        """Compile a FunctionCallExpression node"""
+        self.emit(LOAD_FUNCTION, self.name(node.function))
+        for argument in node.arguments:
+            self.expression(argument)
+        self.emit(CALL_FUNCTION, len(node.arguments))
+        # and_i_oop or as_if in the callee ends up at this loop
+        if self.loops:
+            loop = self.loops[-1]
+            loop.calls.append((self.here(), self.scope_depth - loop.scope_depth))
+
+def disassemble(code, out=None):
+    """Return a human-readable listing of a code object and its nested functions"""
+    lines = [] if out is None else out
+    params = ', '.join(code.params)
+    lines.append(f"Disassembly of {code.name}({params}):")
+
+    targets = {
+        code.instructions[i + 1]
+        for i in range(0, len(code.instructions), 2)
+        if code.instructions[i] in JUMP_OPCODES
+    }
+    nested = []
+
+    for offset in range(0, len(code.instructions), 2):
+        opcode = code.instructions[offset]
+        arg = code.instructions[offset + 1]
+        marker = '>>' if offset in targets else '  '
+        detail = ''
+        if opcode in NAME_OPCODES:
+            detail = f"({code.names[arg]})"
+        elif opcode == LOAD_CONST:
+            detail = f"({code.constants[arg]!r})"
+        elif opcode == MAKE_FUNCTION:
+            detail = f"({code.constants[arg]!r})"
+            nested.append(code.constants[arg])
+        elif opcode in JUMP_OPCODES:
+            detail = f"(to {arg})"
+        lines.append(f"{marker} {offset:5d} {OPCODE_NAMES[opcode]:<24} {arg:<5d} {detail}".rstrip())
+
+    for function in nested:
+        lines.append('')
+        disassemble(function, lines)
+
+    return '\n'.join(lines) if out is None else lines
+
+if __name__ == '__main__':
+    from vibescript.lexer import Lexer
+    from vibescript.parser import Parser
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as file:
+        source = file.read()
+    print(disassemble(Compiler().compile(Parser(Lexer(source)).parse())))
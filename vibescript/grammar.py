@@ -53,6 +53,7 @@ TOKEN_TYPES = {
     'COMMA': ',',
     'SEMICOLON': ';',
     'COLON': ':',
+    'AT': '@',                         # decorator
     
     # Other
     'IDENTIFIER': 'IDENTIFIER',
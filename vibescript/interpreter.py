@@ -5,8 +5,29 @@ This module interprets the AST generated by the parser and executes the program.
 """
 
 import sys
-from io import StringIO
+import time
+import operator
 from vibescript.grammar import TOKEN_TYPES
+from vibescript.lexer import LineIndex
+from vibescript.resolver import Resolver
+from vibescript.memo import MemoCache, MISSING
+from vibescript.stan import Stan, pack, get_item, set_item
+from vibescript.builtins import BUILTINS, Builtin
+
+# Strings built with '+' become ropes once they are at least this long
+ROPE_LENGTH = 256
+
+# The one built-in function that takes ropes as they are
+LENGTH = BUILTINS['len']
+
+# Comparisons a counted highkey loop may test its counter with
+COUNTED_COMPARISONS = {
+    TOKEN_TYPES['LESS_THAN']: operator.lt,
+    TOKEN_TYPES['LESS_EQUALS']: operator.le,
+    TOKEN_TYPES['GREATER_THAN']: operator.gt,
+    TOKEN_TYPES['GREATER_EQUALS']: operator.ge,
+    TOKEN_TYPES['NOT_EQUALS']: operator.ne,
+}
 
 class InterpreterError(Exception):
     """Exception raised when an error occurs during interpretation"""
@@ -15,6 +36,14 @@ class InterpreterError(Exception):
         self.message = message
         super().__init__(message)
 
+class BudgetExceeded(InterpreterError):
+    """Exception raised when a run uses up one of its budgets"""
+    
+    def __init__(self, budget, limit, message):
+        self.budget = budget
+        self.limit = limit
+        super().__init__(message)
+
 class InputRequestException(Exception):
     """Exception raised when input is requested from user"""
     
@@ -61,6 +90,312 @@ class SymbolTable:
         else:
             return False
 
+class BuiltinTable(SymbolTable):
+    """The read-only symbol table of built-in functions around every global one"""
+    
+    def __init__(self):
+        super().__init__()
+        self.symbols.update(BUILTINS)
+    
+    def assign(self, name, value):
+        """Built-in functions cannot be assigned to"""
+        return False
+
+# Shared by every run of the name-based engines
+BUILTIN_TABLE = BuiltinTable()
+
+# Appended to the output of a program once it exceeds its output limit
+TRUNCATION_MARKER = "\n... output truncated ...\n"
+
+class OutputBuffer:
+    """Collects printed text as a list of chunks that is joined only when read"""
+    
+    def __init__(self, limit=None, listener=None):
+        self.chunks = []
+        self.size = 0
+        self.limit = limit
+        self.truncated = False
+        self.listener = listener
+    
+    def write(self, text):
+        """Append text, cutting it off at the output limit"""
+        if self.truncated:
+            return
+        if self.limit is not None and self.size + len(text) > self.limit:
+            text = text[:self.limit - self.size] + TRUNCATION_MARKER
+            self.truncated = True
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.listener is not None:
+            self.listener(text)
+    
+    def getvalue(self):
+        """Return everything written so far"""
+        return "".join(self.chunks)
+    
+    def since(self, index):
+        """Return the text written after the first index chunks and the new index"""
+        return "".join(self.chunks[index:]), len(self.chunks)
+
+# Ticks between two full budget checks (reading the clock and output size)
+CHECK_INTERVAL = 1024
+
+class Budget:
+    """Limits on the work one run may do, checked on loop back-edges and calls
+    
+    A step is one loop iteration or one function call: the statements a
+    program executes between two steps are bounded by its length. Any limit
+    left as None is not enforced. cancel() stops the run at its next step.
+    """
+    
+    def __init__(self, max_steps=None, timeout=None, max_depth=None, max_output=None):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.max_depth = max_depth
+        self.max_output = max_output
+        self.output_stream = None
+        self.deadline = None
+        self.steps = 0
+        self.depth = 0
+        self.interval = 0
+        self.countdown = 0
+        self.cancelled = False
+    
+    def start(self, output_stream):
+        """Reset the counters at the start of a run"""
+        self.output_stream = output_stream
+        self.deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        self.steps = 0
+        self.depth = 0
+        self.reset()
+    
+    def reset(self):
+        """Schedule the next full check"""
+        interval = CHECK_INTERVAL
+        if self.max_steps is not None:
+            interval = max(1, min(interval, self.max_steps - self.steps + 1))
+        self.interval = self.countdown = interval
+    
+    def tick(self):
+        """Count one step"""
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.check()
+    
+    def check(self):
+        """Count the steps since the last check and enforce every limit"""
+        self.steps += self.interval - self.countdown
+        if self.cancelled:
+            raise BudgetExceeded('cancelled', None, "Run cancelled")
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise BudgetExceeded('steps', self.max_steps,
+                                 f"Step budget exceeded: more than {self.max_steps} loop iterations and calls")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded('time', self.timeout,
+                                 f"Time budget exceeded: ran for more than {self.timeout:g} seconds")
+        if self.max_output is not None and self.output_stream.size > self.max_output:
+            raise BudgetExceeded('output', self.max_output,
+                                 f"Output budget exceeded: printed more than {self.max_output} characters")
+        self.reset()
+    
+    def enter(self):
+        """Count a function call, one level deeper than its caller"""
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            self.too_deep()
+        self.depth += 1
+        self.tick()
+    
+    def leave(self):
+        """Return from a function call"""
+        self.depth -= 1
+    
+    def too_deep(self):
+        """Raise the error for calls nested deeper than the depth limit"""
+        if self.max_depth is None:
+            raise BudgetExceeded('depth', None, "Depth budget exceeded: calls nested too deeply")
+        raise BudgetExceeded('depth', self.max_depth,
+                             f"Depth budget exceeded: calls nested more than {self.max_depth} deep")
+    
+    def cancel(self):
+        """Stop the run at its next step (safe to call from another thread)"""
+        self.cancelled = True
+        self.countdown = 0
+    
+    def extend(self, seconds):
+        """Move the deadline back by time spent waiting for the user"""
+        if self.deadline is not None:
+            self.deadline += seconds
+
+class Profiler:
+    """Hit counts and time per source line and per function of one run
+    
+    A line is charged the time of its statements minus the time of the
+    statements nested in them, so the lines of a loop body are not counted
+    again on the loop's own line. A function is charged the whole time of
+    its outermost calls, including everything they call. Built-in
+    functions are only counted, by name, and calls of user functions by
+    whether the inline cache of their call site hit.
+    """
+    
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        # [hits, time] by the offset of the statement
+        self.statements = {}
+        self.functions = {}
+        self.builtins = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bodies = {}
+        self.active = {}
+        self.nested = 0.0
+    
+    def declare(self, declaration):
+        """Remember a function declaration so calls to it are recognized"""
+        self.bodies[declaration.body] = declaration
+    
+    def count_line(self, offset, elapsed, nested):
+        """Record one execution of a statement starting at offset"""
+        entry = self.statements.get(offset)
+        if entry is None:
+            entry = self.statements[offset] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed - nested
+    
+    def count_call(self, declaration, elapsed, outermost):
+        """Record one call of a function"""
+        entry = self.functions.get(declaration)
+        if entry is None:
+            entry = self.functions[declaration] = [0, 0.0]
+        entry[0] += 1
+        if outermost:
+            entry[1] += elapsed
+    
+    def count_builtin(self, builtin):
+        """Record one call of a built-in function"""
+        self.builtins[builtin.name] = self.builtins.get(builtin.name, 0) + 1
+    
+    def count_site(self, hit):
+        """Record whether the inline cache of a call site held the function it called"""
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+    
+    def report(self, source, limit=20):
+        """Return the hottest lines and functions of source, most time first, and the call cache hit rate"""
+        index = LineIndex(source)
+        source_lines = source.splitlines()
+        # Statements are counted by offset; several of them may share a line
+        merged = {}
+        for offset, (hits, elapsed) in self.statements.items():
+            line = index.position(offset)[0]
+            entry = merged.get(line)
+            if entry is None:
+                entry = merged[line] = [0, 0.0]
+            entry[0] += hits
+            entry[1] += elapsed
+        lines = []
+        for line, (hits, elapsed) in merged.items():
+            entry = {'line': line, 'hits': hits, 'time_ms': round(elapsed * 1000, 3)}
+            if 0 < line <= len(source_lines):
+                entry['source'] = source_lines[line - 1].strip()
+            lines.append(entry)
+        functions = [
+            {
+                'name': declaration.name,
+                'line': index.position(declaration.offset)[0] if declaration.offset is not None else None,
+                'calls': calls,
+                'time_ms': round(elapsed * 1000, 3),
+            }
+            for declaration, (calls, elapsed) in self.functions.items()
+        ]
+        builtins = [{'name': name, 'calls': calls} for name, calls in self.builtins.items()]
+        lines.sort(key=lambda entry: (-entry['time_ms'], -entry['hits'], entry['line']))
+        functions.sort(key=lambda entry: (-entry['time_ms'], -entry['calls'], entry['name']))
+        builtins.sort(key=lambda entry: (-entry['calls'], entry['name']))
+        calls = self.cache_hits + self.cache_misses
+        call_sites = {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': round(self.cache_hits / calls, 3) if calls else None,
+        }
+        return {
+            'lines': lines[:limit],
+            'functions': functions[:limit],
+            'builtins': builtins[:limit],
+            'call_sites': call_sites,
+        }
+
+# The value of a slot whose declaration has not run yet (one in a branch or
+# loop body that was skipped, or further down than a function called early)
+UNSET = object()
+
+class Frame:
+    """Fixed-size array of variable slots for one resolved scope"""
+    
+    __slots__ = ('slots', 'enclosing')
+    
+    def __init__(self, size, enclosing=None):
+        self.slots = [UNSET] * size
+        self.enclosing = enclosing
+
+# The built-in functions, in a frame around every global frame that all runs
+# share; the resolver never lets an assignment reach it. Its last slot stays
+# unset: references to names declared nowhere are resolved to it
+BUILTIN_FRAME = Frame(len(BUILTINS) + 1)
+BUILTIN_FRAME.slots[:len(BUILTINS)] = BUILTINS.values()
+
+class Rope:
+    """A long tea value built with '+', joined into one str only when it is used
+    
+    Ropes made from one another share their list of parts and each one
+    covers the first count parts of it. Adding to the newest rope appends to
+    the list in place, so a loop doing s = s + x stays linear; adding to an
+    older rope copies the parts it covers first. The joined str is kept
+    once something prints, compares or measures the rope.
+    """
+    
+    __slots__ = ('parts', 'count', 'length', 'text')
+    
+    def __init__(self, parts, length):
+        self.parts = parts
+        self.count = len(parts)
+        self.length = length
+        self.text = None
+    
+    def add(self, text):
+        """Return the rope of this value followed by the str text"""
+        parts = self.parts
+        if len(parts) != self.count:
+            parts = parts[:self.count]
+        parts.append(text)
+        return Rope(parts, self.length + len(text))
+    
+    def __str__(self):
+        if self.text is None:
+            parts = self.parts
+            self.text = ''.join(parts if len(parts) == self.count else parts[:self.count])
+            # Later additions start from the joined text
+            self.parts = [self.text]
+            self.count = 1
+        return self.text
+    
+    def __len__(self):
+        return self.length
+
+def binding(declaration, count):
+    """Return the slots that follow count arguments in a frame of a function
+    
+    The arguments can simply be the first slots of the frame when there are
+    no more of them than parameters and the parameters take the first slots
+    in order (they do unless a name is repeated); otherwise return None.
+    Missing arguments are None, the body's own declarations start unset.
+    """
+    params = declaration.param_slots
+    if count > len(params) or params != list(range(len(params))):
+        return None
+    return [None] * (len(params) - count) + [UNSET] * (declaration.slot_count - len(params))
+
 class Function:
     """Represents a function in VibeScript"""
     
@@ -69,60 +404,209 @@ class Function:
         self.environment = environment
         self.interpreter = interpreter
     
-    def call(self, arguments):
-        """Call the function with the given arguments"""
-        # Create a new environment for the function scope
-        environment = SymbolTable(self.environment)
-        
-        # Bind parameters to arguments
-        for i, param in enumerate(self.declaration.params):
-            if i < len(arguments):
-                environment.define(param, arguments[i])
-            else:
-                environment.define(param, None)
+    def call(self, arguments, padding=None):
+        """Call the function with the given arguments
         
-        # Execute the function body with the new environment
-        previous_environment = self.interpreter.environment
-        self.interpreter.environment = environment
+        A call site that has worked out how its arguments fill the frame
+        (see binding) passes the padding that follows them, and the list of
+        arguments then becomes the frame's slots as it is.
+        """
+        declaration = self.declaration
+        function = self
+        interpreter = self.interpreter
+        budget = interpreter.budget
+        if budget is not None:
+            budget.enter()
+        previous_environment = interpreter.environment
+        # A body without a frame of its own is run statement by statement
+        # right here, unless the profiler has to see it to charge the call
+        statements = None
+        if not declaration.body.slot_count and interpreter.profiler is None:
+            statements = declaration.body.statements
         
-        return_value = None
         try:
-            self.interpreter.execute(self.declaration.body)
-        except ReturnValue as ret:
-            return_value = ret.value
+            # A self tail call (slay f(...) inside f) runs the body again
+            # here instead of nesting another call
+            while True:
+                # Create a new frame for the parameters (if there are any)
+                if not declaration.slot_count:
+                    environment = function.environment
+                elif padding is not None:
+                    environment = Frame(0, function.environment)
+                    environment.slots = arguments + padding
+                else:
+                    environment = Frame(declaration.slot_count, function.environment)
+                    slots = environment.slots
+                    
+                    # Bind parameters to arguments
+                    count = len(arguments)
+                    for i, slot in enumerate(declaration.param_slots):
+                        slots[slot] = arguments[i] if i < count else None
+                
+                # Execute the function body with the new environment
+                interpreter.environment = environment
+                if statements is None:
+                    signal = interpreter.execute(declaration.body)
+                else:
+                    signal = None
+                    for statement in statements:
+                        signal = interpreter.execute(statement)
+                        if signal is not None:
+                            break
+                if signal.__class__ is not TailCall:
+                    break
+                function, arguments, padding = signal.function, signal.arguments, signal.padding
+                if budget is not None:
+                    budget.tick()
         finally:
-            self.interpreter.environment = previous_environment
+            interpreter.environment = previous_environment
+            if budget is not None:
+                budget.leave()
         
-        return return_value
+        if signal is None:
+            return None
+        if signal.__class__ is Return:
+            return signal.value
+        escape(signal)
+
+class MemoizedFunction(Function):
+    """A pure function whose results are cached for the rest of the run"""
+    
+    def call(self, arguments, padding=None):
+        """Return the cached result for the arguments, calling the function on a miss"""
+        memo = self.interpreter.memo
+        key = memo.key(self.declaration, arguments)
+        if key is None:
+            return Function.call(self, arguments, padding)
+        value = memo.get(key)
+        if value is MISSING:
+            value = Function.call(self, arguments, padding)
+            memo.put(key, value)
+        return value
 
 class ReturnValue(Exception):
-    """Exception used to handle return statements"""
+    """Exception raised when a return statement escapes to the top level"""
     
     def __init__(self, value):
         self.value = value
         super().__init__()
 
+class Signal:
+    """Completion signal returned by a statement that interrupts control flow"""
+    
+    __slots__ = ('name',)
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __repr__(self):
+        return f"<{self.name}>"
+
+# Statements complete normally by returning None, or return one of these
+BREAK = Signal('break')
+CONTINUE = Signal('continue')
+
+class Return:
+    """Completion signal carrying the value of a return statement (slay)"""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+
+class TailCall:
+    """Completion signal of slay f(...) inside f: call f again in the same Python frame"""
+    
+    __slots__ = ('function', 'arguments', 'padding')
+    
+    def __init__(self, function, arguments, padding):
+        self.function = function
+        self.arguments = arguments
+        self.padding = padding
+
+def escape(signal):
+    """Raise the exception for a completion signal that left its loop or function"""
+    if signal is BREAK:
+        raise BreakException()
+    if signal is CONTINUE:
+        raise ContinueException()
+    raise ReturnValue(signal.value)
+
 class Interpreter:
     """Interpreter for VibeScript AST"""
     
-    def __init__(self, parser):
+    def __init__(self, parser=None):
         self.parser = parser
-        self.environment = SymbolTable()
-        self.output_stream = StringIO()
+        self.environment = None
+        self.output_stream = OutputBuffer()
         self.output = ""
         self.input_values = {}
+        self.input_provider = None
+        self.budget = None
+        self.profiler = None
+        self.memo = None
     
     def error(self, message):
         """Raise an interpreter error"""
         raise InterpreterError(message)
     
-    def interpret(self):
-        """Interpret the program"""
-        # Parse the program
-        program = self.parser.parse()
+    def read_input(self, name):
+        """Return the value for a vibe_check of name"""
+        if name in self.input_values:
+            return self.input_values[name]
+        # A session suspends the program here until the user answers
+        if self.input_provider is not None:
+            if self.budget is None:
+                return self.input_provider(name)
+            # Time spent waiting for the user does not count against the run
+            started = time.monotonic()
+            try:
+                return self.input_provider(name)
+            finally:
+                self.budget.extend(time.monotonic() - started)
+        # Otherwise ask the caller to re-run the program with the value
+        raise InputRequestException(name)
+    
+    def interpret(self, program=None):
+        """Interpret the program (parsing it first unless a parsed one is given)"""
+        # Parse the program and bind every name to a frame slot
+        if program is None:
+            program = self.parser.parse()
+        if not getattr(program, 'resolved', False):
+            Resolver().resolve(program)
+        
+        # Route every statement through the profiler only when profiling,
+        # so a normal run executes exactly as it would without one
+        if self.profiler is not None:
+            self.execute = self.execute_profiled
         
-        # Execute the program
-        return self.execute(program)
+        # Execute the program in a fresh global frame, with no results cached yet
+        self.environment = self.global_frame(program)
+        self.memo = MemoCache()
+        self.start_budget()
+        try:
+            return self.execute(program)
+        except RecursionError:
+            self.too_deep()
+        finally:
+            self.output = self.output_stream.getvalue()
+    
+    def global_frame(self, program):
+        """Create the global frame of a resolved program, inside the built-in one"""
+        return Frame(program.slot_count, BUILTIN_FRAME)
+    
+    def global_table(self):
+        """Create the global symbol table of the name-based engines, inside the built-in one"""
+        return SymbolTable(BUILTIN_TABLE)
+    
+    def start_budget(self):
+        """Reset the budget (if any) before the program starts running"""
+        if self.budget is not None:
+            self.budget.start(self.output_stream)
+    
+    def too_deep(self):
+        """Report Python running out of stack as exceeding the depth budget"""
+        (self.budget or Budget()).too_deep()
     
     def execute(self, node):
         """Execute a node in the AST"""
@@ -131,16 +615,48 @@ class Interpreter:
         method = getattr(self, method_name, self.execute_unknown)
         return method(node)
     
+    def execute_profiled(self, node):
+        """Execute a node, charging its time to its line and function"""
+        profiler = self.profiler
+        name = node.__class__.__name__
+        if name == 'FunctionDeclaration':
+            profiler.declare(node)
+        declaration = profiler.bodies.get(node)
+        offset = node.offset if name not in ('Program', 'BlockStatement') else None
+        if offset is None and declaration is None:
+            return Interpreter.execute(self, node)
+        
+        if declaration is not None:
+            active = profiler.active.get(declaration, 0)
+            profiler.active[declaration] = active + 1
+        outer = profiler.nested
+        profiler.nested = 0.0
+        start = profiler.clock()
+        try:
+            return Interpreter.execute(self, node)
+        finally:
+            elapsed = profiler.clock() - start
+            if offset is not None:
+                profiler.count_line(offset, elapsed, profiler.nested)
+                profiler.nested = outer + elapsed
+            else:
+                # A function body is not a line of its own: the lines it ran
+                # still count as nested in the line that made the call
+                profiler.nested += outer
+            if declaration is not None:
+                profiler.active[declaration] = active
+                profiler.count_call(declaration, elapsed, active == 0)
+    
     def execute_unknown(self, node):
         """Handle unknown node types"""
         self.error(f"Unknown node type: {node.__class__.__name__}")
     
     def execute_Program(self, node):
         """Execute a Program node"""
-        result = None
         for statement in node.statements:
-            result = self.execute(statement)
-        return result
+            signal = self.execute(statement)
+            if signal is not None:
+                escape(signal)
     
     def execute_PrintStatement(self, node):
         """Execute a PrintStatement node (spill_the_tea)"""
@@ -149,19 +665,16 @@ class Interpreter:
         
         # Write to output stream for web interface
         self.output_stream.write(print_value + "\n")
-        self.output = self.output_stream.getvalue()
     
     def execute_InputStatement(self, node):
         """Execute an InputStatement node (vibe_check)"""
-        # Check if we have a pre-provided input value
-        if hasattr(self, 'input_values') and node.variable in self.input_values:
-            value = self.input_values[node.variable]
-            self.environment.assign(node.variable, value)
-            # Don't show input message - just silently assign the value
-            self.output = self.output_stream.getvalue()
-        else:
-            # Request input from user
-            raise InputRequestException(node.variable)
+        value = self.read_input(node.variable)
+        # An input for a variable that was never declared is dropped
+        if node.slot is not None:
+            slots, slot = self.declared(node)
+            if slots is not None:
+                slots[slot] = value
+        # Don't show input message - just silently assign the value
     
     def execute_VariableDeclaration(self, node):
         """Execute a VariableDeclaration node"""
@@ -178,16 +691,26 @@ class Interpreter:
             elif node.data_type == TOKEN_TYPES['MOOD']:
                 value = False
             elif node.data_type == TOKEN_TYPES['STAN']:
-                value = []
+                value = Stan()
         
-        self.environment.define(node.name, value)
+        self.environment.slots[node.slot] = value
     
     def execute_AssignmentStatement(self, node):
         """Execute an AssignmentStatement node"""
         value = self.evaluate(node.expression)
-        
-        if not self.environment.assign(node.variable, value):
+        slots, slot = self.declared(node)
+        if slots is None:
             self.error(f"Undefined variable: {node.variable}")
+        slots[slot] = value
+    
+    def execute_IndexAssignment(self, node):
+        """Execute an IndexAssignment node"""
+        target = self.evaluate(node.target)
+        index = self.evaluate(node.index)
+        value = self.evaluate(node.expression)
+        if value.__class__ is Rope:
+            value = str(value)
+        set_item(target, index, value)
     
     def execute_IfStatement(self, node):
         """Execute an IfStatement node (no_cap)"""
@@ -198,71 +721,147 @@ class Interpreter:
     
     def execute_WhileStatement(self, node):
         """Execute a WhileStatement node (lowkey)"""
+        budget = self.budget
         while self.is_truthy(self.evaluate(node.condition)):
+            if budget is not None:
+                budget.tick()
             try:
-                self.execute(node.block)
+                signal = self.execute(node.block)
             except BreakException:
+                # and_i_oop or as_if in a function called from the body
                 break
             except ContinueException:
-                continue
+                signal = CONTINUE
+            if signal is not None:
+                if signal is BREAK:
+                    break
+                if signal is not CONTINUE:
+                    return signal
     
     def execute_ForStatement(self, node):
         """Execute a ForStatement node (highkey)"""
         # Initialize
         self.execute(node.init)
         
+        # A counted loop (see the resolver) whose variable starts as a lit runs
+        # on a native counter; profiled runs keep the update's statistics
+        counted = node.counted
+        if counted is not None and self.profiler is None:
+            slots = self.environment.slots
+            if slots[counted[0]].__class__ is int:
+                return self.run_counted_loop(node, slots)
+        
         # Execute loop
+        budget = self.budget
         while self.is_truthy(self.evaluate(node.condition)):
+            if budget is not None:
+                budget.tick()
+            # Execute block
             try:
-                # Execute block
-                self.execute(node.block)
-                
-                # Update
-                self.evaluate(node.update)
+                signal = self.execute(node.block)
+            except BreakException:
+                # and_i_oop or as_if in a function called from the body
+                break
+            except ContinueException:
+                signal = CONTINUE
+            if signal is not None:
+                if signal is BREAK:
+                    break
+                if signal is not CONTINUE:
+                    return signal
+            
+            # Update (continue still needs to update the loop variable)
+            self.execute(node.update)
+    
+    def run_counted_loop(self, node, slots):
+        """Run a counted ForStatement, whose variable nothing but the loop writes"""
+        slot, comparison, limit, constant, step = node.counted
+        compare = COUNTED_COMPARISONS[comparison]
+        evaluate = self.evaluate
+        budget = self.budget
+        counter = slots[slot]
+        if constant:
+            bound = limit.value
+        
+        while True:
+            # Only the right side of the condition needs evaluating
+            if not constant:
+                bound = evaluate(limit)
+                if bound.__class__ is Rope:
+                    bound = str(bound)
+            if not compare(counter, bound):
+                break
+            if budget is not None:
+                budget.tick()
+            try:
+                signal = self.execute(node.block)
             except BreakException:
+                # and_i_oop or as_if in a function called from the body
                 break
             except ContinueException:
-                # Still need to update the loop variable
-                self.evaluate(node.update)
-                continue
+                signal = CONTINUE
+            if signal is not None:
+                if signal is BREAK:
+                    break
+                if signal is not CONTINUE:
+                    return signal
+            
+            # The update, which continue still performs
+            counter += step
+            slots[slot] = counter
     
     def execute_FunctionDeclaration(self, node):
         """Execute a FunctionDeclaration node (rizz_up)"""
-        function = Function(node, self.environment, self)
-        self.environment.define(node.name, function)
+        function_class = MemoizedFunction if node.memoize else Function
+        self.environment.slots[node.slot] = function_class(node, self.environment, self)
     
     def execute_ReturnStatement(self, node):
         """Execute a ReturnStatement node (slay)"""
+        if node.tail_call is not None:
+            call = node.expression
+            function = self.frame(call.depth).slots[call.slot]
+            if isinstance(function, Function) and function.declaration is node.tail_call:
+                cache = call.cache
+                if cache is not None and cache[0] is node.tail_call:
+                    if self.profiler is not None:
+                        self.profiler.count_site(True)
+                else:
+                    cache = self.cache_call(call, node.tail_call)
+                return TailCall(function, [self.evaluate(arg) for arg in call.arguments], cache[1])
+        
         value = None
         if node.expression:
             value = self.evaluate(node.expression)
         
-        raise ReturnValue(value)
+        return Return(value)
     
     def execute_BreakStatement(self, node):
         """Execute a BreakStatement node (and_i_oop)"""
-        raise BreakException()
+        return BREAK
     
     def execute_ContinueStatement(self, node):
         """Execute a ContinueStatement node (as_if)"""
-        raise ContinueException()
+        return CONTINUE
     
     def execute_BlockStatement(self, node):
         """Execute a BlockStatement node (lets_go ... yeet)"""
-        # Create a new environment for the block
+        # Create a new frame for the block (if it declares anything)
         previous_environment = self.environment
-        self.environment = SymbolTable(previous_environment)
+        if node.slot_count:
+            self.environment = Frame(node.slot_count, previous_environment)
         
         try:
             for statement in node.statements:
-                self.execute(statement)
+                signal = self.execute(statement)
+                if signal is not None:
+                    return signal
         finally:
             # Restore the previous environment
             self.environment = previous_environment
     
     def execute_ExpressionStatement(self, node):
         """Execute an ExpressionStatement node"""
-        return self.evaluate(node.expression)
+        self.evaluate(node.expression)
     
     def evaluate(self, node):
         """Evaluate an expression node"""
@@ -279,42 +878,59 @@ class Interpreter:
         """Evaluate a BinaryExpression node"""
         left = self.evaluate(node.left)
         right = self.evaluate(node.right)
+        operator = node.operator.type
         
-        if node.operator.type == TOKEN_TYPES['PLUS']:
+        if operator == TOKEN_TYPES['PLUS']:
             # Handle string concatenation
-            if isinstance(left, str) or isinstance(right, str):
-                return str(left) + str(right)
+            if left.__class__ is Rope:
+                return left.add(str(right))
+            if isinstance(left, str) or isinstance(right, str) or right.__class__ is Rope:
+                left = str(left)
+                right = str(right)
+                # Long strings grow as ropes instead of being copied each time
+                if len(left) + len(right) >= ROPE_LENGTH:
+                    return Rope([left, right], len(left) + len(right))
+                return left + right
             return left + right
-        elif node.operator.type == TOKEN_TYPES['MINUS']:
+        
+        # Every other operator sees a rope as the str it stands for
+        if left.__class__ is Rope:
+            left = str(left)
+        if right.__class__ is Rope:
+            right = str(right)
+        
+        if operator == TOKEN_TYPES['MINUS']:
             return left - right
-        elif node.operator.type == TOKEN_TYPES['MULTIPLY']:
+        elif operator == TOKEN_TYPES['MULTIPLY']:
             return left * right
-        elif node.operator.type == TOKEN_TYPES['DIVIDE']:
+        elif operator == TOKEN_TYPES['DIVIDE']:
             if right == 0:
                 self.error("Division by zero")
             return left / right
-        elif node.operator.type == TOKEN_TYPES['MODULO']:
+        elif operator == TOKEN_TYPES['MODULO']:
             if right == 0:
                 self.error("Division by zero")
             return left % right
-        elif node.operator.type == TOKEN_TYPES['EQUALS']:
+        elif operator == TOKEN_TYPES['EQUALS']:
             return left == right
-        elif node.operator.type == TOKEN_TYPES['NOT_EQUALS']:
+        elif operator == TOKEN_TYPES['NOT_EQUALS']:
             return left != right
-        elif node.operator.type == TOKEN_TYPES['LESS_THAN']:
+        elif operator == TOKEN_TYPES['LESS_THAN']:
             return left < right
-        elif node.operator.type == TOKEN_TYPES['GREATER_THAN']:
+        elif operator == TOKEN_TYPES['GREATER_THAN']:
             return left > right
-        elif node.operator.type == TOKEN_TYPES['LESS_EQUALS']:
+        elif operator == TOKEN_TYPES['LESS_EQUALS']:
             return left <= right
-        elif node.operator.type == TOKEN_TYPES['GREATER_EQUALS']:
+        elif operator == TOKEN_TYPES['GREATER_EQUALS']:
             return left >= right
         
-        self.error(f"Unknown binary operator: {node.operator.type}")
+        self.error(f"Unknown binary operator: {operator}")
     
     def evaluate_UnaryExpression(self, node):
         """Evaluate a UnaryExpression node"""
         operand = self.evaluate(node.operand)
+        if operand.__class__ is Rope:
+            operand = str(operand)
         
         if node.operator.type == TOKEN_TYPES['MINUS']:
             return -operand
@@ -325,20 +941,77 @@ class Interpreter:
     
     def evaluate_VariableExpression(self, node):
         """Evaluate a VariableExpression node"""
-        value = self.environment.get(node.name)
-        
-        if value is None and not self.environment.contains(node.name):
-            self.error(f"Undefined variable: {node.name}")
-            
+        frame = self.environment
+        depth = node.depth
+        while depth:
+            frame = frame.enclosing
+            depth -= 1
+        value = frame.slots[node.slot]
+        if value is UNSET:
+            slots, slot = self.declared(node)
+            if slots is None:
+                self.error(f"Undefined variable: {node.name}")
+            value = slots[slot]
         return value
     
+    def declared(self, node):
+        """Return the slots and slot of the nearest declaration a reference can mean that has run
+        
+        That is the one the reference was resolved to unless it has not run
+        yet, else the closest of the enclosing ones; (None, None) if none has.
+        """
+        slots = self.frame(node.depth).slots
+        if slots[node.slot] is not UNSET:
+            return slots, node.slot
+        for depth, slot in node.outer:
+            slots = self.frame(depth).slots
+            if slots[slot] is not UNSET:
+                return slots, slot
+        return None, None
+    
     def evaluate_LiteralExpression(self, node):
         """Evaluate a LiteralExpression node"""
         return node.value
     
+    def evaluate_ListExpression(self, node):
+        """Evaluate a ListExpression node"""
+        values = [self.evaluate(element) for element in node.elements]
+        # A stan holds plain strings, never ropes
+        for i, value in enumerate(values):
+            if value.__class__ is Rope:
+                values[i] = str(value)
+        return Stan(pack(values))
+    
+    def evaluate_IndexExpression(self, node):
+        """Evaluate an IndexExpression node"""
+        target = self.evaluate(node.target)
+        if target.__class__ is Rope:
+            target = str(target)
+        return get_item(target, self.evaluate(node.index))
+    
     def evaluate_FunctionCallExpression(self, node):
         """Evaluate a FunctionCallExpression node"""
-        function = self.environment.get(node.function)
+        # A call the resolver bound to a built-in skips the frame lookup
+        builtin = node.builtin
+        if builtin is not None:
+            return self.call_builtin(builtin, [self.evaluate(arg) for arg in node.arguments])
+        
+        function = self.frame(node.depth).slots[node.slot]
+        if function is UNSET:
+            slots, slot = self.declared(node)
+            function = None if slots is None else slots[slot]
+        
+        # The inline cache of the call site: the declaration it called last
+        # and how its arguments bind, kept until another one turns up here
+        kind = function.__class__
+        if kind is Function or kind is MemoizedFunction:
+            cache = node.cache
+            if cache is not None and cache[0] is function.declaration:
+                if self.profiler is not None:
+                    self.profiler.count_site(True)
+            else:
+                cache = self.cache_call(node, function.declaration)
+            return function.call([self.evaluate(arg) for arg in node.arguments], cache[1])
         
         if not function or not callable(getattr(function, 'call', None)):
             self.error(f"'{node.function}' is not a function")
@@ -347,8 +1020,37 @@ class Interpreter:
         arguments = [self.evaluate(arg) for arg in node.arguments]
         
         # Call the function
+        if kind is Builtin:
+            return self.call_builtin(function, arguments)
         return function.call(arguments)
     
+    def cache_call(self, node, declaration):
+        """Fill the inline cache of a call site with a declaration and return it"""
+        cache = node.cache = (declaration, binding(declaration, len(node.arguments)))
+        if self.profiler is not None:
+            self.profiler.count_site(False)
+        return cache
+    
+    def call_builtin(self, builtin, arguments):
+        """Call a built-in function directly, without a frame for its arguments"""
+        # Built-in functions see a rope as the str it stands for, except
+        # len(), which reads its length without joining it
+        if builtin is not LENGTH:
+            for i, argument in enumerate(arguments):
+                if argument.__class__ is Rope:
+                    arguments[i] = str(argument)
+        if self.profiler is not None:
+            self.profiler.count_builtin(builtin)
+        return builtin.call(arguments)
+    
+    def frame(self, depth):
+        """Return the frame depth levels out from the current one"""
+        frame = self.environment
+        while depth:
+            frame = frame.enclosing
+            depth -= 1
+        return frame
+    
     def is_truthy(self, value):
         """Determine if a value is truthy"""
         if value is None:
@@ -361,12 +1063,22 @@ class Interpreter:
             return len(value) > 0
         elif isinstance(value, list):
             return len(value) > 0
+        elif value.__class__ is Stan:
+            return len(value) > 0
+        elif value.__class__ is Rope:
+            return value.length > 0
         return True
 
 class BreakException(Exception):
-    """Exception used to handle break statements"""
-    pass
+    """Exception raised when a break statement escapes its loop"""
+    
+    def __init__(self):
+        self.message = "and_i_oop used outside of a loop"
+        super().__init__(self.message)
 
 class ContinueException(Exception):
-    """Exception used to handle continue statements"""
-    pass
+    """Exception raised when a continue statement escapes its loop"""
+    
+    def __init__(self):
+        self.message = "as_if used outside of a loop"
+        super().__init__(self.message)
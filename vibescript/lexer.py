@@ -5,16 +5,56 @@ This module tokenizes VibeScript source code.
 """
 
 import re
+import sys
+from bisect import bisect_right
 from vibescript.grammar import TOKEN_TYPES, KEYWORDS
 
+class LineIndex:
+    """Offsets at which the lines of a source start, found the first time a position is asked for"""
+    
+    __slots__ = ('text', 'starts')
+    
+    def __init__(self, text):
+        self.text = text
+        self.starts = None
+    
+    def position(self, offset):
+        """Return the line and column of an offset, both counted from 1"""
+        if self.starts is None:
+            starts = [0]
+            find = self.text.find
+            newline = find('\n')
+            while newline != -1:
+                starts.append(newline + 1)
+                newline = find('\n', newline + 1)
+            self.starts = starts
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
 class Token:
-    """Represents a token in the VibeScript language"""
+    """Represents a token in the VibeScript language
+    
+    A token only keeps the offset it starts at; its line and column are
+    looked up in the line index of its source when something asks for them.
+    """
     
-    def __init__(self, token_type, value, line, column):
+    __slots__ = ('type', 'value', 'offset', 'lines')
+    
+    def __init__(self, token_type, value, offset, lines):
         self.type = token_type
         self.value = value
-        self.line = line
-        self.column = column
+        self.offset = offset
+        self.lines = lines
+    
+    @property
+    def line(self):
+        """Line the token starts on"""
+        return self.lines.position(self.offset)[0]
+    
+    @property
+    def column(self):
+        """Column the token starts at"""
+        return self.lines.position(self.offset)[1]
     
     def __str__(self):
         return f'Token({self.type}, {repr(self.value)}, position={self.line}:{self.column})'
@@ -38,21 +78,15 @@ class Lexer:
         self.text = text
         self.pos = 0
         self.current_char = text[0] if text else None
-        self.line = 1
-        self.column = 1
+        self.lines = LineIndex(text)
     
     def error(self, message):
         """Raise a lexer error with the current position"""
-        raise LexerError(message, self.line, self.column)
+        line, column = self.lines.position(self.pos)
+        raise LexerError(message, line, column)
     
     def advance(self):
         """Advance the position pointer and set the current character"""
-        if self.current_char == '\n':
-            self.line += 1
-            self.column = 1
-        else:
-            self.column += 1
-            
         self.pos += 1
         if self.pos >= len(self.text):
             self.current_char = None
@@ -87,18 +121,18 @@ class Lexer:
     
     def number(self):
         """Process a numeric literal"""
-        start_column = self.column
+        start = self.pos
         result = ''
         
         while self.current_char is not None and self.current_char.isdigit():
             result += self.current_char
             self.advance()
             
-        return Token(TOKEN_TYPES['INTEGER'], int(result), self.line, start_column)
+        return Token(TOKEN_TYPES['INTEGER'], int(result), start, self.lines)
     
     def string(self):
         """Process a string literal"""
-        start_column = self.column
+        start = self.pos
         # Skip the opening quote
         self.advance()
         
@@ -129,11 +163,11 @@ class Lexer:
         # Skip the closing quote
         self.advance()
         
-        return Token(TOKEN_TYPES['STRING'], result, self.line, start_column)
+        return Token(TOKEN_TYPES['STRING'], result, start, self.lines)
     
     def identifier(self):
         """Process an identifier or keyword"""
-        start_column = self.column
+        start = self.pos
         result = ''
         
         while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
@@ -143,7 +177,8 @@ class Lexer:
         # Check if the identifier is a keyword
         token_type = KEYWORDS.get(result, TOKEN_TYPES['IDENTIFIER'])
         
-        return Token(token_type, result, self.line, start_column)
+        # Every occurrence of a name shares one string
+        return Token(token_type, sys.intern(result), start, self.lines)
     
     def get_next_token(self):
         """Get the next token from the input"""
@@ -173,102 +208,107 @@ class Lexer:
             
             # Operators and delimiters
             if self.current_char == '+':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['PLUS'], '+', self.line, col)
+                return Token(TOKEN_TYPES['PLUS'], '+', start, self.lines)
                 
             if self.current_char == '-':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['MINUS'], '-', self.line, col)
+                return Token(TOKEN_TYPES['MINUS'], '-', start, self.lines)
                 
             if self.current_char == '*':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['MULTIPLY'], '*', self.line, col)
+                return Token(TOKEN_TYPES['MULTIPLY'], '*', start, self.lines)
                 
             if self.current_char == '/':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['DIVIDE'], '/', self.line, col)
+                return Token(TOKEN_TYPES['DIVIDE'], '/', start, self.lines)
                 
             if self.current_char == '%':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['MODULO'], '%', self.line, col)
+                return Token(TOKEN_TYPES['MODULO'], '%', start, self.lines)
                 
             if self.current_char == '=':
-                col = self.column
+                start = self.pos
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(TOKEN_TYPES['EQUALS'], '==', self.line, col)
-                return Token(TOKEN_TYPES['ASSIGN'], '=', self.line, col)
+                    return Token(TOKEN_TYPES['EQUALS'], '==', start, self.lines)
+                return Token(TOKEN_TYPES['ASSIGN'], '=', start, self.lines)
                 
             if self.current_char == '!':
-                col = self.column
+                start = self.pos
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(TOKEN_TYPES['NOT_EQUALS'], '!=', self.line, col)
+                    return Token(TOKEN_TYPES['NOT_EQUALS'], '!=', start, self.lines)
                 self.error("Expected '=' after '!'")
                 
             if self.current_char == '<':
-                col = self.column
+                start = self.pos
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(TOKEN_TYPES['LESS_EQUALS'], '<=', self.line, col)
-                return Token(TOKEN_TYPES['LESS_THAN'], '<', self.line, col)
+                    return Token(TOKEN_TYPES['LESS_EQUALS'], '<=', start, self.lines)
+                return Token(TOKEN_TYPES['LESS_THAN'], '<', start, self.lines)
                 
             if self.current_char == '>':
-                col = self.column
+                start = self.pos
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(TOKEN_TYPES['GREATER_EQUALS'], '>=', self.line, col)
-                return Token(TOKEN_TYPES['GREATER_THAN'], '>', self.line, col)
+                    return Token(TOKEN_TYPES['GREATER_EQUALS'], '>=', start, self.lines)
+                return Token(TOKEN_TYPES['GREATER_THAN'], '>', start, self.lines)
                 
             if self.current_char == '(':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['LPAREN'], '(', self.line, col)
+                return Token(TOKEN_TYPES['LPAREN'], '(', start, self.lines)
                 
             if self.current_char == ')':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['RPAREN'], ')', self.line, col)
+                return Token(TOKEN_TYPES['RPAREN'], ')', start, self.lines)
                 
             if self.current_char == '[':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['LBRACKET'], '[', self.line, col)
+                return Token(TOKEN_TYPES['LBRACKET'], '[', start, self.lines)
                 
             if self.current_char == ']':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['RBRACKET'], ']', self.line, col)
+                return Token(TOKEN_TYPES['RBRACKET'], ']', start, self.lines)
                 
             if self.current_char == ',':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['COMMA'], ',', self.line, col)
+                return Token(TOKEN_TYPES['COMMA'], ',', start, self.lines)
                 
             if self.current_char == ';':
-                col = self.column
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['SEMICOLON'], ';', self.line, col)
+                return Token(TOKEN_TYPES['SEMICOLON'], ';', start, self.lines)
                 
             if self.current_char == ':':
-                col = self.column
+                start = self.pos
+                self.advance()
+                return Token(TOKEN_TYPES['COLON'], ':', start, self.lines)
+                
+            if self.current_char == '@':
+                start = self.pos
                 self.advance()
-                return Token(TOKEN_TYPES['COLON'], ':', self.line, col)
+                return Token(TOKEN_TYPES['AT'], '@', start, self.lines)
             
             # If we get here, we have an unrecognized character
             self.error(f"Unrecognized character: '{self.current_char}'")
         
         # End of file
-        return Token(TOKEN_TYPES['EOF'], None, self.line, self.column)
+        return Token(TOKEN_TYPES['EOF'], None, self.pos, self.lines)
     
     def tokenize(self):
         """Tokenize the entire input and return a list of tokens"""
@@ -281,3 +321,108 @@ class Lexer:
             
         tokens.append(token)  # Add EOF token
         return tokens
+
+# Master pattern of the regex lexer: skips whitespace and comments, then
+# matches one token. Anything it does not match, such as non-ASCII
+# identifiers, malformed strings or a lone '!', is handed to the
+# character-at-a-time Lexer so that tokens and errors stay identical.
+# The skipped prefix is matched atomically (lookahead plus backreference)
+# so that a failed token never backtracks into a comment.
+TOKEN_PATTERN = re.compile(r"""
+    (?=(?P<SKIP>(?:\s+|//[^\n]*\n?)*))(?P=SKIP)
+    (?:
+        (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)(?!\w)
+      | (?P<OPERATOR>==|!=|<=|>=|[-+*/%=<>()\[\],;:@])
+      | (?P<NUMBER>[0-9]+)(?![0-9]|[^\x00-\x7f])
+      | (?P<STRING>"[^"\\]*(?:\\[ntr"\\][^"\\]*)*")
+      | (?P<EOF>\Z)
+    )
+""", re.VERBOSE)
+
+ESCAPE_PATTERN = re.compile(r'\\(.)')
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+
+OPERATORS = {
+    '+': TOKEN_TYPES['PLUS'],
+    '-': TOKEN_TYPES['MINUS'],
+    '*': TOKEN_TYPES['MULTIPLY'],
+    '/': TOKEN_TYPES['DIVIDE'],
+    '%': TOKEN_TYPES['MODULO'],
+    '=': TOKEN_TYPES['ASSIGN'],
+    '==': TOKEN_TYPES['EQUALS'],
+    '!=': TOKEN_TYPES['NOT_EQUALS'],
+    '<': TOKEN_TYPES['LESS_THAN'],
+    '>': TOKEN_TYPES['GREATER_THAN'],
+    '<=': TOKEN_TYPES['LESS_EQUALS'],
+    '>=': TOKEN_TYPES['GREATER_EQUALS'],
+    '(': TOKEN_TYPES['LPAREN'],
+    ')': TOKEN_TYPES['RPAREN'],
+    '[': TOKEN_TYPES['LBRACKET'],
+    ']': TOKEN_TYPES['RBRACKET'],
+    ',': TOKEN_TYPES['COMMA'],
+    ';': TOKEN_TYPES['SEMICOLON'],
+    ':': TOKEN_TYPES['COLON'],
+    '@': TOKEN_TYPES['AT'],
+}
+
+# Names and keywords share one lookup: keywords map to their own type
+NAME_TYPES = dict(KEYWORDS)
+
+class RegexLexer(Lexer):
+    """Lexer that matches whole tokens with one compiled regular expression
+
+    Produces the same tokens, positions and errors as Lexer. Tokens come from
+    a generator that keeps the offset in a local variable; pos is updated
+    after every token, while current_char is only synced when a token is
+    handed to Lexer.
+    """
+    
+    def __init__(self, text):
+        super().__init__(text)
+        # Calls go straight to the generator instead of through a method
+        self.get_next_token = self.scan().__next__
+    
+    def scan(self):
+        """Generate the tokens of the input, then EOF tokens forever"""
+        text = self.text
+        lines = self.lines
+        match = TOKEN_PATTERN.match
+        intern = sys.intern
+        name_types = NAME_TYPES
+        operators = OPERATORS
+        identifier = TOKEN_TYPES['IDENTIFIER']
+        integer = TOKEN_TYPES['INTEGER']
+        string = TOKEN_TYPES['STRING']
+        pos = 0
+        
+        while True:
+            m = match(text, pos)
+            
+            if m is None:
+                # Let the character lexer deal with this token
+                self.pos = pos
+                self.current_char = text[pos]
+                yield Lexer.get_next_token(self)
+                pos = self.pos
+                continue
+            
+            kind = m.lastgroup
+            start, end = m.span(kind)
+            self.pos = pos = end
+            
+            if kind == 'NAME':
+                value = intern(m.group(kind))
+                yield Token(name_types.get(value, identifier), value, start, lines)
+            elif kind == 'OPERATOR':
+                value = m.group(kind)
+                yield Token(operators[value], value, start, lines)
+            elif kind == 'NUMBER':
+                yield Token(integer, int(m.group(kind)), start, lines)
+            elif kind == 'STRING':
+                value = text[start + 1:end - 1]
+                if '\\' in value:
+                    value = ESCAPE_PATTERN.sub(lambda e: ESCAPES[e.group(1)], value)
+                yield Token(string, value, start, lines)
+            else:
+                yield Token(TOKEN_TYPES['EOF'], None, start, lines)
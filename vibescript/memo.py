@@ -0,0 +1,333 @@
+"""
+VibeScript Memoization
+
+This module finds the user functions whose result depends on nothing but
+their arguments, and caches the results of calls to them for the rest of a
+run.
+
+A function is pure when its body prints nothing (spill_the_tea), reads no
+input (vibe_check), declares no function of its own, reads and writes no
+variable of an enclosing scope and only calls pure functions. A call only
+counts as calling a known function when its name is bound to a single
+rizz_up declaration that nothing else ever writes, or to a built-in
+function. The analysis mirrors the frames the tree interpreter creates and
+follows the (depth, slot) pairs left by the resolver, so it runs after
+resolution.
+
+Results are cached per run in a MemoCache, keyed by the declaration and the
+type-tagged arguments. Only calls whose arguments and result are immutable
+scalars are cached. A function opts out with @no_memo.
+"""
+
+import sys
+from collections import OrderedDict
+from vibescript.builtins import BUILTINS
+
+# Values that can be part of a cache key or be cached as a result
+SCALARS = {int, float, str, bool, type(None)}
+
+# Default limits of the cache of one run
+MAX_ENTRIES = 100000
+MAX_BYTES = 16 * 1024 * 1024
+
+# Bytes an entry costs on top of its key and value (the OrderedDict links)
+ENTRY_OVERHEAD = 100
+
+# Returned by MemoCache.get when a call has no cached result
+MISSING = object()
+
+class FrameInfo:
+    """A frame the interpreter will create, as far as the analysis is concerned"""
+
+    def __init__(self, function):
+        self.function = function
+        self.functions = {}
+        self.written = set()
+
+class FunctionInfo:
+    """What the body of one function declaration was found to do"""
+
+    def __init__(self, declaration):
+        self.declaration = declaration
+        self.impure = False
+        # (frame, slot, is_call) of every name of an enclosing scope it uses
+        self.references = []
+
+# Stands in for every built-in function, none of which has side effects
+BUILTIN = FunctionInfo(None)
+
+class PurityAnalysis:
+    """Marks every FunctionDeclaration with whether its calls can be memoized"""
+
+    def __init__(self):
+        self.frames = []
+        self.function = None
+        self.functions = []
+
+    def analyze(self, program):
+        """Analyze a resolved Program in place and return it"""
+        # The frame of built-in functions encloses the global one
+        builtins = FrameInfo(None)
+        for slot in range(len(BUILTINS)):
+            builtins.functions[slot] = BUILTIN
+        self.frames = [builtins, FrameInfo(None)]
+        for statement in program.statements:
+            self.statement(statement)
+
+        pure = self.solve()
+        for info in self.functions:
+            declaration = info.declaration
+            declaration.memoize = info in pure and 'no_memo' not in declaration.decorators
+        return program
+
+    def solve(self):
+        """Return the pure functions: those that stay clean when callees are assumed pure"""
+        pure = {info for info in self.functions if not info.impure}
+        pure.add(BUILTIN)
+        changed = True
+        while changed:
+            changed = False
+            for info in list(pure):
+                for frame, slot, is_call in info.references:
+                    callee = frame.functions.get(slot)
+                    if callee is None or slot in frame.written or (is_call and callee not in pure):
+                        pure.discard(info)
+                        changed = True
+                        break
+        return pure
+
+    def impure(self):
+        """Note that the function being analyzed is not pure"""
+        if self.function is not None:
+            self.function.impure = True
+
+    def frame(self, depth):
+        """Return the frame depth levels out from the current one"""
+        return self.frames[-1 - depth]
+
+    def read(self, depth, slot, is_call=False):
+        """Record a read of (or a call through) a variable"""
+        frame = self.frame(depth)
+        if self.function is None or frame.function is self.function:
+            # The function's own variables may hold anything, so calls
+            # through them go to an unknown function
+            if is_call:
+                self.impure()
+            return
+        self.function.references.append((frame, slot, is_call))
+
+    def write(self, depth, slot):
+        """Record a write to a variable"""
+        frame = self.frame(depth)
+        frame.written.add(slot)
+        if self.function is not None and frame.function is not self.function:
+            self.impure()
+
+    def block(self, node, statements):
+        """Analyze statements in the frame a node creates (if it creates one)"""
+        if node.slot_count:
+            self.frames.append(FrameInfo(self.function))
+        try:
+            for statement in statements:
+                self.statement(statement)
+        finally:
+            if node.slot_count:
+                self.frames.pop()
+
+    # Statements
+
+    def statement(self, node):
+        """Analyze a statement node"""
+        method_name = f"statement_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.statement_unknown)
+        method(node)
+
+    def statement_unknown(self, node):
+        """Statements the analysis does not know make their function impure"""
+        self.impure()
+
+    def statement_PrintStatement(self, node):
+        """Analyze a PrintStatement node (spill_the_tea)"""
+        self.impure()
+        self.expression(node.expression)
+
+    def statement_InputStatement(self, node):
+        """Analyze an InputStatement node (vibe_check)"""
+        self.impure()
+        if node.slot is not None:
+            self.write(node.depth, node.slot)
+
+    def statement_VariableDeclaration(self, node):
+        """Analyze a VariableDeclaration node"""
+        if node.value:
+            self.expression(node.value)
+        self.write(0, node.slot)
+
+    def statement_AssignmentStatement(self, node):
+        """Analyze an AssignmentStatement node"""
+        self.expression(node.expression)
+        self.write(node.depth, node.slot)
+
+    def statement_IndexAssignment(self, node):
+        """Analyze an IndexAssignment node"""
+        # Only changes a stan the function can reach, so it is as pure as the reads
+        self.expression(node.target)
+        self.expression(node.index)
+        self.expression(node.expression)
+
+    def statement_IfStatement(self, node):
+        """Analyze an IfStatement node (no_cap)"""
+        self.expression(node.condition)
+        self.statement(node.if_block)
+        if node.else_block:
+            self.statement(node.else_block)
+
+    def statement_WhileStatement(self, node):
+        """Analyze a WhileStatement node (lowkey)"""
+        self.expression(node.condition)
+        self.statement(node.block)
+
+    def statement_ForStatement(self, node):
+        """Analyze a ForStatement node (highkey)"""
+        self.statement(node.init)
+        self.expression(node.condition)
+        self.statement(node.update)
+        self.statement(node.block)
+
+    def statement_FunctionDeclaration(self, node):
+        """Analyze a FunctionDeclaration node (rizz_up)"""
+        # A function declared inside another one is a closure over its frame
+        self.impure()
+        frame = self.frame(0)
+        info = FunctionInfo(node)
+        self.functions.append(info)
+        if node.slot in frame.functions:
+            frame.written.add(node.slot)
+        else:
+            frame.functions[node.slot] = info
+
+        enclosing = self.function
+        self.function = info
+        try:
+            self.block(node, [node.body])
+        finally:
+            self.function = enclosing
+
+    def statement_ReturnStatement(self, node):
+        """Analyze a ReturnStatement node (slay)"""
+        if node.expression:
+            self.expression(node.expression)
+
+    def statement_BreakStatement(self, node):
+        """Analyze a BreakStatement node (and_i_oop)"""
+        pass
+
+    def statement_ContinueStatement(self, node):
+        """Analyze a ContinueStatement node (as_if)"""
+        pass
+
+    def statement_BlockStatement(self, node):
+        """Analyze a BlockStatement node (lets_go ... yeet)"""
+        self.block(node, node.statements)
+
+    def statement_ExpressionStatement(self, node):
+        """Analyze an ExpressionStatement node"""
+        self.expression(node.expression)
+
+    # Expressions
+
+    def expression(self, node):
+        """Analyze an expression node"""
+        method_name = f"expression_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.expression_unknown)
+        method(node)
+
+    def expression_unknown(self, node):
+        """Expressions the analysis does not know make their function impure"""
+        self.impure()
+
+    def expression_BinaryExpression(self, node):
+        """Analyze a BinaryExpression node"""
+        self.expression(node.left)
+        self.expression(node.right)
+
+    def expression_UnaryExpression(self, node):
+        """Analyze a UnaryExpression node"""
+        self.expression(node.operand)
+
+    def expression_VariableExpression(self, node):
+        """Analyze a VariableExpression node"""
+        self.read(node.depth, node.slot)
+
+    def expression_LiteralExpression(self, node):
+        """Analyze a LiteralExpression node"""
+        pass
+
+    def expression_ListExpression(self, node):
+        """Analyze a ListExpression node"""
+        for element in node.elements:
+            self.expression(element)
+
+    def expression_IndexExpression(self, node):
+        """Analyze an IndexExpression node"""
+        self.expression(node.target)
+        self.expression(node.index)
+
+    def expression_FunctionCallExpression(self, node):
+        """Analyze a FunctionCallExpression node"""
+        self.read(node.depth, node.slot, is_call=True)
+        for argument in node.arguments:
+            self.expression(argument)
+
+class MemoCache:
+    """Results of pure function calls in one run, evicted least recently used first"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, declaration, arguments):
+        """Return the cache key of a call, or None if it cannot be cached
+
+        Every argument is tagged with its type, so that 1, 1.0 and
+        this_slaps (which compare equal in Python) get different entries.
+        """
+        key = [declaration]
+        for argument in arguments:
+            kind = argument.__class__
+            if kind not in SCALARS:
+                return None
+            key.append(kind)
+            key.append(argument)
+        return tuple(key)
+
+    def get(self, key):
+        """Return the cached result of a call, or MISSING"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """Cache the result of a call, evicting old entries past the limits"""
+        if value.__class__ not in SCALARS:
+            return
+        size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+        size += sum(sys.getsizeof(part) for part in key[2::2])
+        if size > self.max_bytes or key in self.entries:
+            return
+
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
@@ -0,0 +1,419 @@
+"""
+VibeScript Optimizer
+
+This module rewrites the AST between the parser and the resolver. An
+Optimizer runs a list of passes over a Program in place; every pass can be
+switched off by name and counts the AST nodes it removed.
+
+The passes only make changes that cannot be observed: output, input
+requests and error messages stay exactly what the unoptimized program
+would produce.
+"""
+
+import math
+from vibescript.grammar import TOKEN_TYPES
+from vibescript.parser import (
+    Statement, BlockStatement, VariableDeclaration, FunctionDeclaration,
+    AssignmentStatement, InputStatement, IfStatement, WhileStatement, ForStatement,
+    ReturnStatement, BreakStatement, ContinueStatement,
+    BinaryExpression, UnaryExpression, VariableExpression, LiteralExpression,
+    FunctionCallExpression, IndexAssignment
+)
+
+# Child fields of every node type, in evaluation order
+FIELDS = {
+    'Program': ('statements',),
+    'BlockStatement': ('statements',),
+    'ExpressionStatement': ('expression',),
+    'PrintStatement': ('expression',),
+    'InputStatement': (),
+    'VariableDeclaration': ('value',),
+    'AssignmentStatement': ('expression',),
+    'IndexAssignment': ('target', 'index', 'expression'),
+    'IfStatement': ('condition', 'if_block', 'else_block'),
+    'WhileStatement': ('condition', 'block'),
+    'ForStatement': ('init', 'condition', 'update', 'block'),
+    'FunctionDeclaration': ('body',),
+    'ReturnStatement': ('expression',),
+    'BreakStatement': (),
+    'ContinueStatement': (),
+    'BinaryExpression': ('left', 'right'),
+    'UnaryExpression': ('operand',),
+    'VariableExpression': (),
+    'LiteralExpression': (),
+    'ListExpression': ('elements',),
+    'IndexExpression': ('target', 'index'),
+    'FunctionCallExpression': ('arguments',),
+}
+
+# Folded strings longer than this stay unfolded so they do not bloat the AST
+MAX_FOLDED_STRING = 1024
+
+def children(node):
+    """Return the child nodes of a node"""
+    result = []
+    for field in FIELDS.get(node.__class__.__name__, ()):
+        value = getattr(node, field)
+        if isinstance(value, list):
+            result.extend(value)
+        elif value is not None:
+            result.append(value)
+    return result
+
+def walk(node):
+    """Yield a node and all of its descendants"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(children(node)))
+
+def count_nodes(node):
+    """Return the number of nodes in a subtree (0 for None)"""
+    if node is None:
+        return 0
+    return sum(1 for _ in walk(node))
+
+def declares_names(statement):
+    """Check whether a statement declares names in the scope that contains it"""
+    if isinstance(statement, (VariableDeclaration, FunctionDeclaration)):
+        return True
+    if isinstance(statement, IfStatement):
+        branches = (statement.if_block, statement.else_block)
+    elif isinstance(statement, WhileStatement):
+        branches = (statement.block,)
+    elif isinstance(statement, ForStatement):
+        branches = (statement.init, statement.block)
+    else:
+        return False
+    # Bodies that are not blocks declare into the enclosing scope
+    return any(
+        branch is not None and not isinstance(branch, BlockStatement) and declares_names(branch)
+        for branch in branches
+    )
+
+def literal(value):
+    """Create a LiteralExpression for a computed value"""
+    if value is None:
+        return LiteralExpression(None, 'NULL')
+    if isinstance(value, bool):
+        return LiteralExpression(value, 'BOOLEAN')
+    if isinstance(value, str):
+        return LiteralExpression(value, 'STRING')
+    if isinstance(value, float):
+        return LiteralExpression(value, 'FLOAT')
+    return LiteralExpression(value, 'INTEGER')
+
+def repeated_length(left, right):
+    """Return the length of str * int (in either order), or 0 for other operands"""
+    for text, count in ((left, right), (right, left)):
+        if isinstance(text, str) and isinstance(count, int):
+            return len(text) * max(count, 0)
+    return 0
+
+def binary_operation(operator_type, left, right):
+    """Apply a binary operator the way the interpreter does (errors propagate)"""
+    if operator_type == TOKEN_TYPES['PLUS']:
+        if isinstance(left, str) or isinstance(right, str):
+            return str(left) + str(right)
+        return left + right
+    elif operator_type == TOKEN_TYPES['MINUS']:
+        return left - right
+    elif operator_type == TOKEN_TYPES['MULTIPLY']:
+        return left * right
+    elif operator_type == TOKEN_TYPES['DIVIDE']:
+        return left / right
+    elif operator_type == TOKEN_TYPES['MODULO']:
+        return left % right
+    elif operator_type == TOKEN_TYPES['EQUALS']:
+        return left == right
+    elif operator_type == TOKEN_TYPES['NOT_EQUALS']:
+        return left != right
+    elif operator_type == TOKEN_TYPES['LESS_THAN']:
+        return left < right
+    elif operator_type == TOKEN_TYPES['GREATER_THAN']:
+        return left > right
+    elif operator_type == TOKEN_TYPES['LESS_EQUALS']:
+        return left <= right
+    elif operator_type == TOKEN_TYPES['GREATER_EQUALS']:
+        return left >= right
+    raise ValueError(f"Unknown binary operator: {operator_type}")
+
+class Pass:
+    """Base class of optimizer passes: rewrites every node, children first"""
+
+    name = None
+
+    def __init__(self):
+        self.removed = 0
+
+    def run(self, program):
+        """Rewrite a Program in place"""
+        program.statements = self.statements(program.statements)
+
+    def statements(self, statements):
+        """Rewrite a statement list, dropping removed statements"""
+        result = []
+        for statement in statements:
+            statement = self.statement(statement)
+            if statement is not None:
+                result.append(statement)
+        return result
+
+    def statement(self, node):
+        """Rewrite a statement node; None removes it"""
+        method = getattr(self, f"statement_{node.__class__.__name__}", self.generic)
+        return method(node)
+
+    def expression(self, node):
+        """Rewrite an expression node"""
+        method = getattr(self, f"expression_{node.__class__.__name__}", self.generic)
+        return method(node)
+
+    def nested(self, node):
+        """Rewrite a statement used as the body of an if, loop or function"""
+        result = self.statement(node)
+        # A removed body still needs a statement in its place
+        return result if result is not None else BlockStatement([])
+
+    def generic(self, node):
+        """Rewrite the children of a node and return the node itself"""
+        for field in FIELDS.get(node.__class__.__name__, ()):
+            value = getattr(node, field)
+            if isinstance(value, list):
+                if value and isinstance(value[0], Statement):
+                    setattr(node, field, self.statements(value))
+                else:
+                    setattr(node, field, [self.expression(item) for item in value])
+            elif isinstance(value, Statement):
+                setattr(node, field, self.nested(value))
+            elif value is not None:
+                setattr(node, field, self.expression(value))
+        return node
+
+class ConstantFolding(Pass):
+    """Replace operators applied to literals with the literal they produce"""
+
+    name = 'fold_constants'
+
+    def expression_BinaryExpression(self, node):
+        """Fold a BinaryExpression whose operands are literals"""
+        self.generic(node)
+        if not isinstance(node.left, LiteralExpression) or not isinstance(node.right, LiteralExpression):
+            return node
+
+        # Division by zero stays in the program so it is reported at run time
+        left = node.left.value
+        right = node.right.value
+        if node.operator.type in (TOKEN_TYPES['DIVIDE'], TOKEN_TYPES['MODULO']) and right == 0:
+            return node
+        # Check the size of a repeated string before building it
+        if node.operator.type == TOKEN_TYPES['MULTIPLY'] and repeated_length(left, right) > MAX_FOLDED_STRING:
+            return node
+        try:
+            value = binary_operation(node.operator.type, left, right)
+        except Exception:
+            # Type errors are run-time errors too
+            return node
+        return self.replace(node, value)
+
+    def expression_UnaryExpression(self, node):
+        """Fold a UnaryExpression whose operand is a literal"""
+        self.generic(node)
+        if not isinstance(node.operand, LiteralExpression):
+            return node
+
+        value = node.operand.value
+        if node.operator.type == TOKEN_TYPES['MINUS']:
+            try:
+                value = -value
+            except Exception:
+                return node
+        elif node.operator.type != TOKEN_TYPES['PLUS']:
+            return node
+        return self.replace(node, value)
+
+    def replace(self, node, value):
+        """Return a literal for value if it can stand in for node"""
+        if isinstance(value, str) and len(value) > MAX_FOLDED_STRING:
+            return node
+        if isinstance(value, float) and not math.isfinite(value):
+            return node
+        self.removed += count_nodes(node) - 1
+        return literal(value)
+
+class DeadBranchElimination(Pass):
+    """Drop the branch of a no_cap, or a lowkey loop, that a literal condition never takes"""
+
+    name = 'dead_branches'
+
+    def statement_IfStatement(self, node):
+        """Keep only the branch selected by a literal condition"""
+        self.generic(node)
+        if not isinstance(node.condition, LiteralExpression):
+            return node
+
+        if node.condition.value:
+            kept, dropped = node.if_block, node.else_block
+        else:
+            kept, dropped = node.else_block, node.if_block
+        # Declarations in an unbraced branch belong to the enclosing scope
+        if dropped is not None and declares_names(dropped):
+            return node
+        self.removed += count_nodes(node) - count_nodes(kept)
+        return kept
+
+    def statement_WhileStatement(self, node):
+        """Remove a loop whose literal condition is false"""
+        self.generic(node)
+        if not isinstance(node.condition, LiteralExpression) or node.condition.value:
+            return node
+        if declares_names(node):
+            return node
+        self.removed += count_nodes(node)
+        return None
+
+class UnreachableCodeElimination(Pass):
+    """Remove statements that follow slay, and_i_oop or as_if in the same block"""
+
+    name = 'unreachable_code'
+
+    def statements(self, statements):
+        """Rewrite a statement list and cut it after the first jump"""
+        result = super().statements(statements)
+        for index, statement in enumerate(result):
+            if isinstance(statement, (ReturnStatement, BreakStatement, ContinueStatement)):
+                tail = result[index + 1:]
+                # Declarations stay: nested functions may still refer to their names
+                kept = [s for s in tail if declares_names(s)]
+                self.removed += sum(count_nodes(s) for s in tail) - sum(count_nodes(s) for s in kept)
+                return result[:index + 1] + kept
+        return result
+
+class LoopInvariantHoisting(Pass):
+    """Compute invariant parts of a loop condition once, before the loop
+
+    Only loops without calls or element assignments are considered, so
+    nothing but the loop itself can change a value while it runs. A subexpression is hoisted when none
+    of its variables is written in the loop and every operation evaluated
+    before it in the condition cannot raise; the first evaluation of the
+    condition then fails, if at all, with the same error. Hoisted values go
+    into variables whose names cannot appear in source code.
+    """
+
+    name = 'hoist_invariants'
+
+    def __init__(self):
+        super().__init__()
+        self.counter = 0
+        self.raising_seen = False
+
+    def statements(self, statements):
+        """Rewrite a statement list and hoist out of the loops directly in it"""
+        result = []
+        for statement in super().statements(statements):
+            if isinstance(statement, (WhileStatement, ForStatement)):
+                result.extend(self.hoist(statement))
+            else:
+                result.append(statement)
+        return result
+
+    def hoist(self, loop):
+        """Return the statements replacing loop: hoisted temporaries, then the loop"""
+        parts = [loop.condition, loop.block]
+        if isinstance(loop, ForStatement):
+            parts.append(loop.update)
+
+        written = set()
+        for part in parts:
+            for node in walk(part):
+                # Calls may write any variable, and a stan may be changed
+                # through any variable holding it
+                if isinstance(node, (FunctionCallExpression, IndexAssignment)):
+                    return [loop]
+                if isinstance(node, (AssignmentStatement, InputStatement)):
+                    written.add(node.variable)
+                elif isinstance(node, VariableDeclaration):
+                    written.add(node.name)
+                elif isinstance(node, FunctionDeclaration):
+                    written.add(node.name)
+                    written.update(node.params)
+
+        temporaries = []
+        self.raising_seen = False
+        loop.condition = self.hoist_expression(loop.condition, written, temporaries)
+        if not temporaries:
+            return [loop]
+        # The temporaries are part of the loop's line as far as a profile is concerned
+        for temporary in temporaries:
+            temporary.offset = loop.offset
+
+        if isinstance(loop, ForStatement):
+            # The temporaries are computed after the initializer has run
+            init, loop.init = loop.init, BlockStatement([])
+            return [init] + temporaries + [loop]
+        return temporaries + [loop]
+
+    def hoist_expression(self, node, written, temporaries):
+        """Replace hoistable subexpressions of node, in evaluation order"""
+        if not self.raising_seen and self.is_invariant(node, written) and self.worth_hoisting(node):
+            self.counter += 1
+            name = f"$hoist{self.counter}"
+            temporaries.append(VariableDeclaration(name, TOKEN_TYPES['LIT'], node))
+            self.removed += count_nodes(node) - 1
+            return VariableExpression(name)
+
+        if isinstance(node, BinaryExpression):
+            node.left = self.hoist_expression(node.left, written, temporaries)
+            node.right = self.hoist_expression(node.right, written, temporaries)
+            if node.operator.type not in (TOKEN_TYPES['EQUALS'], TOKEN_TYPES['NOT_EQUALS']):
+                self.raising_seen = True
+        elif isinstance(node, UnaryExpression):
+            node.operand = self.hoist_expression(node.operand, written, temporaries)
+            if node.operator.type == TOKEN_TYPES['MINUS']:
+                self.raising_seen = True
+        return node
+
+    def is_invariant(self, node, written):
+        """Check whether node is pure and reads no variable written in the loop"""
+        for child in walk(node):
+            if isinstance(child, VariableExpression):
+                if child.name in written:
+                    return False
+            elif not isinstance(child, (BinaryExpression, UnaryExpression, LiteralExpression)):
+                return False
+        return True
+
+    def worth_hoisting(self, node):
+        """Check whether node does work that a variable read would save"""
+        if isinstance(node, BinaryExpression):
+            return True
+        # Unary plus may produce ghost, which a lit declaration would turn into 0
+        return isinstance(node, UnaryExpression) and node.operator.type == TOKEN_TYPES['MINUS']
+
+# Passes run by default, in order
+DEFAULT_PASSES = [ConstantFolding, DeadBranchElimination, UnreachableCodeElimination, LoopInvariantHoisting]
+
+class Optimizer:
+    """Runs a configurable sequence of passes over a Program"""
+
+    def __init__(self, passes=None, disabled=()):
+        self.passes = list(passes) if passes is not None else list(DEFAULT_PASSES)
+        self.enabled = {cls.name: cls.name not in disabled for cls in self.passes}
+
+    def enable(self, name, enabled=True):
+        """Switch a pass on or off by name"""
+        if name not in self.enabled:
+            raise ValueError(f"Unknown optimizer pass: {name}")
+        self.enabled[name] = enabled
+
+    def optimize(self, program):
+        """Optimize a Program in place and return the nodes removed by each pass"""
+        report = {}
+        for cls in self.passes:
+            if not self.enabled[cls.name]:
+                continue
+            optimization = cls()
+            optimization.run(program)
+            report[cls.name] = optimization.removed
+        return report
@@ -5,6 +5,12 @@ This module parses tokenized VibeScript code into an Abstract Syntax Tree (AST).
 """
 
 from vibescript.grammar import TOKEN_TYPES
+from vibescript.lexer import LexerError
+
+# Names that may follow @ in front of a function declaration
+DECORATORS = {
+    'no_memo',  # never cache the results of the function
+}
 
 class ParserError(Exception):
     """Exception raised when an error occurs during parsing"""
@@ -16,41 +22,67 @@ class ParserError(Exception):
 
 # AST Node classes
 class Node:
-    """Base class for all AST nodes"""
-    pass
+    """Base class for all AST nodes
+    
+    Nodes keep their attributes in __slots__, so every attribute a later
+    pass sets on a node must be listed in its class. Where a node starts is
+    kept as an offset into the source, which is turned into a line and
+    column only when needed (see LineIndex).
+    """
+    
+    __slots__ = ('offset',)
+    
+    def __init__(self):
+        self.offset = None
 
 class Program(Node):
     """Root node of the program"""
     
+    __slots__ = ('statements', 'slot_count', 'resolved', 'source_hash')
+    
     def __init__(self, statements):
+        super().__init__()
         self.statements = statements
 
 class Statement(Node):
     """Base class for all statement nodes"""
-    pass
+    
+    __slots__ = ()
 
 class ExpressionStatement(Statement):
     """A statement consisting of an expression"""
     
+    __slots__ = ('expression',)
+    
     def __init__(self, expression):
+        super().__init__()
         self.expression = expression
 
 class PrintStatement(Statement):
     """A print statement (spill_the_tea)"""
     
+    __slots__ = ('expression',)
+    
     def __init__(self, expression):
+        super().__init__()
         self.expression = expression
 
 class InputStatement(Statement):
     """An input statement (vibe_check)"""
     
+    __slots__ = ('variable', 'depth', 'slot', 'outer')
+    
     def __init__(self, variable):
+        super().__init__()
         self.variable = variable
 
 class VariableDeclaration(Statement):
     """A variable declaration statement"""
     
+    __slots__ = ('name', 'data_type', 'value', 'slot')
+    
     def __init__(self, name, data_type, value=None):
+        super().__init__()
         self.name = name
         self.data_type = data_type
         self.value = value
@@ -58,14 +90,31 @@ class VariableDeclaration(Statement):
 class AssignmentStatement(Statement):
     """An assignment statement"""
     
+    __slots__ = ('variable', 'expression', 'depth', 'slot', 'outer')
+    
     def __init__(self, variable, expression):
+        super().__init__()
         self.variable = variable
         self.expression = expression
 
+class IndexAssignment(Statement):
+    """An assignment to an element of a stan (xs[i] = value)"""
+    
+    __slots__ = ('target', 'index', 'expression')
+    
+    def __init__(self, target, index, expression):
+        super().__init__()
+        self.target = target
+        self.index = index
+        self.expression = expression
+
 class IfStatement(Statement):
     """An if statement (no_cap)"""
     
+    __slots__ = ('condition', 'if_block', 'else_block')
+    
     def __init__(self, condition, if_block, else_block=None):
+        super().__init__()
         self.condition = condition
         self.if_block = if_block
         self.else_block = else_block
@@ -73,14 +122,20 @@ class IfStatement(Statement):
 class WhileStatement(Statement):
     """A while loop statement (lowkey)"""
     
+    __slots__ = ('condition', 'block')
+    
     def __init__(self, condition, block):
+        super().__init__()
         self.condition = condition
         self.block = block
 
 class ForStatement(Statement):
     """A for loop statement (highkey)"""
     
+    __slots__ = ('init', 'condition', 'update', 'block', 'counted')
+    
     def __init__(self, init, condition, update, block):
+        super().__init__()
         self.init = init
         self.condition = condition
         self.update = update
@@ -89,39 +144,55 @@ class ForStatement(Statement):
 class FunctionDeclaration(Statement):
     """A function declaration (rizz_up)"""
     
-    def __init__(self, name, params, body):
+    __slots__ = ('name', 'params', 'body', 'decorators', 'slot', 'param_slots', 'slot_count', 'memoize')
+    
+    def __init__(self, name, params, body, decorators=None):
+        super().__init__()
         self.name = name
         self.params = params
         self.body = body
+        self.decorators = decorators or []
 
 class ReturnStatement(Statement):
     """A return statement (slay)"""
     
+    __slots__ = ('expression', 'tail_call')
+    
     def __init__(self, expression=None):
+        super().__init__()
         self.expression = expression
 
 class BreakStatement(Statement):
     """A break statement (and_i_oop)"""
-    pass
+    
+    __slots__ = ()
 
 class ContinueStatement(Statement):
     """A continue statement (as_if)"""
-    pass
+    
+    __slots__ = ()
 
 class BlockStatement(Statement):
     """A block of statements (lets_go ... yeet)"""
     
+    __slots__ = ('statements', 'slot_count')
+    
     def __init__(self, statements):
+        super().__init__()
         self.statements = statements
 
 class Expression(Node):
     """Base class for all expression nodes"""
-    pass
+    
+    __slots__ = ()
 
 class BinaryExpression(Expression):
     """A binary expression (e.g., a + b)"""
     
+    __slots__ = ('left', 'operator', 'right')
+    
     def __init__(self, left, operator, right):
+        super().__init__()
         self.left = left
         self.operator = operator
         self.right = right
@@ -129,36 +200,104 @@ class BinaryExpression(Expression):
 class UnaryExpression(Expression):
     """A unary expression (e.g., -a)"""
     
+    __slots__ = ('operator', 'operand')
+    
     def __init__(self, operator, operand):
+        super().__init__()
         self.operator = operator
         self.operand = operand
 
 class VariableExpression(Expression):
     """A variable reference"""
     
+    __slots__ = ('name', 'depth', 'slot', 'outer')
+    
     def __init__(self, name):
+        super().__init__()
         self.name = name
 
 class LiteralExpression(Expression):
     """A literal value (integer, string, boolean)"""
     
+    __slots__ = ('value', 'value_type')
+    
     def __init__(self, value, value_type):
+        super().__init__()
         self.value = value
         self.value_type = value_type
 
+class ListExpression(Expression):
+    """A stan literal (e.g., [1, 2, 3])"""
+    
+    __slots__ = ('elements',)
+    
+    def __init__(self, elements):
+        super().__init__()
+        self.elements = elements
+
+class IndexExpression(Expression):
+    """An element of a stan or tea (e.g., xs[i])"""
+    
+    __slots__ = ('target', 'index')
+    
+    def __init__(self, target, index):
+        super().__init__()
+        self.target = target
+        self.index = index
+
 class FunctionCallExpression(Expression):
     """A function call"""
     
+    __slots__ = ('function', 'arguments', 'depth', 'slot', 'outer', 'builtin', 'cache')
+    
     def __init__(self, function, arguments):
+        super().__init__()
         self.function = function
         self.arguments = arguments
+        self.cache = None
 
 class Parser:
     """Parser for VibeScript language"""
     
     def __init__(self, lexer):
         self.lexer = lexer
-        self.current_token = self.lexer.get_next_token()
+        self.tokens = []
+        self.lexer_error = None
+        self.tokenize()
+        self.index = 0
+        self.current_token = self.token_at(0)
+    
+    def tokenize(self):
+        """Buffer every token of the input up front"""
+        get_next_token = self.lexer.get_next_token
+        append = self.tokens.append
+        try:
+            while True:
+                token = get_next_token()
+                append(token)
+                if token.type == TOKEN_TYPES['EOF']:
+                    break
+        except LexerError as e:
+            # Raised once parsing reaches the bad token, so syntax errors
+            # before it are still reported first
+            self.lexer_error = e
+    
+    def token_at(self, index):
+        """Return the buffered token at index (EOF repeats past the end)"""
+        if index < len(self.tokens):
+            return self.tokens[index]
+        if self.lexer_error is not None:
+            raise self.lexer_error
+        return self.tokens[-1]
+    
+    def peek(self, k=1):
+        """Return the token k positions after the current one without consuming anything"""
+        return self.token_at(self.index + k)
+    
+    def locate(self, node, token):
+        """Record that node starts at token and return it"""
+        node.offset = token.offset
+        return node
     
     def error(self, message):
         """Raise a parser error with the current token"""
@@ -172,7 +311,8 @@ class Parser:
         """
         if self.current_token.type == token_type:
             current_token = self.current_token
-            self.current_token = self.lexer.get_next_token()
+            self.index += 1
+            self.current_token = self.token_at(self.index)
             return current_token
         else:
             self.error(
@@ -227,47 +367,37 @@ class Parser:
         token = self.current_token
         
         if token.type == TOKEN_TYPES['SPILL_THE_TEA']:
-            return self.print_statement()
+            node = self.print_statement()
         elif token.type == TOKEN_TYPES['VIBE_CHECK']:
-            return self.input_statement()
+            node = self.input_statement()
         elif token.type in (TOKEN_TYPES['LIT'], TOKEN_TYPES['TEA'], TOKEN_TYPES['MOOD'], TOKEN_TYPES['STAN']):
-            return self.variable_declaration()
+            node = self.variable_declaration()
         elif token.type == TOKEN_TYPES['IDENTIFIER']:
-            # Simple lookahead for assignment by checking the next character
-            current_pos = self.lexer.pos
-            # Look for '=' character after the identifier
-            temp_text = self.lexer.text[current_pos:]
-            has_assign = '=' in temp_text.split(';')[0] and temp_text.split(';')[0].strip().endswith('=') is False and '=' in temp_text.split(';')[0].split()[0:2]
-            
-            # More reliable check: peek ahead for assignment
-            peek_ahead = ""
-            temp_pos = current_pos
-            while temp_pos < len(self.lexer.text) and self.lexer.text[temp_pos] not in [';', '\n']:
-                peek_ahead += self.lexer.text[temp_pos]
-                temp_pos += 1
-            
-            if '=' in peek_ahead and not '==' in peek_ahead and not '!=' in peek_ahead and not '>=' in peek_ahead and not '<=' in peek_ahead:
-                return self.assignment_statement()
+            # IDENTIFIER ASSIGN starts an assignment, anything else an expression
+            if self.peek().type == TOKEN_TYPES['ASSIGN']:
+                node = self.assignment_statement()
             else:
-                return self.expression_statement()
+                node = self.expression_statement()
         elif token.type == TOKEN_TYPES['NO_CAP']:
-            return self.if_statement()
+            node = self.if_statement()
         elif token.type == TOKEN_TYPES['LOWKEY']:
-            return self.while_statement()
+            node = self.while_statement()
         elif token.type == TOKEN_TYPES['HIGHKEY']:
-            return self.for_statement()
-        elif token.type == TOKEN_TYPES['RIZZ_UP']:
-            return self.function_declaration()
+            node = self.for_statement()
+        elif token.type in (TOKEN_TYPES['RIZZ_UP'], TOKEN_TYPES['AT']):
+            node = self.function_declaration()
         elif token.type == TOKEN_TYPES['SLAY']:
-            return self.return_statement()
+            node = self.return_statement()
         elif token.type == TOKEN_TYPES['AND_I_OOP']:
-            return self.break_statement()
+            node = self.break_statement()
         elif token.type == TOKEN_TYPES['AS_IF']:
-            return self.continue_statement()
+            node = self.continue_statement()
         elif token.type == TOKEN_TYPES['LETS_GO']:
-            return self.block_statement()
+            node = self.block_statement()
         else:
-            return self.expression_statement()
+            node = self.expression_statement()
+        
+        return self.locate(node, token)
     
     def print_statement(self):
         """
@@ -305,12 +435,19 @@ class Parser:
     
     def assignment_statement(self):
         """
-        assignment_statement : IDENTIFIER ASSIGN expression SEMICOLON
+        assignment_statement : assignment SEMICOLON
+        """
+        node = self.assignment()
+        self.eat(TOKEN_TYPES['SEMICOLON'])
+        return node
+    
+    def assignment(self):
+        """
+        assignment : IDENTIFIER ASSIGN expression
         """
         variable = self.eat(TOKEN_TYPES['IDENTIFIER']).value
         self.eat(TOKEN_TYPES['ASSIGN'])
         expression = self.expression()
-        self.eat(TOKEN_TYPES['SEMICOLON'])
         return AssignmentStatement(variable, expression)
     
     def if_statement(self):
@@ -343,7 +480,7 @@ class Parser:
     
     def for_statement(self):
         """
-        for_statement : HIGHKEY LPAREN statement expression SEMICOLON expression RPAREN statement
+        for_statement : HIGHKEY LPAREN statement expression SEMICOLON (assignment | simple_statement) RPAREN statement
         """
         self.eat(TOKEN_TYPES['HIGHKEY'])
         self.eat(TOKEN_TYPES['LPAREN'])
@@ -355,8 +492,12 @@ class Parser:
         condition = self.expression()
         self.eat(TOKEN_TYPES['SEMICOLON'])
         
-        # Update
-        update = self.expression()
+        # Update (always stored as a statement so it can be executed directly)
+        token = self.current_token
+        if token.type == TOKEN_TYPES['IDENTIFIER'] and self.peek().type == TOKEN_TYPES['ASSIGN']:
+            update = self.locate(self.assignment(), token)
+        else:
+            update = self.locate(self.simple_statement(), token)
         self.eat(TOKEN_TYPES['RPAREN'])
         
         # Body
@@ -366,8 +507,17 @@ class Parser:
     
     def function_declaration(self):
         """
-        function_declaration : RIZZ_UP IDENTIFIER LPAREN parameters RPAREN block_statement
+        function_declaration : (AT IDENTIFIER)* RIZZ_UP IDENTIFIER LPAREN parameters RPAREN block_statement
         """
+        decorators = []
+        while self.current_token.type == TOKEN_TYPES['AT']:
+            self.eat(TOKEN_TYPES['AT'])
+            token = self.current_token
+            decorator = self.eat(TOKEN_TYPES['IDENTIFIER']).value
+            if decorator not in DECORATORS:
+                raise ParserError(f"Unknown decorator: @{decorator}", token)
+            decorators.append(decorator)
+        
         self.eat(TOKEN_TYPES['RIZZ_UP'])
         name = self.eat(TOKEN_TYPES['IDENTIFIER']).value
         self.eat(TOKEN_TYPES['LPAREN'])
@@ -382,7 +532,7 @@ class Parser:
         # Function body
         body = self.block_statement()
         
-        return FunctionDeclaration(name, params, body)
+        return FunctionDeclaration(name, params, body, decorators)
     
     def parameters(self):
         """
@@ -436,10 +586,24 @@ class Parser:
     
     def expression_statement(self):
         """
-        expression_statement : expression SEMICOLON
+        expression_statement : simple_statement SEMICOLON
         """
-        expr = self.expression()
+        node = self.simple_statement()
         self.eat(TOKEN_TYPES['SEMICOLON'])
+        return node
+    
+    def simple_statement(self):
+        """
+        simple_statement : postfix ASSIGN expression
+                         | expression
+        """
+        expr = self.expression()
+        
+        # An element on the left of = makes this an index assignment
+        if isinstance(expr, IndexExpression) and self.current_token.type == TOKEN_TYPES['ASSIGN']:
+            self.eat(TOKEN_TYPES['ASSIGN'])
+            return IndexAssignment(expr.target, expr.index, self.expression())
+        
         return ExpressionStatement(expr)
     
     def expression(self):
@@ -521,7 +685,7 @@ class Parser:
     
     def unary(self):
         """
-        unary : (PLUS | MINUS) unary | primary
+        unary : (PLUS | MINUS) unary | postfix
         """
         if self.current_token.type in (TOKEN_TYPES['PLUS'], TOKEN_TYPES['MINUS']):
             operator = self.current_token
@@ -529,7 +693,22 @@ class Parser:
             operand = self.unary()
             return UnaryExpression(operator, operand)
         
-        return self.primary()
+        return self.postfix()
+    
+    def postfix(self):
+        """
+        postfix : primary (LBRACKET expression RBRACKET)*
+        """
+        token = self.current_token
+        node = self.primary()
+        
+        while self.current_token.type == TOKEN_TYPES['LBRACKET']:
+            self.eat(TOKEN_TYPES['LBRACKET'])
+            index = self.expression()
+            self.eat(TOKEN_TYPES['RBRACKET'])
+            node = self.locate(IndexExpression(node, index), token)
+            
+        return node
     
     def primary(self):
         """
@@ -539,29 +718,30 @@ class Parser:
                 | IM_DEAD
                 | GHOST
                 | IDENTIFIER (LPAREN arguments RPAREN)?
+                | LBRACKET arguments? RBRACKET
                 | LPAREN expression RPAREN
         """
         token = self.current_token
         
         if token.type == TOKEN_TYPES['INTEGER']:
             self.eat(TOKEN_TYPES['INTEGER'])
-            return LiteralExpression(token.value, 'INTEGER')
+            return self.locate(LiteralExpression(token.value, 'INTEGER'), token)
         
         elif token.type == TOKEN_TYPES['STRING']:
             self.eat(TOKEN_TYPES['STRING'])
-            return LiteralExpression(token.value, 'STRING')
+            return self.locate(LiteralExpression(token.value, 'STRING'), token)
         
         elif token.type == TOKEN_TYPES['THIS_SLAPS']:
             self.eat(TOKEN_TYPES['THIS_SLAPS'])
-            return LiteralExpression(True, 'BOOLEAN')
+            return self.locate(LiteralExpression(True, 'BOOLEAN'), token)
         
         elif token.type == TOKEN_TYPES['IM_DEAD']:
             self.eat(TOKEN_TYPES['IM_DEAD'])
-            return LiteralExpression(False, 'BOOLEAN')
+            return self.locate(LiteralExpression(False, 'BOOLEAN'), token)
         
         elif token.type == TOKEN_TYPES['GHOST']:
             self.eat(TOKEN_TYPES['GHOST'])
-            return LiteralExpression(None, 'NULL')
+            return self.locate(LiteralExpression(None, 'NULL'), token)
         
         elif token.type == TOKEN_TYPES['IDENTIFIER']:
             name = token.value
@@ -577,9 +757,20 @@ class Parser:
                     arguments = self.arguments()
                     
                 self.eat(TOKEN_TYPES['RPAREN'])
-                return FunctionCallExpression(name, arguments)
+                return self.locate(FunctionCallExpression(name, arguments), token)
             else:
-                return VariableExpression(name)
+                return self.locate(VariableExpression(name), token)
+        
+        elif token.type == TOKEN_TYPES['LBRACKET']:
+            self.eat(TOKEN_TYPES['LBRACKET'])
+            
+            # Elements
+            elements = []
+            if self.current_token.type != TOKEN_TYPES['RBRACKET']:
+                elements = self.arguments()
+                
+            self.eat(TOKEN_TYPES['RBRACKET'])
+            return self.locate(ListExpression(elements), token)
         
         elif token.type == TOKEN_TYPES['LPAREN']:
             self.eat(TOKEN_TYPES['LPAREN'])
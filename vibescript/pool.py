@@ -0,0 +1,570 @@
+"""
+VibeScript Worker Pool
+
+This module runs programs in a pool of worker processes instead of the web
+server's own threads. Workers are forked from a server process that has
+already imported the front end and every engine, so a new worker is warm
+from its first job, and each worker keeps its own parse cache.
+
+Interactive programs run in the workers too. A program that stops at a
+vibe_check stays suspended as a session inside the worker that ran it, and
+the job that resumes it with the user's value is routed to that worker by
+the session's token. A streaming job sends its output back over the pipe
+while it runs.
+
+A job that outlives its timeout has its worker killed and replaced. A
+cancelled job is first asked to stop at its next step, and its worker is
+only killed if it does not answer in time. Workers are also replaced after
+a number of jobs (once they hold no suspended session), or once their
+memory grows past a threshold. Jobs wait for a free worker in a bounded
+queue; when the queue is full new jobs are turned away with PoolBusy
+instead of piling up.
+"""
+
+import os
+import signal
+import time
+import threading
+import multiprocessing
+from collections import OrderedDict
+from vibescript.cache import ParseCache
+from vibescript.lexer import RegexLexer
+from vibescript.optimizer import Optimizer
+from vibescript.interpreter import OutputBuffer, InputRequestException, BudgetExceeded, Profiler
+from vibescript.sessions import SessionManager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Modules imported once by the server process that forks the workers
+PRELOAD = [
+    'vibescript.lexer',
+    'vibescript.parser',
+    'vibescript.interpreter',
+    'vibescript.closures',
+    'vibescript.vm',
+    'vibescript.transpiler',
+    'vibescript.cache',
+    'vibescript.optimizer',
+    'vibescript.sessions',
+    'vibescript.pool',
+]
+
+# Seconds a client is asked to wait before retrying a rejected job
+RETRY_AFTER = 1
+
+# Seconds between two looks at whether a waiting or running job was cancelled
+POLL_INTERVAL = 0.1
+
+# Seconds a cancelled job has to stop before its worker is killed
+CANCEL_GRACE = 1.0
+
+# Error of a job resuming a session its worker no longer holds
+SESSION_EXPIRED = "Session expired, run the program again"
+
+class PoolBusy(Exception):
+    """Exception raised when every worker is busy and the queue is full"""
+
+    def __init__(self, message, retry_after=RETRY_AFTER):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(message)
+
+class JobError(Exception):
+    """Error raised by a program in a worker, carried back by its message"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class Job:
+    """A program to run in a worker (cancelling its budget stops it there)
+
+    An interactive job runs the program as a session that suspends at its
+    first vibe_check. A job with a session token resumes that session with
+    value, and only the worker holding it can take it. A streaming job
+    sends ('output', text) messages while it runs.
+    """
+
+    def __init__(self, engine=None, code='', inputs=None, max_output=None, budget=None, profile=False,
+                 interactive=False, stream=False, session=None, value=None):
+        self.engine = engine
+        self.code = code
+        self.inputs = inputs or {}
+        self.max_output = max_output
+        self.budget = budget
+        self.profile = profile
+        self.interactive = interactive
+        self.stream = stream
+        self.session = session
+        self.value = value
+        # Set by the pool: which job of its worker this is
+        self.number = 0
+
+class Result:
+    """What a job printed and how it ended"""
+
+    def __init__(self, output='', variable_name=None, error=None, budget=None, limit=None):
+        self.output = output
+        self.variable_name = variable_name
+        self.error = error
+        self.budget = budget
+        self.limit = limit
+        self.profile = None
+        # Token of the session suspended at the vibe_check for variable_name
+        self.session = None
+        self.truncated = False
+        # Peak RSS and suspended sessions of the worker after the job, and
+        # the statistics of its parse cache and session manager
+        self.rss = 0
+        self.sessions = 0
+        self.stats = None
+
+    def exception(self):
+        """Return the exception the job ended with, or None"""
+        if self.error is None:
+            return None
+        if self.budget is not None:
+            return BudgetExceeded(self.budget, self.limit, self.error)
+        return JobError(self.error)
+
+def is_cancelled(job):
+    """Whether the job's budget was cancelled in this process"""
+    return job.budget is not None and job.budget.cancelled
+
+class RunningJob:
+    """The job a worker is running, as seen by its cancel watcher"""
+
+    def __init__(self):
+        self.number = 0
+        self.budget = None
+
+def make_interpreter(job):
+    """Set up the interpreter for a job's program"""
+    interpreter = job.engine()
+    interpreter.output_stream = OutputBuffer(limit=job.max_output)
+    interpreter.input_values = job.inputs
+    interpreter.budget = job.budget
+    if job.profile:
+        interpreter.profiler = Profiler()
+    return interpreter
+
+def failed(result, e):
+    """Record the exception a job ended with"""
+    if isinstance(e, BudgetExceeded):
+        result.error, result.budget, result.limit = e.message, e.budget, e.limit
+    else:
+        result.error = str(e)
+
+def run_job(job, parse_cache, running=None):
+    """Run a job and describe how it ended"""
+    interpreter = make_interpreter(job)
+    if running is not None:
+        running.budget = interpreter.budget
+
+    result = Result()
+    try:
+        interpreter.interpret(parse_cache.parse(job.code))
+    except InputRequestException as e:
+        result.variable_name = e.variable_name
+    except Exception as e:
+        failed(result, e)
+    result.output = interpreter.output_stream.getvalue()
+    if interpreter.profiler is not None:
+        result.profile = interpreter.profiler.report(job.code)
+    return result
+
+def run_session(job, parse_cache, sessions, send, running=None):
+    """Start or resume a session and run it to its next vibe_check or to its end"""
+    result = Result()
+    try:
+        if job.session is not None:
+            session = sessions.take(job.session)
+        else:
+            session = sessions.open(make_interpreter(job), parse_cache.parse(job.code))
+    except Exception as e:
+        failed(result, e)
+        return result
+    if running is not None:
+        running.budget = session.interpreter.budget
+
+    output_stream = session.interpreter.output_stream
+    offset = session.offset
+    try:
+        if job.stream:
+            for kind, payload in sessions.stream(session, job.value):
+                if kind == 'output':
+                    send(('output', payload))
+                elif kind == 'input':
+                    result.session, result.variable_name = payload.token, payload.variable_name
+        else:
+            step = sessions.advance(session, job.value)
+            result.output = step.output
+            result.session, result.variable_name = step.token, step.variable_name
+    except Exception as e:
+        failed(result, e)
+        if not job.stream:
+            result.output = output_stream.since(offset)[0]
+    result.truncated = output_stream.truncated
+    return result
+
+def watch(cancel, running):
+    """Worker thread body: cancel the running job when the pool asks for it"""
+    while True:
+        time.sleep(POLL_INTERVAL)
+        budget = running.budget
+        if budget is not None and cancel.value == running.number:
+            budget.cancel()
+
+def peak_rss():
+    """Largest resident set size of this process so far, in bytes"""
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def worker_main(conn, cancel, cache_bytes, disabled_passes, session_ttl, max_sessions):
+    """Worker process body: run jobs from the pipe until told to stop"""
+    # Ctrl-C is meant for the web server, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    parse_cache = ParseCache(
+        max_bytes=cache_bytes,
+        lexer_class=RegexLexer,
+        optimizer=Optimizer(disabled=disabled_passes)
+    )
+    sessions = SessionManager(ttl=session_ttl, max_sessions=max_sessions)
+    running = RunningJob()
+    threading.Thread(target=watch, args=(cancel, running), name='vibescript-cancel', daemon=True).start()
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        running.number = job.number
+        try:
+            if job.interactive or job.session is not None:
+                result = run_session(job, parse_cache, sessions, conn.send, running)
+            else:
+                result = run_job(job, parse_cache, running)
+        finally:
+            running.budget = None
+        result.rss = peak_rss()
+        result.stats = {'parse_cache': parse_cache.stats(), 'sessions': sessions.stats()}
+        result.sessions = result.stats['sessions']['live']
+        conn.send(result)
+
+class Worker:
+    """A worker process and the pool's end of its pipe"""
+
+    def __init__(self, context, args):
+        self.conn, child = context.Pipe()
+        # The number of the job the pool wants the worker to cancel
+        self.cancel = context.Value('q', 0, lock=False)
+        self.process = context.Process(target=worker_main, args=(child, self.cancel) + args, daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+        self.rss = 0
+        self.sessions = 0
+        self.retired = False
+
+    def stop(self):
+        """Ask the worker to exit after its current job, killing it if it does not"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        """Kill the worker immediately"""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    """Pre-forked worker processes that run jobs with a hard timeout"""
+
+    def __init__(self, size=None, timeout=15, max_jobs=500, max_rss=256 * 1024 * 1024,
+                 queue_size=None, cache_bytes=8 * 1024 * 1024, disabled_passes=(),
+                 session_ttl=300, max_sessions=256):
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.queue_size = self.size * 4 if queue_size is None else queue_size
+        self.session_ttl = session_ttl
+        # The suspended sessions are spread over the workers
+        self.worker_args = (cache_bytes, tuple(disabled_passes), session_ttl, max(1, max_sessions // self.size))
+        self.context = None
+        self.idle = []
+        self.available = threading.Condition()
+        # Worker holding each suspended session, and when it suspended
+        self.sessions = OrderedDict()
+        # What each live worker reported at the end of its last job
+        self.worker_stats = {}
+        self.slots = threading.BoundedSemaphore(self.size + self.queue_size)
+        self.lock = threading.Lock()
+        self.started = False
+        self.jobs = 0
+        self.killed = 0
+        self.crashed = 0
+        self.recycled = 0
+        self.rejected = 0
+        self.cancellations = 0
+
+    def start(self):
+        """Fork the workers (does nothing if they are already running)"""
+        with self.lock:
+            if self.started:
+                return
+            # Workers forked from a clean, single-threaded server process
+            # never inherit locks held by the web server's threads
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                self.context = multiprocessing.get_context('forkserver')
+                # The main module is imported once there too, not by every worker
+                self.context.set_forkserver_preload(['__main__'] + PRELOAD)
+            else:
+                self.context = multiprocessing.get_context('spawn')
+            workers = [self.spawn() for _ in range(self.size)]
+            with self.available:
+                self.idle.extend(workers)
+                self.available.notify_all()
+            self.started = True
+
+    def spawn(self):
+        """Start a new worker process"""
+        return Worker(self.context, self.worker_args)
+
+    def run(self, job):
+        """Run a job on a free worker (or on the one holding its session) and return its Result"""
+        for kind, payload in self.stream(job):
+            if kind == 'result':
+                return payload
+
+    def stream(self, job):
+        """Run a job, yielding ('output', text) while it prints and ('result', Result) last
+
+        Closing the generator early cancels the job.
+        """
+        self.start()
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise PoolBusy("Server is busy, try again in a moment")
+
+        try:
+            owner = None
+            if job.session is not None:
+                owner = self.owner(job.session)
+                if owner is None:
+                    yield 'result', Result(error=SESSION_EXPIRED)
+                    return
+            worker = self.take(job, owner)
+            if worker is None:
+                yield 'result', self.cancelled()
+                return
+            if worker.retired:
+                yield 'result', Result(error=SESSION_EXPIRED)
+                return
+            try:
+                yield from self.dispatch(worker, job)
+            finally:
+                self.put(self.release(worker))
+        finally:
+            self.slots.release()
+
+    def owner(self, token):
+        """Remove a session's token and return the worker holding the session, or None"""
+        with self.lock:
+            entry = self.sessions.pop(token, None)
+        return entry[0] if entry is not None else None
+
+    def suspended(self, worker, token):
+        """Route later jobs resuming token to worker, forgetting expired sessions"""
+        with self.lock:
+            deadline = time.monotonic() - self.session_ttl
+            while self.sessions:
+                oldest, (_, suspended_at) = next(iter(self.sessions.items()))
+                if suspended_at > deadline:
+                    break
+                del self.sessions[oldest]
+            self.sessions[token] = (worker, time.monotonic())
+
+    def take(self, job, owner=None):
+        """Wait for a free worker (or for owner to be free), or return None if the job is cancelled first
+
+        A retired owner is returned as soon as it is, since it will never be free again.
+        """
+        with self.available:
+            while True:
+                if is_cancelled(job):
+                    return None
+                if owner is None and self.idle:
+                    return self.idle.pop()
+                if owner is not None and (owner.retired or owner in self.idle):
+                    if not owner.retired:
+                        self.idle.remove(owner)
+                    return owner
+                self.available.wait(POLL_INTERVAL)
+
+    def put(self, worker):
+        """Make a worker available to the next job"""
+        with self.available:
+            self.idle.append(worker)
+            self.available.notify_all()
+
+    def dispatch(self, worker, job):
+        """Send a job to a worker, yielding its output messages and then its result"""
+        worker.jobs += 1
+        job.number = worker.jobs
+        with self.lock:
+            self.jobs += 1
+
+        finished = False
+        try:
+            worker.conn.send(job)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if worker.conn.poll(max(0, min(remaining, POLL_INTERVAL))):
+                    message = worker.conn.recv()
+                    if isinstance(message, Result):
+                        finished = True
+                        self.finished(worker, message)
+                        yield 'result', message
+                        return
+                    yield message
+                    continue
+                if is_cancelled(job):
+                    finished = True
+                    self.abort(worker, job)
+                    yield 'result', self.cancelled()
+                    return
+                if remaining <= 0:
+                    break
+        except (EOFError, OSError):
+            # The worker died, most likely killed by the OS for its memory
+            finished = True
+            worker.kill()
+            with self.lock:
+                self.crashed += 1
+            yield 'result', Result(error="Execution worker crashed while running the program")
+            return
+        finally:
+            # The consumer went away while the job was still running
+            if not finished:
+                self.abort(worker, job)
+
+        # Stuck in a single operation the budget cannot interrupt
+        worker.kill()
+        with self.lock:
+            self.killed += 1
+        yield 'result', Result(
+            error=f"Time budget exceeded: stopped after {self.timeout:g} seconds",
+            budget='time',
+            limit=self.timeout
+        )
+
+    def finished(self, worker, result):
+        """Note what a worker reported at the end of a job"""
+        worker.rss = result.rss
+        worker.sessions = result.sessions
+        with self.lock:
+            self.worker_stats[worker] = result.stats
+        if result.session is not None:
+            self.suspended(worker, result.session)
+
+    def abort(self, worker, job):
+        """Ask a worker to cancel its job, killing it if it does not stop in time"""
+        worker.cancel.value = job.number
+        deadline = time.monotonic() + CANCEL_GRACE
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not worker.conn.poll(remaining):
+                    break
+                message = worker.conn.recv()
+                if isinstance(message, Result):
+                    self.finished(worker, message)
+                    return
+        except (EOFError, OSError):
+            pass
+        worker.kill()
+
+    def cancelled(self):
+        """Result of a job cancelled before it finished"""
+        with self.lock:
+            self.cancellations += 1
+        return Result(error="Run cancelled", budget='cancelled')
+
+    def release(self, worker):
+        """Return the worker to use next: this one, or a fresh replacement
+
+        A worker holding suspended sessions is only replaced once it runs out
+        of memory, since replacing it loses them.
+        """
+        if worker.retired:
+            return self.spawn()
+        if not worker.process.is_alive():
+            self.retire(worker)
+            return self.spawn()
+        if worker.rss > self.max_rss or (worker.jobs >= self.max_jobs and not worker.sessions):
+            self.retire(worker)
+            worker.stop()
+            with self.lock:
+                self.recycled += 1
+            return self.spawn()
+        return worker
+
+    def retire(self, worker):
+        """Forget a worker that is being replaced, and the sessions it held"""
+        worker.retired = True
+        with self.lock:
+            self.worker_stats.pop(worker, None)
+            for token in [token for token, (owner, _) in self.sessions.items() if owner is worker]:
+                del self.sessions[token]
+        # Wake jobs waiting for it so they can report their session expired
+        with self.available:
+            self.available.notify_all()
+
+    def close(self):
+        """Stop every idle worker"""
+        with self.lock:
+            self.started = False
+        with self.available:
+            workers, self.idle = self.idle, []
+        for worker in workers:
+            self.retire(worker)
+            worker.stop()
+
+    def stats(self):
+        """Return the pool size and job counters"""
+        with self.available:
+            idle = len(self.idle)
+        with self.lock:
+            return {
+                'workers': self.size,
+                'idle': idle,
+                'queue_size': self.queue_size,
+                'timeout': self.timeout,
+                'jobs': self.jobs,
+                'sessions': len(self.sessions),
+                'killed': self.killed,
+                'crashed': self.crashed,
+                'recycled': self.recycled,
+                'rejected': self.rejected,
+                'cancelled': self.cancellations,
+                'per_worker': [
+                    dict(stats, pid=worker.process.pid, jobs=worker.jobs, rss=worker.rss)
+                    for worker, stats in self.worker_stats.items()
+                ],
+            }
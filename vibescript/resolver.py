@@ -0,0 +1,452 @@
+"""
+VibeScript Resolver
+
+This module runs between the parser and the interpreter. It binds every
+variable reference, assignment and call to the scope that declares the name
+and annotates the node with a (depth, slot) pair: depth is how many frames
+to walk out from the current one and slot is the index inside that frame.
+
+Visibility follows source order: inside one function a name is visible from
+its declaration onwards, while a function body (which runs later) sees
+every declaration of its enclosing scopes. Scopes that declare nothing get
+no frame at run time and are skipped when counting depth. The top-level
+declarations of a function body share the frame of its parameters, unless
+one of them reuses a parameter's name.
+
+A declaration may not have run when a reference to it does: it can sit in
+a branch or loop body that was skipped, or further down than the point a
+function reading it is called from. Such a reference means the next
+enclosing declaration of the name, so every reference also gets the
+(depth, slot) pairs of those, outermost last, for the interpreter to try.
+
+The built-in functions live in a scope of their own around the global
+one, backed at run time by a single frame that every run shares. Calls
+that resolve to a built-in are marked with it, and no assignment may land
+there. A name declared nowhere is not an error yet: it resolves to a slot
+of that scope that never holds a value, so the program fails only if the
+reference runs, like one to a declaration that has not.
+
+A highkey loop of the form highkey (lit i = a; i < b; i = i + c), with c a
+lit literal, is marked as counted when nothing but its own update ever
+writes i: not its body, and no function that could run while it does.
+The interpreter can then keep i in a native counter. The loop keeps the
+mark when the optimizer has moved lit i = a in front of it to hoist part
+of b, leaving an empty initializer.
+"""
+
+from vibescript.grammar import TOKEN_TYPES
+from vibescript.parser import (
+    BlockStatement, VariableDeclaration, FunctionDeclaration, AssignmentStatement,
+    IfStatement, WhileStatement, ForStatement, FunctionCallExpression,
+    BinaryExpression, VariableExpression, LiteralExpression
+)
+from vibescript.memo import PurityAnalysis
+from vibescript.builtins import BUILTINS
+
+# The name of the built-in slot that names declared nowhere resolve to
+UNDEFINED = '$undefined'
+
+# Conditions a counted loop may test its variable with
+COUNTED_COMPARISONS = {
+    TOKEN_TYPES['LESS_THAN'], TOKEN_TYPES['LESS_EQUALS'],
+    TOKEN_TYPES['GREATER_THAN'], TOKEN_TYPES['GREATER_EQUALS'],
+    TOKEN_TYPES['NOT_EQUALS'],
+}
+
+class ResolverError(Exception):
+    """Exception raised when a name cannot be resolved"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class Scope:
+    """A scope being resolved and the slots of the names it declares"""
+
+    def __init__(self, parent, is_function_root=False):
+        self.parent = parent
+        self.is_function_root = is_function_root
+        self.slots = {}
+        self.visible = set()
+        self.has_frame = False
+
+    def declare(self, name):
+        """Reserve a slot for name and return it"""
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+            self.has_frame = True
+        return self.slots[name]
+
+class CountedLoop:
+    """A highkey loop marked as counted, until a write to its variable turns up"""
+
+    def __init__(self, node, function):
+        self.node = node
+        self.function = function
+        self.in_body = False
+
+class Resolver:
+    """Annotates the AST with frame depth and slot for every variable access"""
+
+    def __init__(self):
+        self.builtins = Scope(None)
+        self.builtins.has_frame = True
+        for name in BUILTINS:
+            self.builtins.declare(name)
+            self.builtins.visible.add(name)
+        self.builtins.declare(UNDEFINED)
+        self.scope = None
+        self.function = None
+        # Counted loops and the functions that write a variable, by (scope, name)
+        self.counted = {}
+        self.writers = {}
+
+    def error(self, message):
+        """Raise a resolver error"""
+        raise ResolverError(message)
+
+    def resolve(self, program):
+        """Resolve a Program node in place and return it"""
+        self.scope = Scope(self.builtins, is_function_root=True)
+        # The global frame always exists, even if it declares nothing
+        self.scope.has_frame = True
+        self.declare(program.statements)
+        for statement in program.statements:
+            self.statement(statement)
+        program.slot_count = len(self.scope.slots)
+        # Which functions can have their results cached depends on the slots
+        PurityAnalysis().analyze(program)
+        program.resolved = True
+        return program
+
+    def declare(self, statements):
+        """Reserve slots for everything declared directly in the current scope"""
+        for statement in statements:
+            self.declare_statement(statement)
+
+    def declare_statement(self, statement):
+        """Collect declarations of a statement that land in the enclosing scope"""
+        if isinstance(statement, (VariableDeclaration, FunctionDeclaration)):
+            self.scope.declare(statement.name)
+        elif isinstance(statement, IfStatement):
+            for branch in (statement.if_block, statement.else_block):
+                if branch is not None and not isinstance(branch, BlockStatement):
+                    self.declare_statement(branch)
+        elif isinstance(statement, (WhileStatement, ForStatement)):
+            if isinstance(statement, ForStatement):
+                self.declare_statement(statement.init)
+            if not isinstance(statement.block, BlockStatement):
+                self.declare_statement(statement.block)
+
+    def declares_any(self, statements, names):
+        """Return whether statements directly declare any of names"""
+        enclosing = self.scope
+        self.scope = Scope(None)
+        try:
+            self.declare(statements)
+            return not self.scope.slots.keys().isdisjoint(names)
+        finally:
+            self.scope = enclosing
+
+    def lookup(self, name):
+        """Return the (depth, slot) a reference to name resolves to, or None"""
+        found = self.find(name)
+        if found is None:
+            return None
+        scope, depth = found
+        return depth, scope.slots[name]
+
+    def undefined(self):
+        """Return the (depth, slot) a reference to a name declared nowhere resolves to"""
+        return self.lookup(UNDEFINED)
+
+    def find(self, name):
+        """Return the scope declaring the name a reference resolves to and its depth, or None"""
+        return next(self.find_all(name), None)
+
+    def find_all(self, name):
+        """Yield every scope declaring a name a reference can reach, innermost first, with its depth"""
+        scope = self.scope
+        depth = 0
+        crossed_function = False
+        while scope is not None:
+            if name in scope.slots and (crossed_function or name in scope.visible):
+                yield scope, depth
+            if scope.has_frame:
+                depth += 1
+            if scope.is_function_root:
+                crossed_function = True
+            scope = scope.parent
+
+    def outer(self, name, writable=False):
+        """Return the (depth, slot) of the declarations of name beyond the nearest one"""
+        found = list(self.find_all(name))[1:]
+        return tuple(
+            (depth, scope.slots[name]) for scope, depth in found
+            if not (writable and scope is self.builtins)
+        )
+
+    def write_all(self, name):
+        """Note a write to a name, which lands in any of the declarations it can reach"""
+        for scope, _ in self.find_all(name):
+            if scope is not self.builtins:
+                self.write(scope, name)
+
+    def write(self, scope, name):
+        """Note a write to a variable, unmarking the counted loops it may change"""
+        key = (scope, name)
+        self.writers.setdefault(key, set()).add(self.function)
+        for loop in self.counted.get(key, ()):
+            # Writes from elsewhere in the loop's own function run before or
+            # after it; a function declared anywhere may be called inside it
+            if loop.in_body or self.function is not loop.function:
+                loop.node.counted = None
+
+    def counted_loop(self, node):
+        """Mark a ForStatement as counted if it has the shape of one, and return its CountedLoop"""
+        node.counted = None
+        init, condition, update = node.init, node.condition, node.update
+        if isinstance(init, VariableDeclaration):
+            name, slot = init.name, init.slot
+        elif isinstance(init, BlockStatement) and not init.statements and isinstance(update, AssignmentStatement):
+            # Declared in front of the loop, by the initializer the hoisting
+            # pass moved there, which leaves it in this scope all the same
+            name = update.variable
+            found = self.find(name)
+            if found is None or found[0] is not self.scope:
+                return None
+            slot = self.scope.slots[name]
+        else:
+            return None
+
+        def is_variable(expression):
+            return (isinstance(expression, VariableExpression) and expression.name == name
+                    and expression.depth == 0 and expression.slot == slot)
+
+        if not (isinstance(condition, BinaryExpression) and condition.operator.type in COUNTED_COMPARISONS
+                and is_variable(condition.left)):
+            return None
+        if not (isinstance(update, AssignmentStatement) and update.depth == 0 and update.slot == slot):
+            return None
+        step = update.expression
+        if not (isinstance(step, BinaryExpression) and is_variable(step.left)
+                and isinstance(step.right, LiteralExpression) and step.right.value.__class__ is int):
+            return None
+        if step.operator.type == TOKEN_TYPES['PLUS']:
+            increment = step.right.value
+        elif step.operator.type == TOKEN_TYPES['MINUS']:
+            increment = -step.right.value
+        else:
+            return None
+
+        # A function that writes the variable may be called from the body
+        if any(function is not self.function for function in self.writers.get((self.scope, name), ())):
+            return None
+        loop = CountedLoop(node, self.function)
+        self.counted.setdefault((self.scope, name), []).append(loop)
+        limit = condition.right
+        node.counted = (slot, condition.operator.type, limit, isinstance(limit, LiteralExpression), increment)
+        return loop
+
+    # Statements
+
+    def statement(self, node):
+        """Resolve a statement node"""
+        method_name = f"statement_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.statement_unknown)
+        method(node)
+
+    def statement_unknown(self, node):
+        """Handle unknown node types"""
+        self.error(f"Unknown node type: {node.__class__.__name__}")
+
+    def statement_PrintStatement(self, node):
+        """Resolve a PrintStatement node (spill_the_tea)"""
+        self.expression(node.expression)
+
+    def statement_InputStatement(self, node):
+        """Resolve an InputStatement node (vibe_check)"""
+        # Input for an undeclared variable is silently dropped
+        found = self.find(node.variable)
+        # Built-in functions are read-only
+        if found is None or found[0] is self.builtins:
+            node.depth, node.slot, node.outer = None, None, ()
+            return
+        scope, node.depth = found
+        node.slot = scope.slots[node.variable]
+        node.outer = self.outer(node.variable, writable=True)
+        self.write_all(node.variable)
+
+    def statement_VariableDeclaration(self, node):
+        """Resolve a VariableDeclaration node"""
+        if node.value:
+            self.expression(node.value)
+        node.slot = self.scope.slots[node.name]
+        self.scope.visible.add(node.name)
+        self.write(self.scope, node.name)
+
+    def statement_AssignmentStatement(self, node):
+        """Resolve an AssignmentStatement node"""
+        self.expression(node.expression)
+        found = self.find(node.variable)
+        # Built-in functions are read-only, so assigning to one fails at run
+        # time like assigning to a name declared nowhere
+        if found is None or found[0] is self.builtins:
+            (node.depth, node.slot), node.outer = self.undefined(), ()
+            return
+        scope, node.depth = found
+        node.slot = scope.slots[node.variable]
+        node.outer = self.outer(node.variable, writable=True)
+        self.write_all(node.variable)
+
+    def statement_IndexAssignment(self, node):
+        """Resolve an IndexAssignment node"""
+        self.expression(node.target)
+        self.expression(node.index)
+        self.expression(node.expression)
+
+    def statement_IfStatement(self, node):
+        """Resolve an IfStatement node (no_cap)"""
+        self.expression(node.condition)
+        self.statement(node.if_block)
+        if node.else_block:
+            self.statement(node.else_block)
+
+    def statement_WhileStatement(self, node):
+        """Resolve a WhileStatement node (lowkey)"""
+        self.expression(node.condition)
+        self.statement(node.block)
+
+    def statement_ForStatement(self, node):
+        """Resolve a ForStatement node (highkey)"""
+        self.statement(node.init)
+        self.expression(node.condition)
+        self.statement(node.update)
+        loop = self.counted_loop(node)
+        if loop is None:
+            self.statement(node.block)
+            return
+        loop.in_body = True
+        try:
+            self.statement(node.block)
+        finally:
+            loop.in_body = False
+
+    def statement_FunctionDeclaration(self, node):
+        """Resolve a FunctionDeclaration node (rizz_up)"""
+        node.slot = self.scope.slots[node.name]
+        self.scope.visible.add(node.name)
+
+        enclosing, enclosing_function = self.scope, self.function
+        self.scope = Scope(enclosing, is_function_root=True)
+        self.function = node
+        try:
+            node.param_slots = [self.scope.declare(param) for param in node.params]
+            self.scope.visible.update(node.params)
+            body = node.body
+            if isinstance(body, BlockStatement) and not self.declares_any(body.statements, node.params):
+                # One frame per call: the body's block gets none of its own
+                self.declare(body.statements)
+                for statement in body.statements:
+                    self.statement(statement)
+                body.slot_count = 0
+            else:
+                self.statement(body)
+            node.slot_count = len(self.scope.slots)
+        finally:
+            self.scope, self.function = enclosing, enclosing_function
+
+    def statement_ReturnStatement(self, node):
+        """Resolve a ReturnStatement node (slay)"""
+        if node.expression:
+            self.expression(node.expression)
+        # slay f(...) inside f may be a self tail call; the interpreter
+        # checks at run time that the name still refers to this function
+        node.tail_call = None
+        if (self.function is not None and isinstance(node.expression, FunctionCallExpression)
+                and node.expression.function == self.function.name):
+            node.tail_call = self.function
+
+    def statement_BreakStatement(self, node):
+        """Resolve a BreakStatement node (and_i_oop)"""
+        pass
+
+    def statement_ContinueStatement(self, node):
+        """Resolve a ContinueStatement node (as_if)"""
+        pass
+
+    def statement_BlockStatement(self, node):
+        """Resolve a BlockStatement node (lets_go ... yeet)"""
+        enclosing = self.scope
+        self.scope = Scope(enclosing)
+        try:
+            self.declare(node.statements)
+            for statement in node.statements:
+                self.statement(statement)
+            node.slot_count = len(self.scope.slots)
+        finally:
+            self.scope = enclosing
+
+    def statement_ExpressionStatement(self, node):
+        """Resolve an ExpressionStatement node"""
+        self.expression(node.expression)
+
+    # Expressions
+
+    def expression(self, node):
+        """Resolve an expression node"""
+        method_name = f"expression_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.expression_unknown)
+        method(node)
+
+    def expression_unknown(self, node):
+        """Handle unknown expression node types"""
+        self.error(f"Unknown expression node type: {node.__class__.__name__}")
+
+    def expression_BinaryExpression(self, node):
+        """Resolve a BinaryExpression node"""
+        self.expression(node.left)
+        self.expression(node.right)
+
+    def expression_UnaryExpression(self, node):
+        """Resolve a UnaryExpression node"""
+        self.expression(node.operand)
+
+    def expression_VariableExpression(self, node):
+        """Resolve a VariableExpression node"""
+        location = self.lookup(node.name)
+        if location is None:
+            (node.depth, node.slot), node.outer = self.undefined(), ()
+            return
+        node.depth, node.slot = location
+        node.outer = self.outer(node.name)
+
+    def expression_LiteralExpression(self, node):
+        """Resolve a LiteralExpression node"""
+        pass
+
+    def expression_ListExpression(self, node):
+        """Resolve a ListExpression node"""
+        for element in node.elements:
+            self.expression(element)
+
+    def expression_IndexExpression(self, node):
+        """Resolve an IndexExpression node"""
+        self.expression(node.target)
+        self.expression(node.index)
+
+    def expression_FunctionCallExpression(self, node):
+        """Resolve a FunctionCallExpression node"""
+        found = self.find(node.function)
+        if found is None:
+            (node.depth, node.slot), node.outer = self.undefined(), ()
+            scope = None
+        else:
+            scope, node.depth = found
+            node.slot = scope.slots[node.function]
+            node.outer = self.outer(node.function)
+        # A built-in can never be replaced where it is visible, so the call
+        # can go straight to it
+        node.builtin = BUILTINS[node.function] if scope is self.builtins else None
+        for argument in node.arguments:
+            self.expression(argument)
@@ -0,0 +1,241 @@
+"""
+VibeScript Sessions
+
+This module runs a program on a worker thread so that it can be suspended at
+a vibe_check and resumed later with the value the user typed, instead of
+re-running the whole program with one more input. Suspended programs are
+kept under a random session token until they finish, time out or are
+evicted because too many sessions are alive. While any are suspended, a
+reaper thread closes those idle for longer than the TTL, so their threads
+end even if no request comes in to notice.
+
+A session can be advanced in one step, collecting its output until the
+next stop, or streamed, handing out output chunks while the program runs.
+"""
+
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+class SessionError(Exception):
+    """Exception raised when a session cannot be resumed"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+class SessionClosed(Exception):
+    """Raised inside a suspended program to unwind it when its session is discarded"""
+    pass
+
+# Put on a session's value queue to close it instead of resuming it
+CLOSE = object()
+
+# Seconds between two sweeps of the reaper thread (at most the TTL)
+REAP_INTERVAL = 10
+
+class Step:
+    """Output produced by a session until it suspended or finished"""
+
+    def __init__(self, output, token=None, variable_name=None):
+        self.output = output
+        self.token = token
+        self.variable_name = variable_name
+
+    @property
+    def finished(self):
+        """Whether the program ran to completion"""
+        return self.token is None
+
+class Session:
+    """A program running on its own thread, suspended between input requests"""
+
+    def __init__(self, token, interpreter, program):
+        self.token = token
+        self.interpreter = interpreter
+        self.program = program
+        self.events = queue.Queue()
+        self.values = queue.Queue()
+        self.offset = 0
+        self.closed = False
+        self.last_used = time.monotonic()
+        self.thread = threading.Thread(target=self.run, name=f"vibescript-session-{token[:8]}", daemon=True)
+        interpreter.input_provider = self.request_input
+
+    def run(self):
+        """Thread body: interpret the program and report how it ended"""
+        try:
+            self.interpreter.interpret(self.program)
+        except SessionClosed:
+            return
+        except BaseException as e:
+            self.events.put(('error', e))
+        else:
+            self.events.put(('done', None))
+
+    def proceed(self, value=None):
+        """Start the program, or hand a suspended one its input value"""
+        if self.thread.ident is None:
+            self.thread.start()
+        else:
+            self.values.put(value)
+
+    def on_output(self, text):
+        """Forward printed text to a streaming consumer"""
+        if self.closed:
+            raise SessionClosed()
+        self.events.put(('output', text))
+
+    def request_input(self, name):
+        """Suspend the program until a value for name arrives"""
+        self.events.put(('input', name))
+        value = self.values.get()
+        if value is CLOSE:
+            raise SessionClosed()
+        return value
+
+    def wait(self):
+        """Block until the program suspends or finishes and return what happened"""
+        kind, payload = self.events.get()
+        # The worker thread is blocked or gone, so its output can be read safely
+        chunk, self.offset = self.interpreter.output_stream.since(self.offset)
+        self.last_used = time.monotonic()
+        return kind, payload, chunk
+
+    def close(self):
+        """Unwind the program at its next input request or output"""
+        self.closed = True
+        self.values.put(CLOSE)
+
+class SessionManager:
+    """Keeps suspended programs alive between requests"""
+
+    def __init__(self, ttl=300, max_sessions=256):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+        self.reaper = None
+
+    def open(self, interpreter, program):
+        """Create a session for a program without running it yet"""
+        return Session(secrets.token_urlsafe(16), interpreter, program)
+
+    def take(self, token):
+        """Remove a suspended session so that it can be resumed"""
+        with self.lock:
+            self.reap()
+            session = self.sessions.pop(token, None)
+        if session is None:
+            raise SessionError("Session expired, run the program again")
+        return session
+
+    def start(self, interpreter, program):
+        """Run a program until its first input request or until it finishes"""
+        return self.advance(self.open(interpreter, program))
+
+    def resume(self, token, value):
+        """Deliver an input value to a suspended program and run it to the next stop"""
+        return self.advance(self.take(token), value)
+
+    def advance(self, session, value=None):
+        """Run a session to its next stop and keep it if it suspended again"""
+        session.proceed(value)
+        kind, payload, chunk = session.wait()
+        if kind == 'error':
+            raise payload
+        if kind == 'done':
+            return Step(chunk)
+        return self.suspend(session, chunk, payload)
+
+    def stream(self, session, value=None):
+        """Run a session to its next stop, yielding ('output', text) while it prints
+
+        The last item is ('input', step) when the program suspended again or
+        ('done', step) when it finished; errors are raised. Closing the
+        generator early stops the program.
+        """
+        output_stream = session.interpreter.output_stream
+        output_stream.listener = session.on_output
+        session.proceed(value)
+        stopped = False
+        try:
+            while True:
+                kind, payload = session.events.get()
+                parts = []
+                # Coalesce everything printed while the consumer was busy
+                while kind == 'output':
+                    parts.append(payload)
+                    try:
+                        kind, payload = session.events.get_nowait()
+                    except queue.Empty:
+                        kind = None
+                if parts:
+                    yield 'output', "".join(parts)
+                if kind is not None:
+                    break
+
+            stopped = True
+            output_stream.listener = None
+            session.offset = len(output_stream.chunks)
+            session.last_used = time.monotonic()
+            if kind == 'error':
+                raise payload
+            if kind == 'done':
+                yield 'done', Step("")
+            else:
+                yield 'input', self.suspend(session, "", payload)
+        finally:
+            if not stopped:
+                session.close()
+
+    def suspend(self, session, output, variable_name):
+        """Keep a session that is waiting for input"""
+        with self.lock:
+            self.reap()
+            while len(self.sessions) >= self.max_sessions:
+                _, oldest = self.sessions.popitem(last=False)
+                oldest.close()
+                self.evicted += 1
+            self.sessions[session.token] = session
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=self.reap_idle, name='vibescript-reaper', daemon=True)
+                self.reaper.start()
+        return Step(output, session.token, variable_name)
+
+    def reap(self):
+        """Close sessions idle for longer than the TTL (caller holds the lock)"""
+        deadline = time.monotonic() - self.ttl
+        while self.sessions:
+            token, session = next(iter(self.sessions.items()))
+            if session.last_used > deadline:
+                break
+            del self.sessions[token]
+            session.close()
+            self.expired += 1
+
+    def reap_idle(self):
+        """Reaper thread body: close idle sessions until none is left"""
+        while True:
+            time.sleep(min(self.ttl, REAP_INTERVAL))
+            with self.lock:
+                self.reap()
+                if not self.sessions:
+                    self.reaper = None
+                    return
+
+    def stats(self):
+        """Return the number of live sessions and how many were discarded"""
+        with self.lock:
+            self.reap()
+            return {
+                'live': len(self.sessions),
+                'max_sessions': self.max_sessions,
+                'ttl': self.ttl,
+                'expired': self.expired,
+                'evicted': self.evicted,
+            }
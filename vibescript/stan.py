@@ -0,0 +1,153 @@
+"""
+VibeScript Lists
+
+This module implements stan values, shared by every engine. A stan whose
+elements are all lit values keeps them in a typed array of the narrowest
+integer type that holds them (1, 2, 4 or 8 bytes per element). Storing a
+lit that does not fit widens the array; storing anything else turns the
+stan into a Python list for good.
+
+Elements are numbered from 0. Indexing checks its index, so reading or
+writing past either end is an error rather than Python's wrap-around.
+"""
+
+from array import array
+
+# Signed integer array types from narrowest to widest, with the first
+# value each one cannot hold
+LIMITS = [(code, 1 << (array(code).itemsize * 8 - 1)) for code in ('b', 'h', 'i', 'q')]
+
+# Names of VibeScript types in error messages
+TYPE_NAMES = {
+    int: 'lit',
+    float: 'lit',
+    str: 'tea',
+    bool: 'mood',
+    type(None): 'ghost',
+}
+
+class StanError(Exception):
+    """Exception raised when a value is indexed the wrong way"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+def type_name(value):
+    """Name of the VibeScript type of a value"""
+    if value.__class__ is Stan:
+        return 'stan'
+    return TYPE_NAMES.get(value.__class__, 'function')
+
+def typecode(low, high):
+    """Return the narrowest array type that holds every lit from low to high, or None"""
+    for code, limit in LIMITS:
+        if -limit <= low and high < limit:
+            return code
+    return None
+
+def pack(values):
+    """Return the storage for a new list of values: a typed array if they are all lit values"""
+    if not values:
+        return array('b')
+    if set(map(type, values)) != {int}:
+        return values
+    code = typecode(min(values), max(values))
+    return array(code, values) if code else values
+
+class Stan:
+    """A stan value: a list stored in a typed array or a Python list"""
+
+    __slots__ = ('items',)
+
+    def __init__(self, items=None):
+        self.items = items if items is not None else array('b')
+
+    def get(self, index):
+        """Return the element at index"""
+        items = self.items
+        if index.__class__ is not int or not 0 <= index < len(items):
+            self.bad_index(index)
+        return items[index]
+
+    def set(self, index, value):
+        """Store value at index, widening the storage if it does not fit"""
+        items = self.items
+        if index.__class__ is not int or not 0 <= index < len(items):
+            self.bad_index(index)
+        if items.__class__ is list:
+            items[index] = value
+            return
+        if value.__class__ is int:
+            try:
+                items[index] = value
+                return
+            except OverflowError:
+                pass
+        items = items.tolist()
+        items[index] = value
+        self.items = pack(items)
+
+    def bad_index(self, index):
+        """Raise the error for an index that is not a lit within bounds"""
+        if index.__class__ is not int:
+            raise StanError(f"Index must be a lit, got {type_name(index)}")
+        raise StanError(f"Index {index} is out of range for a stan of length {len(self.items)}")
+
+    def tolist(self):
+        """Return the elements as a new Python list"""
+        items = self.items
+        return items.tolist() if items.__class__ is array else list(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __str__(self):
+        return str(self.tolist())
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        if other.__class__ is not Stan:
+            return NotImplemented
+        if self.items.__class__ is other.items.__class__:
+            return self.items == other.items
+        return self.tolist() == other.tolist()
+
+    __hash__ = None
+
+    def __add__(self, other):
+        if other.__class__ is not Stan:
+            return NotImplemented
+        a, b = self.items, other.items
+        if a.__class__ is array and b.__class__ is array and a.typecode == b.typecode:
+            return Stan(a + b)
+        return Stan(pack(self.tolist() + other.tolist()))
+
+    def __mul__(self, count):
+        if not isinstance(count, int):
+            return NotImplemented
+        return Stan(self.items * count)
+
+    __rmul__ = __mul__
+
+def get_item(container, index):
+    """Evaluate container[index] for a stan or a tea"""
+    if container.__class__ is Stan:
+        return container.get(index)
+    if container.__class__ is str:
+        if index.__class__ is not int:
+            raise StanError(f"Index must be a lit, got {type_name(index)}")
+        if not 0 <= index < len(container):
+            raise StanError(f"Index {index} is out of range for a tea of length {len(container)}")
+        return container[index]
+    raise StanError(f"Cannot index a {type_name(container)}")
+
+def set_item(container, index, value):
+    """Perform container[index] = value for a stan"""
+    if container.__class__ is not Stan:
+        raise StanError(f"Cannot assign to an element of a {type_name(container)}")
+    container.set(index, value)
@@ -0,0 +1,816 @@
+"""
+VibeScript Transpiler
+
+This module translates the AST generated by the parser into Python source,
+compiles it with compile() and runs the resulting code object, so programs
+execute as native CPython bytecode.
+
+VibeScript scopes are resolved statically: every declaration gets its own
+Python name, so block scoping and shadowing survive the translation into
+Python's function-level scopes. A reference that may run before its
+declaration has (from a function called early, or after a branch or loop
+body that was skipped) fails with the NameError of an unbound Python name;
+where an enclosing declaration of the same name could stand in for it, the
+names involved start out as _vs_UNSET and the reference tries each in turn,
+like the tree-walker. Compiled programs are cached by a hash of their
+source. Programs run under a budget get calls into it at the top of
+every loop body and around every function body.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from vibescript.grammar import TOKEN_TYPES
+from vibescript.parser import (
+    BlockStatement, VariableDeclaration, FunctionDeclaration,
+    IfStatement, WhileStatement, ForStatement
+)
+from vibescript.resolver import Resolver
+from vibescript.memo import MemoCache
+from vibescript.interpreter import (
+    Interpreter, InterpreterError,
+    ReturnValue, BreakException, ContinueException
+)
+from vibescript.stan import Stan, pack, get_item, set_item
+from vibescript.builtins import BUILTINS
+
+# Maximum number of compiled programs kept in the code cache
+CODE_CACHE_SIZE = 128
+
+# Python operator precedence levels used to decide where parentheses go
+PREC_CONDITIONAL = 10
+PREC_COMPARISON = 60
+PREC_ADDITION = 70
+PREC_MULTIPLICATION = 80
+PREC_UNARY = 90
+PREC_ATOM = 100
+
+COMPARISONS = {
+    TOKEN_TYPES['EQUALS']: '==',
+    TOKEN_TYPES['NOT_EQUALS']: '!=',
+    TOKEN_TYPES['LESS_THAN']: '<',
+    TOKEN_TYPES['GREATER_THAN']: '>',
+    TOKEN_TYPES['LESS_EQUALS']: '<=',
+    TOKEN_TYPES['GREATER_EQUALS']: '>=',
+}
+
+# Python names of the built-in functions in generated code
+BUILTIN_NAMES = {name: f"_vs_builtin_{name}" for name in BUILTINS}
+
+DEFAULT_VALUES = {
+    TOKEN_TYPES['LIT']: '0',
+    TOKEN_TYPES['TEA']: '""',
+    TOKEN_TYPES['MOOD']: 'False',
+    TOKEN_TYPES['STAN']: '_vs_Stan()',
+}
+
+class Scope:
+    """A VibeScript scope and the Python names of its declarations"""
+
+    def __init__(self, parent, function, is_function_root=False):
+        self.parent = parent
+        self.function = function
+        self.is_function_root = is_function_root
+        self.names = {}
+        self.visible = set()
+
+class PythonFunction:
+    """A Python function being generated (the program itself or a rizz_up)"""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.owned = set()
+        self.nonlocals = set()
+
+class Loop:
+    """A loop being generated: the update an as_if repeats, and whether its body calls functions"""
+
+    def __init__(self, update=None):
+        self.update = update
+        self.calls = False
+
+class Expr:
+    """Generated Python expression source with its precedence and known type"""
+
+    __slots__ = ('code', 'precedence', 'kind')
+
+    def __init__(self, code, precedence=PREC_ATOM, kind=None):
+        self.code = code
+        self.precedence = precedence
+        self.kind = kind
+
+class Transpiler:
+    """Translates a VibeScript Program into Python source"""
+
+    def __init__(self, rebound=None, unset=None, budgeted=False):
+        self.budgeted = budgeted
+        self.lines = []
+        self.indent = 0
+        self.scope = None
+        self.function = None
+        self.loops = []
+        self.counter = 0
+        self.temps = 0
+        self.written = set()
+        self.rebound = rebound
+        self.unset = unset
+        self.conditional = set()
+        self.source_names = {}
+        self.function_names = set()
+
+    def transpile(self, program):
+        """Return Python source defining _vs_main() for the program"""
+        if self.rebound is None:
+            # A first pass collects which names are ever rebound by something
+            # other than a function declaration, which decides whether call
+            # sites may call a function directly, and which start out unset.
+            analysis = Transpiler(rebound=set(), unset=set(), budgeted=self.budgeted)
+            analysis.generate(program)
+            self.rebound = analysis.written
+            self.unset = analysis.unset
+        return self.generate(program)
+
+    def generate(self, program):
+        """Generate the module source for a program"""
+        self.function = PythonFunction(None)
+        # Built-in functions are module globals shared by every run, in a
+        # scope around the program's own
+        builtins = Scope(None, None)
+        builtins.names.update(BUILTIN_NAMES)
+        builtins.visible.update(BUILTIN_NAMES)
+        self.scope = Scope(builtins, self.function, is_function_root=True)
+        self.declare(self.scope, program.statements)
+
+        body = self.reset(self.scope, 1) + self.body(program.statements, indent=1)
+        return '\n'.join(['def _vs_main():'] + body) + '\n'
+
+    # Scope handling
+
+    def declare(self, scope, statements):
+        """Give every name declared directly in a scope its Python name"""
+        for statement in statements:
+            self.declare_statement(scope, statement)
+
+    def declare_statement(self, scope, statement, conditional=False):
+        """Collect declarations of a statement that land in the enclosing scope"""
+        if isinstance(statement, (VariableDeclaration, FunctionDeclaration)):
+            if statement.name not in scope.names:
+                python_name = self.python_name(statement.name)
+                scope.names[statement.name] = python_name
+                scope.function.owned.add(python_name)
+            # One in a branch or loop body may be skipped
+            if conditional:
+                self.conditional.add(scope.names[statement.name])
+        elif isinstance(statement, IfStatement):
+            for branch in (statement.if_block, statement.else_block):
+                if branch is not None and not isinstance(branch, BlockStatement):
+                    self.declare_statement(scope, branch, True)
+        elif isinstance(statement, (WhileStatement, ForStatement)):
+            if isinstance(statement, ForStatement):
+                self.declare_statement(scope, statement.init, conditional)
+            if not isinstance(statement.block, BlockStatement):
+                self.declare_statement(scope, statement.block, True)
+
+    def python_name(self, name):
+        """Create a unique Python identifier for a VibeScript name"""
+        self.counter += 1
+        python_name = f"{re.sub(r'[^0-9A-Za-z_]', '_', name)}_{self.counter}"
+        self.source_names[python_name] = name
+        return python_name
+
+    def resolve(self, name, store=False):
+        """Find the Python names of the declarations a reference (or an assignment) can mean
+
+        Returns them nearest first, with whether the nearest one may not
+        have run yet when the reference does.
+        """
+        names = []
+        checked = False
+        scope = self.scope
+        crossed_function = False
+        while scope is not None:
+            # Inside the same function only earlier declarations are visible;
+            # a function body runs later and sees its enclosing scopes whole.
+            if name in scope.names and (crossed_function or name in scope.visible):
+                # Built-in functions are read-only
+                if store and scope.function is None:
+                    break
+                if not names:
+                    checked = crossed_function or scope.names[name] in self.conditional
+                names.append(scope.names[name])
+            if scope.is_function_root:
+                crossed_function = True
+            scope = scope.parent
+        return names, checked
+
+    def fallback(self, names, checked):
+        """Return whether a reference must try each of the declarations it can mean"""
+        if not checked:
+            return False
+        if len(names) > 1:
+            self.unset.update(names)
+            return True
+        return names[0] in self.unset
+
+    def reset(self, scope, indent):
+        """Return the lines that start the names of a scope out unset where that is needed"""
+        return ['    ' * indent + f"{python_name} = _vs_UNSET"
+                for python_name in scope.names.values() if python_name in self.unset]
+
+    def store(self, python_name):
+        """Record an assignment to a Python name from the current function"""
+        if python_name not in self.function.owned:
+            self.function.nonlocals.add(python_name)
+
+    def temp(self):
+        """Create a fresh temporary local"""
+        self.temps += 1
+        return f"_vs_t{self.temps}"
+
+    # Statements
+
+    def emit(self, line):
+        """Append a line of Python source at the current indentation"""
+        self.lines.append('    ' * self.indent + line)
+
+    def body(self, statements, indent):
+        """Generate the statements of a block and return its lines"""
+        outer = (self.lines, self.indent)
+        self.lines = []
+        self.indent = indent
+        try:
+            for statement in statements:
+                self.statement(statement)
+            if not self.lines:
+                self.emit('pass')
+            return self.lines
+        finally:
+            self.lines, self.indent = outer
+
+    def nested(self, node):
+        """Generate a statement used as the body of an if or loop"""
+        if isinstance(node, BlockStatement):
+            self.block(node)
+        else:
+            self.lines.extend(self.body([node], self.indent + 1))
+
+    def block(self, node):
+        """Generate a block statement with its own scope"""
+        outer = self.scope
+        self.scope = Scope(outer, self.function)
+        self.declare(self.scope, node.statements)
+        try:
+            self.lines.extend(self.reset(self.scope, self.indent + 1))
+            self.lines.extend(self.body(node.statements, self.indent + 1))
+        finally:
+            self.scope = outer
+
+    def statement(self, node):
+        """Generate a statement node"""
+        method_name = f"statement_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.statement_unknown)
+        method(node)
+
+    def statement_unknown(self, node):
+        """Handle unknown node types"""
+        raise InterpreterError(f"Unknown node type: {node.__class__.__name__}")
+
+    def statement_PrintStatement(self, node):
+        """Generate a PrintStatement node (spill_the_tea)"""
+        self.emit(f"_vs_print({self.expression(node.expression).code})")
+
+    def statement_InputStatement(self, node):
+        """Generate an InputStatement node (vibe_check)"""
+        names, checked = self.resolve(node.variable, store=True)
+        if not names:
+            # Assigning an input to an undefined variable is silently ignored
+            self.emit(f"_vs_input({node.variable!r})")
+            return
+        if not checked:
+            self.store(names[0])
+            self.written.add(names[0])
+            self.emit(f"{names[0]} = _vs_input({node.variable!r})")
+            return
+        # It is dropped too when no declaration it can mean has run
+        self.unset.update(names)
+        t = self.temp()
+        self.emit(f"{t} = _vs_input({node.variable!r})")
+        self.store_declared(names, t)
+
+    def statement_VariableDeclaration(self, node):
+        """Generate a VariableDeclaration node"""
+        python_name = self.scope.names[node.name]
+        default = DEFAULT_VALUES.get(node.data_type, 'None')
+        self.written.add(python_name)
+
+        if node.value is None:
+            self.scope.visible.add(node.name)
+            self.emit(f"{python_name} = {default}")
+            return
+
+        value = self.expression(node.value)
+        self.scope.visible.add(node.name)
+        self.emit(f"{python_name} = {value.code}")
+        if value.kind is None and default != 'None':
+            # The declared type's default replaces a ghost value
+            self.emit(f"if {python_name} is None:")
+            self.emit(f"    {python_name} = {default}")
+
+    def statement_AssignmentStatement(self, node):
+        """Generate an AssignmentStatement node"""
+        value = self.expression(node.expression)
+        names, checked = self.resolve(node.variable, store=True)
+        if not names:
+            self.emit(f"_vs_undefined({node.variable!r}, {value.code})")
+            return
+        if not checked:
+            self.store(names[0])
+            self.written.add(names[0])
+            self.emit(f"{names[0]} = {value.code}")
+            return
+        t = self.temp()
+        self.emit(f"{t} = {value.code}")
+        if self.fallback(names, checked):
+            self.store_declared(names, t)
+            self.emit('else:')
+            self.emit(f"    _vs_undefined({node.variable!r})")
+            return
+        # Reading the name first raises the NameError if it is unbound
+        self.store(names[0])
+        self.written.update(names)
+        self.emit(names[0])
+        self.emit(f"{names[0]} = {t}")
+
+    def store_declared(self, names, value):
+        """Generate an assignment to the first of names that is not unset"""
+        for i, python_name in enumerate(names):
+            self.store(python_name)
+            self.written.add(python_name)
+            self.emit(f"{'elif' if i else 'if'} {python_name} is not _vs_UNSET:")
+            self.emit(f"    {python_name} = {value}")
+
+    def statement_IndexAssignment(self, node):
+        """Generate an IndexAssignment node"""
+        target = self.expression(node.target).code
+        index = self.expression(node.index).code
+        value = self.expression(node.expression).code
+        self.emit(f"_vs_set_item({target}, {index}, {value})")
+
+    def statement_IfStatement(self, node):
+        """Generate an IfStatement node (no_cap)"""
+        # Python truthiness matches Interpreter.is_truthy for every VibeScript value
+        self.emit(f"if {self.expression(node.condition).code}:")
+        self.nested(node.if_block)
+        if node.else_block is not None:
+            self.emit('else:')
+            self.nested(node.else_block)
+
+    def statement_WhileStatement(self, node):
+        """Generate a WhileStatement node (lowkey)"""
+        self.emit(f"while {self.expression(node.condition).code}:")
+        self.tick()
+        self.loop_body(node.block, Loop())
+
+    def statement_ForStatement(self, node):
+        """Generate a ForStatement node (highkey)"""
+        self.statement(node.init)
+        self.emit(f"while {self.expression(node.condition).code}:")
+        self.tick()
+
+        # as_if still performs the update, so it is repeated at every continue
+        update = self.body([node.update], 0)
+        self.loop_body(node.block, Loop(update))
+        for line in update:
+            self.emit('    ' + line)
+
+    def loop_body(self, block, loop):
+        """Generate the body of a loop
+
+        A body that calls functions is wrapped in try, so that an and_i_oop
+        or as_if in a called function breaks or continues this loop.
+        """
+        start = len(self.lines)
+        self.loops.append(loop)
+        try:
+            self.nested(block)
+        finally:
+            self.loops.pop()
+        if not loop.calls:
+            return
+
+        lines = ['    ' + line for line in self.lines[start:]]
+        del self.lines[start:]
+        self.emit('    try:')
+        self.lines.extend(lines)
+        self.emit('    except _vs_Break:')
+        self.emit('        break')
+        self.emit('    except _vs_Continue:')
+        for line in loop.update or ():
+            self.emit('        ' + line)
+        self.emit('        continue')
+
+    def tick(self):
+        """Count a loop iteration against the budget (emitted at the top of the body)"""
+        if self.budgeted:
+            self.emit('    _vs_tick()')
+
+    def statement_FunctionDeclaration(self, node):
+        """Generate a FunctionDeclaration node (rizz_up)"""
+        python_name = self.scope.names[node.name]
+        self.scope.visible.add(node.name)
+        self.function_names.add(python_name)
+
+        outer = (self.scope, self.function, self.loops, self.temps)
+        self.function = PythonFunction(outer[1])
+        self.scope = Scope(outer[0], self.function, is_function_root=True)
+        self.loops = []
+        self.temps = 0
+        try:
+            params = []
+            for param in node.params:
+                if param not in self.scope.names:
+                    self.scope.names[param] = self.python_name(param)
+                    self.scope.visible.add(param)
+                    self.function.owned.add(self.scope.names[param])
+                params.append(f"{self.scope.names[param]}=None")
+            params.append('*_vs_extra')
+
+            outer_scope = self.scope
+            self.scope = Scope(outer_scope, self.function)
+            self.declare(self.scope, node.body.statements)
+            # A budgeted body goes one level deeper, inside try/finally
+            indent = self.indent + (2 if self.budgeted else 1)
+            lines = self.reset(self.scope, indent) + self.body(node.body.statements, indent)
+            nonlocals = sorted(self.function.nonlocals)
+        finally:
+            self.scope, self.function, self.loops, self.temps = outer
+
+        self.emit(f"def {python_name}({', '.join(params)}):")
+        if nonlocals:
+            self.emit(f"    nonlocal {', '.join(nonlocals)}")
+            for name in nonlocals:
+                if name not in self.function.owned:
+                    self.function.nonlocals.add(name)
+        if self.budgeted:
+            self.emit('    _vs_enter()')
+            self.emit('    try:')
+            self.lines.extend(lines)
+            self.emit('    finally:')
+            self.emit('        _vs_leave()')
+        else:
+            self.lines.extend(lines)
+
+    def statement_ReturnStatement(self, node):
+        """Generate a ReturnStatement node (slay)"""
+        value = self.expression(node.expression).code if node.expression else 'None'
+        if self.function.parent is None:
+            # slay at the top level behaves like the tree-walker
+            self.emit(f"raise _vs_Return({value})")
+        else:
+            self.emit(f"return {value}")
+
+    def statement_BreakStatement(self, node):
+        """Generate a BreakStatement node (and_i_oop)"""
+        self.emit('break' if self.loops else 'raise _vs_Break()')
+
+    def statement_ContinueStatement(self, node):
+        """Generate a ContinueStatement node (as_if)"""
+        if not self.loops:
+            self.emit('raise _vs_Continue()')
+            return
+        update = self.loops[-1].update
+        if update is not None:
+            for line in update:
+                self.emit(line)
+        self.emit('continue')
+
+    def statement_BlockStatement(self, node):
+        """Generate a BlockStatement node (lets_go ... yeet)"""
+        self.emit('if True:')
+        self.block(node)
+
+    def statement_ExpressionStatement(self, node):
+        """Generate an ExpressionStatement node"""
+        self.emit(self.expression(node.expression).code)
+
+    # Expressions
+
+    def expression(self, node):
+        """Generate an expression node"""
+        method_name = f"expression_{node.__class__.__name__}"
+        method = getattr(self, method_name, self.expression_unknown)
+        return method(node)
+
+    def expression_unknown(self, node):
+        """Handle unknown expression node types"""
+        raise InterpreterError(f"Unknown expression node type: {node.__class__.__name__}")
+
+    def operand(self, expr, precedence):
+        """Parenthesize an operand that binds more loosely than precedence"""
+        if expr.precedence < precedence:
+            return f"({expr.code})"
+        return expr.code
+
+    def expression_BinaryExpression(self, node):
+        """Generate a BinaryExpression node"""
+        operator_type = node.operator.type
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+
+        if operator_type in COMPARISONS:
+            # Comparisons never chain in VibeScript, so nested ones get parentheses
+            code = (f"{self.operand(left, PREC_COMPARISON + 1)} {COMPARISONS[operator_type]} "
+                    f"{self.operand(right, PREC_COMPARISON + 1)}")
+            return Expr(code, PREC_COMPARISON, 'bool')
+
+        if operator_type == TOKEN_TYPES['PLUS']:
+            return self.addition(left, right)
+
+        if operator_type == TOKEN_TYPES['MINUS']:
+            code = f"{self.operand(left, PREC_ADDITION)} - {self.operand(right, PREC_ADDITION + 1)}"
+            return Expr(code, PREC_ADDITION, 'number')
+
+        if operator_type == TOKEN_TYPES['MULTIPLY']:
+            code = f"{self.operand(left, PREC_MULTIPLICATION)} * {self.operand(right, PREC_MULTIPLICATION + 1)}"
+            return Expr(code, PREC_MULTIPLICATION)
+
+        if operator_type in (TOKEN_TYPES['DIVIDE'], TOKEN_TYPES['MODULO']):
+            symbol = '/' if operator_type == TOKEN_TYPES['DIVIDE'] else '%'
+            helper = '_vs_divide' if symbol == '/' else '_vs_modulo'
+            right_code = self.operand(right, PREC_MULTIPLICATION + 1)
+            if left.kind == 'number':
+                code = f"{self.operand(left, PREC_MULTIPLICATION)} {symbol} {right_code}"
+                return Expr(code, PREC_MULTIPLICATION, 'number')
+            # Numbers use the native operator (ZeroDivisionError is reported
+            # as "Division by zero"); anything else checks the divisor first.
+            t = self.temp()
+            code = (f"{t} {symbol} {right_code} if type({t} := {left.code}) is int "
+                    f"else {helper}({t}, {right.code})")
+            return Expr(code, PREC_CONDITIONAL)
+
+        raise InterpreterError(f"Unknown binary operator: {operator_type}")
+
+    def addition(self, left, right):
+        """Generate '+' with string coercion"""
+        if left.kind == 'str' or right.kind == 'str':
+            parts = []
+            for side in (left, right):
+                if side.kind == 'str':
+                    parts.append(self.operand(side, PREC_ADDITION + 1) if parts else self.operand(side, PREC_ADDITION))
+                else:
+                    parts.append(f"str({side.code})")
+            return Expr(' + '.join(parts), PREC_ADDITION, 'str')
+
+        if left.kind == 'number' and right.kind == 'number':
+            code = f"{self.operand(left, PREC_ADDITION)} + {self.operand(right, PREC_ADDITION + 1)}"
+            return Expr(code, PREC_ADDITION, 'number')
+
+        # Integers take the native path, everything else goes through _vs_add
+        a = self.temp()
+        if right.kind == 'number' and right.precedence == PREC_ATOM:
+            code = f"{a} + {right.code} if type({a} := {left.code}) is int else _vs_add({a}, {right.code})"
+        else:
+            b = self.temp()
+            code = (f"{a} + {b} if type({a} := {left.code}) is type({b} := {right.code}) is int "
+                    f"else _vs_add({a}, {b})")
+        return Expr(code, PREC_CONDITIONAL)
+
+    def expression_UnaryExpression(self, node):
+        """Generate a UnaryExpression node"""
+        operand = self.expression(node.operand)
+        if node.operator.type == TOKEN_TYPES['MINUS']:
+            return Expr(f"-{self.operand(operand, PREC_UNARY)}", PREC_UNARY, 'number')
+        elif node.operator.type == TOKEN_TYPES['PLUS']:
+            return operand
+        raise InterpreterError(f"Unknown unary operator: {node.operator.type}")
+
+    def expression_VariableExpression(self, node):
+        """Generate a VariableExpression node"""
+        names, checked = self.resolve(node.name)
+        if not names:
+            return Expr(f"_vs_undefined({node.name!r})")
+        if self.fallback(names, checked):
+            return Expr(f"_vs_read({node.name!r}, {', '.join(names)})")
+        return Expr(names[0])
+
+    def expression_LiteralExpression(self, node):
+        """Generate a LiteralExpression node"""
+        value = node.value
+        if isinstance(value, str):
+            kind = 'str'
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            kind = 'number'
+        elif value is None:
+            kind = None
+        else:
+            kind = 'bool'
+        code = repr(value)
+        precedence = PREC_UNARY if code.startswith('-') else PREC_ATOM
+        return Expr(code, precedence, kind)
+
+    def expression_ListExpression(self, node):
+        """Generate a ListExpression node"""
+        elements = ', '.join(self.expression(element).code for element in node.elements)
+        return Expr(f"_vs_Stan(_vs_pack([{elements}]))", PREC_ATOM, 'stan')
+
+    def expression_IndexExpression(self, node):
+        """Generate an IndexExpression node"""
+        target = self.expression(node.target).code
+        index = self.expression(node.index).code
+        return Expr(f"_vs_get_item({target}, {index})")
+
+    def expression_FunctionCallExpression(self, node):
+        """Generate a FunctionCallExpression node"""
+        names, checked = self.resolve(node.function)
+        if not names:
+            # The callee is checked before the arguments are evaluated
+            return Expr(f"_vs_not_a_function({node.function!r})")
+
+        python_name = names[0]
+        if self.fallback(names, checked):
+            python_name = f"_vs_first({', '.join(names)})"
+        arguments = ', '.join(self.expression(argument).code for argument in node.arguments)
+        if self.loops:
+            self.loops[-1].calls = True
+        if len(names) == 1 and self.rebound is not None and python_name not in self.rebound:
+            # Only ever bound by rizz_up, so it is always a function
+            return Expr(f"{python_name}({arguments})")
+        return Expr(f"_vs_callee({python_name}, {node.function!r})({arguments})")
+
+def _vs_add(left, right):
+    """'+' with string coercion, matching Interpreter.evaluate_BinaryExpression"""
+    if isinstance(left, str) or isinstance(right, str):
+        return str(left) + str(right)
+    return left + right
+
+def _vs_divide(left, right):
+    """'/' for operands that are not plain integers"""
+    if right == 0:
+        raise InterpreterError("Division by zero")
+    return left / right
+
+def _vs_modulo(left, right):
+    """'%' for operands that are not plain integers"""
+    if right == 0:
+        raise InterpreterError("Division by zero")
+    return left % right
+
+def _vs_undefined(name, *values):
+    """Reference or assignment to a variable that was never declared"""
+    raise InterpreterError(f"Undefined variable: {name}")
+
+# The value of a name whose declaration has not run, where a reference
+# falls back to an enclosing declaration
+_vs_UNSET = object()
+
+def _vs_first(*values):
+    """The value of the first declaration that has run, or _vs_UNSET"""
+    for value in values:
+        if value is not _vs_UNSET:
+            return value
+    return _vs_UNSET
+
+def _vs_read(name, *values):
+    """Reference to the first declaration of a variable that has run"""
+    value = _vs_first(*values)
+    if value is _vs_UNSET:
+        _vs_undefined(name)
+    return value
+
+def _vs_not_a_function(name):
+    """Call of a name that does not hold a function"""
+    raise InterpreterError(f"'{name}' is not a function")
+
+def _vs_callee(function, name):
+    """Check that a value bound to a name can be called"""
+    if not callable(function):
+        _vs_not_a_function(name)
+    return function
+
+RUNTIME_HELPERS = {
+    '_vs_add': _vs_add,
+    '_vs_divide': _vs_divide,
+    '_vs_modulo': _vs_modulo,
+    '_vs_undefined': _vs_undefined,
+    '_vs_UNSET': _vs_UNSET,
+    '_vs_first': _vs_first,
+    '_vs_read': _vs_read,
+    '_vs_not_a_function': _vs_not_a_function,
+    '_vs_callee': _vs_callee,
+    '_vs_Stan': Stan,
+    '_vs_pack': pack,
+    '_vs_get_item': get_item,
+    '_vs_set_item': set_item,
+    '_vs_Return': ReturnValue,
+    '_vs_Break': BreakException,
+    '_vs_Continue': ContinueException,
+}
+RUNTIME_HELPERS.update((python_name, BUILTINS[name]) for name, python_name in BUILTIN_NAMES.items())
+
+class CompiledProgram:
+    """A transpiled program: its Python source, code object and name table"""
+
+    def __init__(self, source, code, source_names, function_names):
+        self.source = source
+        self.code = code
+        self.source_names = source_names
+        self.function_names = function_names
+
+# Compiled programs keyed by the SHA-256 of their VibeScript source and
+# whether they were compiled with budget checks; runs on several threads
+# share it, so it is only touched with code_cache_lock held
+code_cache = OrderedDict()
+code_cache_lock = threading.Lock()
+
+def compile_program(program, source=None, budgeted=False):
+    """Transpile a Program and compile it into a CompiledProgram"""
+    transpiler = Transpiler(budgeted=budgeted)
+    python_source = transpiler.transpile(program)
+    code = compile(python_source, '<vibescript>', 'exec')
+    return CompiledProgram(python_source, code, transpiler.source_names, transpiler.function_names)
+
+class PythonInterpreter(Interpreter):
+    """Interpreter that runs the program as compiled Python code"""
+
+    def interpret(self, program=None):
+        """Interpret the program (parsing it first unless a parsed one is given)"""
+        # Programs from the parse cache already carry their source hash;
+        # other pre-parsed programs are compiled without caching
+        if program is None:
+            key = hashlib.sha256(self.parser.lexer.text.encode('utf-8')).hexdigest()
+        else:
+            key = getattr(program, 'source_hash', None)
+        budgeted = self.budget is not None
+        if key is not None:
+            key = (key, budgeted)
+
+        compiled = None
+        if key is not None:
+            with code_cache_lock:
+                compiled = code_cache.get(key)
+                if compiled is not None:
+                    code_cache.move_to_end(key)
+        if compiled is None:
+            if program is None:
+                program = self.parser.parse()
+            try:
+                compiled = compile_program(program, budgeted=budgeted)
+            except (SyntaxError, RecursionError, MemoryError):
+                # Too deeply nested for CPython's compiler
+                return self.run_tree(program)
+            if key is not None:
+                with code_cache_lock:
+                    code_cache[key] = compiled
+                    while len(code_cache) > CODE_CACHE_SIZE:
+                        code_cache.popitem(last=False)
+
+        return self.run(compiled)
+
+    def run(self, compiled):
+        """Execute a compiled program"""
+        write = self.output_stream.write
+
+        def _vs_print(value):
+            write(str(value) + "\n")
+
+        namespace = dict(RUNTIME_HELPERS)
+        namespace['_vs_print'] = _vs_print
+        namespace['_vs_input'] = self.read_input
+        if self.budget is not None:
+            namespace['_vs_tick'] = self.budget.tick
+            namespace['_vs_enter'] = self.budget.enter
+            namespace['_vs_leave'] = self.budget.leave
+        exec(compiled.code, namespace)
+
+        self.start_budget()
+        try:
+            return namespace['_vs_main']()
+        except RecursionError:
+            self.too_deep()
+        except ZeroDivisionError:
+            self.error("Division by zero")
+        except NameError as e:
+            # A declared variable read before its declaration ran
+            match = re.search(r"'([^']+)'", str(e))
+            python_name = match.group(1) if match else ''
+            name = compiled.source_names.get(python_name, python_name)
+            if python_name in compiled.function_names:
+                self.error(f"'{name}' is not a function")
+            self.error(f"Undefined variable: {name}")
+        finally:
+            self.output = self.output_stream.getvalue()
+
+    def run_tree(self, program):
+        """Fall back to tree-walking for programs CPython cannot compile"""
+        if not getattr(program, 'resolved', False):
+            Resolver().resolve(program)
+        self.environment = self.global_frame(program)
+        self.memo = MemoCache()
+        self.start_budget()
+        try:
+            return self.execute(program)
+        except RecursionError:
+            self.too_deep()
+        finally:
+            self.output = self.output_stream.getvalue()
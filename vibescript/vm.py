@@ -0,0 +1,303 @@
+"""
+VibeScript Virtual Machine
+
+This module executes bytecode produced by vibescript.compiler on a value
+stack with a single dispatch loop. Function calls push a frame onto an
+explicit frame stack instead of recursing in Python, and break, continue
+and return are plain jumps. An and_i_oop or as_if in a function called from
+a loop body pops frames up to the caller that runs the loop and jumps there.
+"""
+
+from vibescript.compiler import (
+    Compiler, DEFAULT_FACTORIES,
+    LOAD_CONST, LOAD_NAME, STORE_NAME, DEFINE_NAME, DEFAULT, POP, PRINT, INPUT,
+    BINARY_ADD, BINARY_SUBTRACT, BINARY_MULTIPLY, BINARY_DIVIDE, BINARY_MODULO,
+    COMPARE_EQUALS, COMPARE_NOT_EQUALS, COMPARE_LESS_THAN, COMPARE_GREATER_THAN,
+    COMPARE_LESS_EQUALS, COMPARE_GREATER_EQUALS, UNARY_NEGATIVE,
+    JUMP, POP_JUMP_IF_FALSE, ENTER_SCOPE, EXIT_SCOPE,
+    MAKE_FUNCTION, LOAD_FUNCTION, CALL_FUNCTION, RETURN_VALUE,
+    RAISE_BREAK, RAISE_CONTINUE, BUILD_LIST, LOAD_INDEX, STORE_INDEX, OPCODE_NAMES
+)
+from vibescript.stan import Stan, pack, get_item, set_item
+from vibescript.interpreter import (
+    Interpreter, SymbolTable, BUILTIN_TABLE,
+    ReturnValue, BreakException, ContinueException
+)
+
+# Calls nested deeper than this fail like a Python RecursionError would
+# in the other engines, unless the budget sets its own depth limit
+MAX_FRAMES = 10000
+
+class VMFunction:
+    """Represents a compiled function together with its defining scope"""
+
+    def __init__(self, code, environment):
+        self.code = code
+        self.environment = environment
+
+class VirtualMachine:
+    """Stack-based virtual machine for VibeScript bytecode"""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def run(self, code, environment):
+        """Execute a program code object in the given environment"""
+        interpreter = self.interpreter
+        error = interpreter.error
+        is_truthy = interpreter.is_truthy
+        write = interpreter.output_stream.write
+        budget = interpreter.budget
+        tick = budget.tick if budget is not None else None
+        max_depth = MAX_FRAMES
+        if budget is not None and budget.max_depth is not None:
+            max_depth = budget.max_depth
+
+        instructions = code.instructions
+        constants = code.constants
+        names = code.names
+        loop_calls = code.loop_calls
+        env = environment
+        ip = 0
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        # Height of the stack when the current function was called
+        base = 0
+
+        # Saved (instructions, constants, names, loop_calls, ip, env, base) of each caller
+        frames = []
+
+        while True:
+            opcode = instructions[ip]
+            arg = instructions[ip + 1]
+            ip += 2
+
+            if opcode == LOAD_NAME:
+                name = names[arg]
+                scope = env
+                while scope is not None:
+                    symbols = scope.symbols
+                    if name in symbols:
+                        push(symbols[name])
+                        break
+                    scope = scope.enclosing
+                else:
+                    error(f"Undefined variable: {name}")
+
+            elif opcode == LOAD_CONST:
+                push(constants[arg])
+
+            elif opcode == STORE_NAME:
+                name = names[arg]
+                scope = env
+                # The built-in functions around the global table are read-only
+                while scope is not BUILTIN_TABLE:
+                    symbols = scope.symbols
+                    if name in symbols:
+                        symbols[name] = pop()
+                        break
+                    scope = scope.enclosing
+                else:
+                    error(f"Undefined variable: {name}")
+
+            elif opcode == POP_JUMP_IF_FALSE:
+                value = pop()
+                if value is not True and (value is False or not is_truthy(value)):
+                    ip = arg
+
+            elif opcode == JUMP:
+                # Jumping backwards is a loop iteration
+                if tick is not None and arg < ip:
+                    tick()
+                ip = arg
+
+            elif opcode == COMPARE_LESS_THAN:
+                right = pop()
+                stack[-1] = stack[-1] < right
+
+            elif opcode == BINARY_ADD:
+                right = pop()
+                left = stack[-1]
+                # Handle string concatenation
+                if isinstance(left, str) or isinstance(right, str):
+                    stack[-1] = str(left) + str(right)
+                else:
+                    stack[-1] = left + right
+
+            elif opcode == BINARY_SUBTRACT:
+                right = pop()
+                stack[-1] = stack[-1] - right
+
+            elif opcode == BINARY_MULTIPLY:
+                right = pop()
+                stack[-1] = stack[-1] * right
+
+            elif opcode == BINARY_DIVIDE:
+                right = pop()
+                if right == 0:
+                    error("Division by zero")
+                stack[-1] = stack[-1] / right
+
+            elif opcode == BINARY_MODULO:
+                right = pop()
+                if right == 0:
+                    error("Division by zero")
+                stack[-1] = stack[-1] % right
+
+            elif opcode == COMPARE_EQUALS:
+                right = pop()
+                stack[-1] = stack[-1] == right
+
+            elif opcode == COMPARE_NOT_EQUALS:
+                right = pop()
+                stack[-1] = stack[-1] != right
+
+            elif opcode == COMPARE_GREATER_THAN:
+                right = pop()
+                stack[-1] = stack[-1] > right
+
+            elif opcode == COMPARE_LESS_EQUALS:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+
+            elif opcode == COMPARE_GREATER_EQUALS:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+
+            elif opcode == ENTER_SCOPE:
+                env = SymbolTable(env)
+
+            elif opcode == EXIT_SCOPE:
+                for _ in range(arg):
+                    env = env.enclosing
+
+            elif opcode == DEFINE_NAME:
+                env.symbols[names[arg]] = pop()
+
+            elif opcode == POP:
+                pop()
+
+            elif opcode == PRINT:
+                write(str(pop()) + "\n")
+
+            elif opcode == LOAD_FUNCTION:
+                name = names[arg]
+                function = env.get(name)
+                if not function or not (isinstance(function, VMFunction) or callable(getattr(function, 'call', None))):
+                    error(f"'{name}' is not a function")
+                push(function)
+
+            elif opcode == CALL_FUNCTION:
+                if arg:
+                    arguments = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    arguments = []
+                function = pop()
+
+                if function.__class__ is not VMFunction:
+                    push(function.call(arguments))
+                    continue
+
+                if len(frames) >= max_depth:
+                    interpreter.too_deep()
+                if tick is not None:
+                    tick()
+                frames.append((instructions, constants, names, loop_calls, ip, env, base))
+                base = len(stack)
+                function_code = function.code
+                env = SymbolTable(function.environment)
+                symbols = env.symbols
+                # Bind parameters to arguments
+                for i, param in enumerate(function_code.params):
+                    symbols[param] = arguments[i] if i < arg else None
+                instructions = function_code.instructions
+                constants = function_code.constants
+                names = function_code.names
+                loop_calls = function_code.loop_calls
+                ip = 0
+
+            elif opcode == RETURN_VALUE:
+                if not frames:
+                    value = pop()
+                    if ip == len(instructions):
+                        # Falling off the end of the program
+                        return value
+                    # slay at the top level behaves like the tree-walker
+                    raise ReturnValue(value)
+                # The return value stays on top of the shared stack
+                instructions, constants, names, loop_calls, ip, env, base = frames.pop()
+
+            elif opcode == LOAD_INDEX:
+                index = pop()
+                stack[-1] = get_item(stack[-1], index)
+
+            elif opcode == STORE_INDEX:
+                value = pop()
+                index = pop()
+                set_item(pop(), index, value)
+
+            elif opcode == BUILD_LIST:
+                if arg:
+                    values = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    values = []
+                push(Stan(pack(values)))
+
+            elif opcode == UNARY_NEGATIVE:
+                stack[-1] = -stack[-1]
+
+            elif opcode == DEFAULT:
+                if stack[-1] is None:
+                    stack[-1] = DEFAULT_FACTORIES[arg]()
+
+            elif opcode == MAKE_FUNCTION:
+                push(VMFunction(constants[arg], env))
+
+            elif opcode == INPUT:
+                env.assign(names[arg], interpreter.read_input(names[arg]))
+
+            elif opcode == RAISE_BREAK or opcode == RAISE_CONTINUE:
+                # Return from the calls up to the nearest caller inside a loop body
+                while frames:
+                    instructions, constants, names, loop_calls, ip, env, base = frames.pop()
+                    targets = loop_calls.get(ip)
+                    if targets is not None:
+                        break
+                else:
+                    if opcode == RAISE_BREAK:
+                        raise BreakException()
+                    raise ContinueException()
+                # Drop what the caller's expression had pushed, and the block
+                # scopes opened since the start of the loop body
+                del stack[base:]
+                for _ in range(targets[2]):
+                    env = env.enclosing
+                target = targets[0] if opcode == RAISE_BREAK else targets[1]
+                # Like the jump an as_if in the body makes, a jump back is an iteration
+                if tick is not None and target < ip:
+                    tick()
+                ip = target
+
+            else:
+                error(f"Unknown opcode: {OPCODE_NAMES.get(opcode, opcode)}")
+
+class VMInterpreter(Interpreter):
+    """Interpreter that compiles the program to bytecode and runs it on the VM"""
+
+    def interpret(self, program=None):
+        """Interpret the program (parsing it first unless a parsed one is given)"""
+        # Parse and compile the program
+        if program is None:
+            program = self.parser.parse()
+        code = Compiler().compile(program)
+
+        # Execute the program
+        self.start_budget()
+        try:
+            self.environment = self.global_table()
+            return VirtualMachine(self).run(code, self.environment)
+        finally:
+            self.output = self.output_stream.getvalue()